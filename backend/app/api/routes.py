@@ -1,18 +1,25 @@
 # backend/app/api/routes.py
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Request, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from app.db.session import get_db
 from app.core.config import settings
-from app.db.models import Doctor, CareBuddy, Conversation, UserSession, Document
+from app.core.logging import log_payload
+from app.db.models import CareBuddy, Document, IngestFile, IngestJob
+from app.db.rollups import BUCKETS, timeseries
+from app.db.stats import buddy_stats, doctor_impact
 from app.db.database import get_db
-from app.services.whatsapp import whatsapp_client
-from app.services.carebuddy_rag import rag_system
+from app.services.carebuddy_rag import document_key, rag_system
+from app.services.conversation_memory import conversation_memory
+from app.services.session_router import session_router
+from app.services.ingestion import ingestion_pool, job_status
+from app.services.message_queue import InboundMessage, QueueFullError, message_queue
 from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+import asyncio
 import logging
 import json
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["api"])
@@ -28,7 +35,7 @@ async def verify_webhook(
     hub_challenge: str = Query(..., alias="hub.challenge"),
 ):
     """Handle webhook verification from Meta"""
-    logger.debug(f"Webhook verification request: mode={hub_mode}, token={hub_verify_token}, challenge={hub_challenge}")
+    logger.debug("Webhook verification request: mode=%s", hub_mode)
     
     if hub_mode == "subscribe" and hub_verify_token == settings.WHATSAPP_WEBHOOK_TOKEN:
         logger.info("Webhook verified successfully")
@@ -62,21 +69,14 @@ async def get_buddy_details(buddy_id: str, db: Session = Depends(get_db)):
         if not buddy:
             raise HTTPException(status_code=404, detail="Buddy not found")
 
-        # Get statistics
-        conversations = db.query(Conversation).filter(
-            Conversation.buddy_id == buddy.id
-        ).all()
-
-        active_patients = db.query(UserSession).filter(
-            UserSession.buddy_id == buddy.id,
-            UserSession.last_active >= datetime.now(timezone.utc) - timedelta(days=30)
-        ).count()
-
-        helpful_responses = sum(1 for c in conversations if c.helpful is True)
-        total_rated = sum(1 for c in conversations if c.helpful is not None)
+        stats = buddy_stats(
+            db,
+            buddy.id,
+            active_since=datetime.now(timezone.utc) - timedelta(days=30)
+        )
 
-        # Get documents
-        documents = db.query(Document).filter(
+        # Get documents, without loading their content
+        documents = db.query(Document.id, Document.filename, Document.upload_date, Document.version).filter(
             Document.buddy_id == buddy.id
         ).all()
 
@@ -85,17 +85,13 @@ async def get_buddy_details(buddy_id: str, db: Session = Depends(get_db)):
             "name": buddy.name,
             "creation_date": buddy.creation_date.isoformat(),
             "whatsapp_number": WHATSAPP_NUMBER,
-            "stats": {
-                "total_questions": len(conversations),
-                "active_patients": active_patients,
-                "response_rate": round((helpful_responses / total_rated * 100) if total_rated > 0 else 0, 1),
-                "average_rating": round((helpful_responses / total_rated * 5) if total_rated > 0 else 0, 1)
-            },
+            "stats": stats,
             "documents": [
                 {
                     "id": doc.id,
                     "name": doc.filename,
-                    "uploaded_at": doc.upload_date.isoformat()
+                    "uploaded_at": doc.upload_date.isoformat(),
+                    "version": doc.version
                 }
                 for doc in documents
             ]
@@ -109,10 +105,6 @@ async def get_doctor_impact(timespan: str = "month", db: Session = Depends(get_d
     """Get doctor's impact metrics"""
     logger.debug(f"Fetching impact metrics for timespan: {timespan}")
     try:
-        total_buddies = db.query(CareBuddy).filter(
-            CareBuddy.doctor_id == MOCK_DOCTOR_ID
-        ).count()
-
         now = datetime.now(timezone.utc)
         if timespan == "today":
             start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -121,26 +113,107 @@ async def get_doctor_impact(timespan: str = "month", db: Session = Depends(get_d
         else:  # month
             start_date = now - timedelta(days=30)
 
-        conversations = db.query(Conversation).join(
-            CareBuddy
-        ).filter(
-            CareBuddy.doctor_id == MOCK_DOCTOR_ID,
-            Conversation.timestamp >= start_date
-        ).all()
+        return doctor_impact(db, MOCK_DOCTOR_ID, start_date)
+    except Exception as e:
+        logger.error(f"Error fetching impact metrics: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Naive query parameters are taken as UTC, so they compare with aware ones"""
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+@router.get("/doctor/timeseries")
+async def get_doctor_timeseries(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    bucket: str = "day",
+    buddy_id: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Get question, patient, rating and latency counters per time bucket"""
+    if bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(BUCKETS)}")
+    end = _as_utc(end) or datetime.now(timezone.utc)
+    start = _as_utc(start) or end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
 
-        total_conversations = len(conversations)
-        helpful_conversations = sum(1 for c in conversations if c.helpful is True)
+    try:
+        buddies = db.query(CareBuddy.id).filter(CareBuddy.doctor_id == MOCK_DOCTOR_ID)
+        if buddy_id:
+            buddies = buddies.filter(CareBuddy.bid == buddy_id)
+        buddy_ids = [row.id for row in buddies.all()]
+        if buddy_id and not buddy_ids:
+            raise HTTPException(status_code=404, detail="Buddy not found")
 
         return {
-            "total_buddies": total_buddies,
-            "total_conversations": total_conversations,
-            "total_patients": db.query(UserSession.id).distinct().count(),
-            "average_rating": (helpful_conversations / total_conversations * 5) if total_conversations > 0 else 0
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "bucket": bucket,
+            "series": timeseries(db, buddy_ids, start, end, bucket)
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching impact metrics: {str(e)}")
+        logger.error(f"Error fetching timeseries: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class AskRequest(BaseModel):
+    query: str
+    history: List[Dict[str, str]] = []  # [{"user": ..., "assistant": ...}]
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _stream_answer(buddy: CareBuddy, query: str, history: List[Dict[str, str]]):
+    """Server-sent events: sources once retrieved, then tokens as generated, then done"""
+    try:
+        for event, data in rag_system.stream_answer(query, buddy.id, history):
+            yield _sse(event, data)
+    except Exception as e:
+        logger.error(f"Error streaming answer for buddy {buddy.bid}: {str(e)}", exc_info=True)
+        yield _sse("error", {"detail": "I apologize, but I encountered an error. Please try again."})
+
+def _ask(buddy_id: str, query: str, history: List[Dict[str, str]], db: Session) -> StreamingResponse:
+    buddy = db.query(CareBuddy).filter(
+        CareBuddy.bid == buddy_id,
+        CareBuddy.doctor_id == MOCK_DOCTOR_ID
+    ).first()
+    if not buddy:
+        raise HTTPException(status_code=404, detail="Buddy not found")
+    if not query.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+
+    return StreamingResponse(
+        _stream_answer(buddy, query, history),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/buddy/{buddy_id}/ask")
+async def ask_buddy(buddy_id: str, q: str, db: Session = Depends(get_db)):
+    """Stream a buddy's answer to a test question over server-sent events"""
+    logger.debug(f"Streaming answer for buddy {buddy_id}")
+    return _ask(buddy_id, q, [], db)
+
+@router.post("/buddy/{buddy_id}/ask")
+async def ask_buddy_with_history(buddy_id: str, request: AskRequest, db: Session = Depends(get_db)):
+    """Stream a buddy's answer to a test question, with earlier turns, over server-sent events"""
+    logger.debug(f"Streaming answer for buddy {buddy_id}")
+    return _ask(buddy_id, request.query, request.history, db)
+
+@router.get("/rag/cache")
+async def get_cache_stats():
+    """Get embedding, answer, conversation memory and session route cache statistics"""
+    return {
+        "embeddings": rag_system.embeddings.stats() if rag_system.ready else None,
+        "answers": rag_system.answer_cache.stats(),
+        "memory": conversation_memory.stats(),
+        "sessions": session_router.stats()
+    }
+
 @router.post("/buddies/create")
 async def create_buddy(name: str = Form(...), db: Session = Depends(get_db)):
     """Create a new buddy"""
@@ -168,13 +241,16 @@ async def create_buddy(name: str = Form(...), db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/buddy/{buddy_id}/documents")
+@router.post("/buddy/{buddy_id}/documents", status_code=202)
 async def upload_documents(
     buddy_id: str,
     files: list[UploadFile] = File(...),
     db: Session = Depends(get_db)
 ):
-    """Upload documents for a buddy"""
+    """Queue documents for background ingestion into a buddy, each as a new document.
+
+    A new version of an existing document goes through PUT /buddy/{buddy_id}/documents/{document_id}.
+    """
     logger.debug(f"Uploading documents for buddy: {buddy_id}")
     try:
         buddy = db.query(CareBuddy).filter(
@@ -185,145 +261,139 @@ async def upload_documents(
         if not buddy:
             raise HTTPException(status_code=404, detail="Buddy not found")
         
-        uploaded_docs = []
-        for file in files:
-            content = await file.read()
-            text_content = content.decode('utf-8', errors='ignore')
-            
-            # Log document content for debugging
-            logger.debug(f"Document content preview: {text_content[:500]}...")
-            
-            # Process with RAG
-            rag_success = rag_system.process_doctor_document(
-                doc_text=text_content,
-                doc_id=f"{buddy_id}-{len(uploaded_docs)}"
-            )
-            
-            if not rag_success:
-                logger.error("Failed to process document with RAG system")
-                raise HTTPException(status_code=500, detail="Failed to process document")
-            
-            # Save to database
-            doc = Document(
-                buddy_id=buddy.id,
-                filename=file.filename,
-                content=text_content,
-                upload_date=datetime.now(timezone.utc)
-            )
-            db.add(doc)
-            uploaded_docs.append({
-                "id": doc.id,
-                "name": doc.filename
-            })
-        
-        db.commit()
-        logger.debug(f"Successfully uploaded {len(uploaded_docs)} documents")
+        job = await ingestion_pool.submit(buddy, files, db)
+        logger.debug(f"Queued {len(files)} documents as ingestion job {job.id}")
         return {
-            "status": "success",
-            "documents": uploaded_docs
+            "status": "queued",
+            "job_id": job.id,
+            "documents": [{"name": file.filename} for file in files]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading documents: {str(e)}", exc_info=True)
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+def _get_buddy_document(db: Session, buddy_id: str, document_id: int):
+    buddy = db.query(CareBuddy).filter(
+        CareBuddy.bid == buddy_id,
+        CareBuddy.doctor_id == MOCK_DOCTOR_ID
+    ).first()
+    if not buddy:
+        raise HTTPException(status_code=404, detail="Buddy not found")
+
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.buddy_id == buddy.id
+    ).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return buddy, document
+
+@router.put("/buddy/{buddy_id}/documents/{document_id}", status_code=202)
+async def replace_document(
+    buddy_id: str,
+    document_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """Queue new content for an existing document; its old chunks are replaced"""
+    logger.debug(f"Replacing document {document_id} of buddy: {buddy_id}")
+    try:
+        buddy, document = _get_buddy_document(db, buddy_id, document_id)
+        job = await ingestion_pool.submit(buddy, [file], db, replaces=document)
+        return {
+            "status": "queued",
+            "job_id": job.id,
+            "documents": [{"id": document.id, "name": file.filename, "replaces_version": document.version}]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error replacing document: {str(e)}", exc_info=True)
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/buddy/{buddy_id}/documents/{document_id}")
+async def delete_document(buddy_id: str, document_id: int, db: Session = Depends(get_db)):
+    """Delete a document and its chunks from the buddy's namespace"""
+    logger.debug(f"Deleting document {document_id} of buddy: {buddy_id}")
+    try:
+        buddy, document = _get_buddy_document(db, buddy_id, document_id)
+        await asyncio.to_thread(rag_system.delete_document, buddy.id, document_key(document.id))
+
+        db.query(IngestFile).filter(IngestFile.document_id == document.id).update(
+            {IngestFile.document_id: None}
+        )
+        db.delete(document)
+        db.commit()
+        rag_system.answer_cache.invalidate(buddy.id)
+        return {"status": "deleted", "id": document_id}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting document: {str(e)}", exc_info=True)
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/ingest/{job_id}")
+async def get_ingest_job(job_id: str, db: Session = Depends(get_db)):
+    """Get progress of a document ingestion job"""
+    job = db.query(IngestJob).filter(IngestJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job_status(job)
+
 @router.post("/webhook")
-async def webhook_handler(request: Request, db: Session = Depends(get_db)):
+async def webhook_handler(request: Request):
+    """Validate and enqueue incoming WhatsApp messages; workers answer them"""
     try:
         body = await request.json()
-        logger.debug(f"Received webhook: {json.dumps(body, indent=2)}")
+        log_payload(logger, "Webhook", body)
+    except Exception as e:
+        logger.error(f"Invalid webhook payload: {str(e)}")
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
 
-        if body.get("object") != "whatsapp_business_account":
-            return {"status": "not a whatsapp message"}
+    if body.get("object") != "whatsapp_business_account":
+        return {"status": "not a whatsapp message"}
 
+    queued = 0
+    try:
         for entry in body.get("entry", []):
             for change in entry.get("changes", []):
-                messages = change.get("value", {}).get("messages", [])
-                if not messages:
-                    logger.debug("No messages in webhook")
-                    return {"status": "no messages"}
-
-                for message in messages:
-                    try:
-                        if "text" not in message:
-                            logger.debug("Message contains no text")
-                            continue
-
-                        from_number = message["from"]
-                        message_body = message["text"]["body"]
-
-                        logger.debug(f"Processing message from {from_number}: {message_body}")
-
-                        # Handle CONNECT command
-                        if message_body.upper().startswith("CONNECT"):
-                            # ... existing CONNECT handling code ...
-                            continue
-
-                        else:
-                            # Handle regular message
-                            session = db.query(UserSession).filter_by(
-                                phone_number=from_number
-                            ).first()
-
-                            if not session or not session.buddy_id:
-                                await whatsapp_client.send_message(
-                                    to=from_number,
-                                    message="Please connect to a buddy first using 'CONNECT' followed by the buddy ID."
-                                )
-                                continue
-
-                            # ADD THE NEW DEBUG LOGGING HERE
-                            logger.debug(f"About to query RAG with message: {message_body}")
-                            logger.debug(f"Current buddy_id: {session.buddy_id}")
-
-                            # Get documents for this buddy
-                            documents = db.query(Document).filter(
-                                Document.buddy_id == session.buddy_id
-                            ).all()
-                            logger.debug(f"Found {len(documents)} documents for buddy")
-
-                            # Log document content
-                            for doc in documents:
-                                logger.debug(f"Document {doc.id} content preview: {doc.content[:200]}")
-
-                            # Create conversation record
-                            conversation = Conversation(
-                                buddy_id=session.buddy_id,
-                                user_session_id=session.id,
-                                query=message_body
-                            )
-                            db.add(conversation)
-                            db.commit()
-
-                            # Get response from RAG
-                            response = rag_system.get_response(
-                                query=message_body,
-                                chat_history=[]
-                            )
-                            logger.debug(f"RAG response: {response}")
-
-                            # Save response
-                            conversation.response = response
-                            db.commit()
-
-                            # Send response
-                            await whatsapp_client.send_message(
-                                to=from_number,
-                                message=response
-                            )
-
-                    except Exception as e:
-                        logger.error(f"Error processing message: {str(e)}", exc_info=True)
-                        try:
-                            await whatsapp_client.send_message(
-                                to=from_number,
-                                message="Sorry, I encountered an error. Please try again."
-                            )
-                        except:
-                            logger.error("Failed to send error message to user", exc_info=True)
-
-        return {"status": "success"}
-
-    except Exception as e:
-        logger.error(f"Error processing webhook: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+                for message in change.get("value", {}).get("messages", []):
+                    if "text" not in message:
+                        logger.debug("Message contains no text")
+                        continue
+                    if await message_queue.submit(InboundMessage(
+                        phone_number=message["from"],
+                        text=message["text"]["body"],
+                        message_id=message.get("id")
+                    )):
+                        queued += 1
+    except QueueFullError as e:
+        # Meta retries non-2xx deliveries, which gives the workers time to catch up
+        logger.warning(f"Rejecting webhook: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except (KeyError, TypeError) as e:
+        logger.error(f"Malformed webhook message: {str(e)}")
+        raise HTTPException(status_code=400, detail="Malformed message")
+
+    return {"status": "queued" if queued else "no messages", "queued": queued}
+
+@router.post("/internal/messages", include_in_schema=False)
+async def forwarded_message(request: Request):
+    """Enqueue a message another server process received for a number this one owns"""
+    if not message_queue.accepts_forward(request.headers.get("X-Forward-Token")):
+        raise HTTPException(status_code=404, detail="Not Found")
+    try:
+        queued = message_queue.enqueue(InboundMessage(**await request.json()))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"queued": queued}
+
+@router.get("/queue/stats")
+async def get_queue_stats():
+    """Get webhook message queue depth and throughput"""
+    return message_queue.stats()
@@ -14,30 +14,120 @@ class Settings:
     PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
     PINECONE_ENV = os.getenv("PINECONE_ENV", "gcp-starter")  # Default to gcp-starter
 
+    # Local stand-in for OpenAI, for offline development and load tests
+    OPENAI_FAKE = os.getenv("OPENAI_FAKE", "false").lower() == "true"
+    OPENAI_FAKE_EMBED_LATENCY = float(os.getenv("OPENAI_FAKE_EMBED_LATENCY", "0.05"))  # Seconds per call
+    OPENAI_FAKE_LLM_LATENCY = float(os.getenv("OPENAI_FAKE_LLM_LATENCY", "0.5"))  # Seconds to first token
+    OPENAI_FAKE_TOKEN_LATENCY = float(os.getenv("OPENAI_FAKE_TOKEN_LATENCY", "0.01"))  # Seconds per token
+
     # WhatsApp Configuration
     WHATSAPP_ACCESS_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN")
     WHATSAPP_PHONE_NUMBER_ID = os.getenv("WHATSAPP_PHONE_NUMBER_ID")
     WHATSAPP_WEBHOOK_TOKEN = os.getenv("WHATSAPP_WEBHOOK_TOKEN", "carebuddy_webhook_token")
+    WHATSAPP_MAX_CONNECTIONS = int(os.getenv("WHATSAPP_MAX_CONNECTIONS", "20"))
+    WHATSAPP_TIMEOUT_SECONDS = float(os.getenv("WHATSAPP_TIMEOUT_SECONDS", "10"))
+    WHATSAPP_MAX_RETRIES = int(os.getenv("WHATSAPP_MAX_RETRIES", "3"))
+    WHATSAPP_RATE_LIMIT = float(os.getenv("WHATSAPP_RATE_LIMIT", "80"))  # Messages/second per business number
+    WHATSAPP_RATE_BURST = float(os.getenv("WHATSAPP_RATE_BURST", "80"))
+    WHATSAPP_BULK_CONCURRENCY = int(os.getenv("WHATSAPP_BULK_CONCURRENCY", "20"))
+    WHATSAPP_FAKE_TRANSPORT = os.getenv("WHATSAPP_FAKE_TRANSPORT", "false").lower() == "true"
+    WHATSAPP_FAKE_LATENCY = float(os.getenv("WHATSAPP_FAKE_LATENCY", "0"))  # Seconds per Graph API call
 
     # Database Configuration
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./carebuddy.db")
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # Bytes
+    SQLITE_STATEMENT_CACHE_SIZE = int(os.getenv("SQLITE_STATEMENT_CACHE_SIZE", "256"))
+
+    # Vector Store Configuration
+    VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone")  # "pinecone" or "local"
+    LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", "./vector_store")
+
+    # Embedding Cache Configuration (empty path disables the disk tier)
+    EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.db")
+    EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "10000"))
+    EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+    # Document Ingestion Configuration
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))  # Chunks per embedding request
+    INGEST_UPSERT_BATCH_SIZE = int(os.getenv("INGEST_UPSERT_BATCH_SIZE", "100"))  # Vectors per Pinecone upsert
+    INGEST_EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))  # Embedding requests in flight, all files
+    INGEST_EMBED_MAX_RETRIES = int(os.getenv("INGEST_EMBED_MAX_RETRIES", "5"))
+    INGEST_EMBED_BACKOFF_SECONDS = float(os.getenv("INGEST_EMBED_BACKOFF_SECONDS", "1.0"))  # Doubles per retry
+    INGEST_UPLOAD_DIR = os.getenv("INGEST_UPLOAD_DIR", "./uploads")
+    INGEST_READ_BLOCK_SIZE = int(os.getenv("INGEST_READ_BLOCK_SIZE", str(1024 * 1024)))  # Bytes
+
+    # Webhook Message Queue Configuration
+    MESSAGE_WORKERS = int(os.getenv("MESSAGE_WORKERS", "8"))
+    MESSAGE_QUEUE_MAX_DEPTH = int(os.getenv("MESSAGE_QUEUE_MAX_DEPTH", "1000"))
+    SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "25"))
+
+    # Answer Cache Configuration
+    ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+    ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))  # Per buddy
+
+    # Retrieval Configuration
+    RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))  # Chunks sent to the LLM
+    HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"  # Fuse FTS5 with vectors (SQLite)
+    HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "10"))  # Per retriever, before fusion
+    RRF_K = int(os.getenv("RRF_K", "60"))
+    EMBED_TIMEOUT_SECONDS = float(os.getenv("EMBED_TIMEOUT_SECONDS", "2.0"))  # Then answer from lexical hits
+
+    # Conversation Memory Configuration
+    MEMORY_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "5000"))  # Sessions kept in memory
+    MEMORY_MAX_TURNS = int(os.getenv("MEMORY_MAX_TURNS", "20"))  # Turns loaded per session
+    MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "1000"))  # History tokens per prompt
+    MEMORY_SUMMARIES = os.getenv("MEMORY_SUMMARIES", "false").lower() == "true"
+
+    # Conversation Recording Configuration
+    RECORDER_FLUSH_MS = int(os.getenv("RECORDER_FLUSH_MS", "200"))  # Write buffered conversations this often
+    RECORDER_BATCH_SIZE = int(os.getenv("RECORDER_BATCH_SIZE", "100"))  # ...or as soon as this many wait
+    RECORDER_MAX_PENDING = int(os.getenv("RECORDER_MAX_PENDING", "10000"))  # Oldest dropped beyond this
+    RECORDER_JOURNAL_PATH = os.getenv("RECORDER_JOURNAL_PATH", "")  # Survive crashes before a flush; off if empty
+    RECORDER_JOURNAL_FSYNC = os.getenv("RECORDER_JOURNAL_FSYNC", "false").lower() == "true"
+
+    # Session Routing Configuration
+    SESSION_ROUTE_TTL_SECONDS = int(os.getenv("SESSION_ROUTE_TTL_SECONDS", "300"))  # Phone -> session cache lifetime
+    SESSION_ROUTE_MAX_ENTRIES = int(os.getenv("SESSION_ROUTE_MAX_ENTRIES", "10000"))
+
+    # Server Configuration
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))  # Pre-forked processes for `python main.py`
+    SHARED_STATE_DIR = os.getenv("SHARED_STATE_DIR", "")  # Cross-worker cache counters; a temp dir if empty
+
+    # Logging Configuration
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVELS = os.getenv("LOG_LEVELS", "httpx=WARNING")  # Per module, e.g. "app.services.whatsapp=DEBUG,httpx=WARNING"
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+    LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))  # Share of webhook payloads logged
+    LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
+    # Secret for the phone number stand-ins in log lines; random per server start if empty,
+    # so set it to correlate a patient's lines across restarts
+    LOG_HASH_KEY = os.getenv("LOG_HASH_KEY", "")
+
+    # Metrics Configuration
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"  # Serve Prometheus /metrics
 
     def __init__(self):
         # Validate required settings
-        required_settings = [
-            "OPENAI_API_KEY",
-            "PINECONE_API_KEY",
-            "WHATSAPP_ACCESS_TOKEN",
-            "WHATSAPP_PHONE_NUMBER_ID"
-        ]
+        required_settings = []
+        if not self.OPENAI_FAKE:
+            required_settings.append("OPENAI_API_KEY")
+        if not self.WHATSAPP_FAKE_TRANSPORT:
+            required_settings += ["WHATSAPP_ACCESS_TOKEN", "WHATSAPP_PHONE_NUMBER_ID"]
+        if self.VECTOR_STORE == "pinecone":
+            required_settings.append("PINECONE_API_KEY")
         
-        missing_settings = [
+        self.missing_settings = [
             setting for setting in required_settings 
             if not getattr(self, setting)
         ]
         
-        if missing_settings:
-            logger.error(f"Missing required environment variables: {', '.join(missing_settings)}")
-            raise ValueError(f"Missing required environment variables: {', '.join(missing_settings)}")
+        # Reported by /ready instead of failing at import, so the dashboard can still be served
+        if self.missing_settings:
+            logger.error(f"Missing required environment variables: {', '.join(self.missing_settings)}")
 
 settings = Settings()
\ No newline at end of file
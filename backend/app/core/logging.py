@@ -0,0 +1,170 @@
+# backend/app/core/logging.py
+"""Application logging: queued handlers, JSON output, per-module levels and sampled payloads.
+
+Log calls on the request path only enqueue the record; a background
+listener thread formats and writes it, so a slow stdout never blocks the
+event loop. Use %-style arguments (logger.debug("x %s", y)) on hot paths so
+disabled levels cost nothing.
+"""
+from typing import Any, Dict, Optional
+import atexit
+import copy
+import hashlib
+import hmac
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import secrets
+import sys
+from datetime import datetime, timezone
+
+from app.core.config import settings
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+# Keys whose values identify a patient or carry what they wrote
+PHI_KEYS = {"from", "to", "wa_id", "phone_number", "display_phone_number", "body", "text", "name", "profile",
+            "query", "response", "message", "caption", "email"}
+_PHONE = re.compile(r"\+?\d[\d\s-]{6,}\d")
+REDACTED = "[redacted]"
+# Keyed so a stand-in can't be reversed by hashing every possible number; pre-forked workers inherit one key
+_HASH_KEY = (settings.LOG_HASH_KEY or secrets.token_hex(32)).encode()
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; fields passed with extra= are included"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Resolves the message and traceback in the calling thread and leaves formatting to the listener"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Arguments may be mutated after the call returns, so interpolate them now
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """'app.services.whatsapp=DEBUG,httpx=WARNING' -> {logger: level}"""
+    levels = {}
+    for item in spec.split(","):
+        name, sep, level = item.strip().partition("=")
+        if sep and name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(level: Optional[str] = None, fmt: Optional[str] = None, stream=None) -> logging.handlers.QueueListener:
+    """Route the root logger through a queue to a stream handler on a listener thread; replaces earlier setup"""
+    global _listener
+    stop_logging()
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    if (fmt or settings.LOG_FORMAT) == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_QueueHandler(records))
+    root.setLevel(level or settings.LOG_LEVEL)
+    for name, module_level in parse_levels(settings.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(stop_logging)
+
+
+def _restart_after_fork():
+    """The listener thread does not survive a fork; give a forked worker its own queue and listener"""
+    global _listener
+    if _listener is None:
+        return
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, _QueueHandler):
+            handler.queue = records
+    _listener = logging.handlers.QueueListener(records, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def redact(value: Any, depth: int = 0) -> Any:
+    """Copy of a JSON-like payload with PHI fields and phone-number-like strings masked"""
+    if depth > 20:
+        return REDACTED
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if key in PHI_KEYS and not isinstance(value[key], (dict, list)) else redact(value[key], depth + 1)
+            for key in value
+        }
+    if isinstance(value, list):
+        return [redact(item, depth + 1) for item in value]
+    if isinstance(value, str):
+        return _PHONE.sub(REDACTED, value)
+    return value
+
+
+def mask_phone(phone_number: Optional[str]) -> str:
+    """A stable stand-in for a phone number, so one patient's log lines can be correlated without the number"""
+    if not phone_number:
+        return "phone-none"
+    return "phone-" + hmac.new(_HASH_KEY, phone_number.encode(), hashlib.sha256).hexdigest()[:10]
+
+
+def log_payload(logger: logging.Logger, label: str, payload: Any, level: int = logging.DEBUG):
+    """Log a redacted, truncated copy of a payload for a sample of calls.
+
+    Does nothing unless the level is enabled and the call is sampled at
+    settings.LOG_PAYLOAD_SAMPLE_RATE, so it is safe on hot paths.
+    """
+    if not logger.isEnabledFor(level) or random.random() >= settings.LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    text = json.dumps(redact(payload), separators=(",", ":"), default=str)
+    if len(text) > settings.LOG_PAYLOAD_MAX_CHARS:
+        text = text[:settings.LOG_PAYLOAD_MAX_CHARS] + "...(truncated)"
+    logger.log(level, "%s payload (sampled): %s", label, text)
@@ -0,0 +1,187 @@
+# backend/app/core/metrics.py
+"""Prometheus metrics for the API, RAG pipeline, WhatsApp client and database.
+
+Hot paths only observe histograms and counters (a lock and a few adds);
+queue and cache figures are read from their stats() when /metrics is
+scraped, so they cost nothing between scrapes.
+"""
+from typing import Optional
+import logging
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Sub-millisecond database queries up to multi-second LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "carebuddy_http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+RAG_STAGE_SECONDS = Histogram(
+    "carebuddy_rag_stage_duration_seconds", "Answer pipeline latency by stage (embed, search, llm, total, ...)",
+    ["stage"], buckets=LATENCY_BUCKETS
+)
+RAG_ANSWERS = Counter("carebuddy_rag_answers_total", "Answers by how they were retrieved", ["retrieval"])
+LLM_TOKENS = Counter("carebuddy_llm_tokens_total", "LLM tokens used for answers", ["buddy_id", "kind"])
+EMBEDDING_REQUEST_SECONDS = Histogram(
+    "carebuddy_embedding_request_duration_seconds", "Embedding provider call latency, cache misses only",
+    ["kind"], buckets=LATENCY_BUCKETS
+)
+WHATSAPP_SEND_SECONDS = Histogram(
+    "carebuddy_whatsapp_send_duration_seconds", "WhatsApp send latency including retries",
+    ["outcome"], buckets=LATENCY_BUCKETS
+)
+WHATSAPP_RETRIES = Counter("carebuddy_whatsapp_retries_total", "WhatsApp send attempts that were retried")
+MESSAGE_SECONDS = Histogram(
+    "carebuddy_message_duration_seconds", "Webhook receipt to reply sent, per message",
+    ["outcome"], buckets=LATENCY_BUCKETS
+)
+DB_QUERY_SECONDS = Histogram(
+    "carebuddy_db_query_duration_seconds", "Database statement latency by statement type",
+    ["statement"], buckets=LATENCY_BUCKETS
+)
+
+_STATEMENTS = {"select", "insert", "update", "delete", "with", "pragma", "begin", "commit", "rollback"}
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request under its route template, so paths with ids share a series"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                str(status)
+            ).observe(time.perf_counter() - started)
+
+
+def instrument_engine(engine: Engine):
+    """Time every statement the engine executes"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        kind = statement.lstrip()[:8].split(None, 1)[0].lower() if statement.strip() else "other"
+        DB_QUERY_SECONDS.labels(kind if kind in _STATEMENTS else "other").observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # after_cursor_execute does not run for failed statements
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
+
+
+def observe_answer(buddy_id: int, result):
+    """RAG answer listener: stage latencies and token usage"""
+    for stage, seconds in result.timings.items():
+        RAG_STAGE_SECONDS.labels(stage).observe(seconds)
+    RAG_ANSWERS.labels(result.retrieval).inc()
+    for kind in ("input_tokens", "output_tokens"):
+        if result.usage.get(kind):
+            LLM_TOKENS.labels(str(buddy_id), kind.split("_")[0]).inc(result.usage[kind])
+
+
+def observe_message(message, seconds: float, ok: bool):
+    """Message queue listener: end-to-end latency per WhatsApp message"""
+    MESSAGE_SECONDS.labels("answered" if ok else "failed").observe(seconds)
+
+
+class _StatsCollector:
+    """Queue depth and cache counters, read from the services when scraped"""
+
+    def collect(self):
+        from app.services.carebuddy_rag import rag_system
+        from app.services.conversation_memory import conversation_memory
+        from app.services.conversation_recorder import conversation_recorder
+        from app.services.message_queue import message_queue
+        from app.services.session_router import session_router
+
+        queue = message_queue.stats()
+        yield GaugeMetricFamily("carebuddy_queue_depth", "Messages waiting for a worker", value=queue["depth"])
+        yield GaugeMetricFamily("carebuddy_queue_oldest_age_seconds", "Age of the oldest waiting message",
+                                value=queue["oldest_age_seconds"])
+        messages = CounterMetricFamily("carebuddy_queue_messages", "Webhook messages by outcome", labels=["outcome"])
+        for outcome in ("enqueued", "processed", "failed", "duplicates", "rejected"):
+            messages.add_metric([outcome], queue[outcome])
+        yield messages
+
+        recorder = conversation_recorder.stats()
+        yield GaugeMetricFamily("carebuddy_recorder_pending", "Conversation records waiting to be written",
+                                value=recorder["pending"])
+        records = CounterMetricFamily("carebuddy_recorder_records", "Conversation records by outcome",
+                                      labels=["outcome"])
+        for outcome in ("recorded", "flushed", "dropped"):
+            records.add_metric([outcome], recorder[outcome])
+        yield records
+
+        lookups = CounterMetricFamily("carebuddy_cache_lookups", "Cache lookups by cache and result",
+                                      labels=["cache", "result"])
+        memory = conversation_memory.stats()
+        lookups.add_metric(["conversation_memory", "hit"], memory["hits"])
+        lookups.add_metric(["conversation_memory", "miss"], memory["misses"])
+        routes = session_router.stats()
+        lookups.add_metric(["session_route", "hit"], routes["hits"])
+        lookups.add_metric(["session_route", "miss"], routes["misses"])
+        if rag_system.ready:
+            answers = rag_system.answer_cache.stats()
+            lookups.add_metric(["answer", "hit"], answers["hits"])
+            lookups.add_metric(["answer", "miss"], answers["misses"])
+            embeddings = rag_system.embeddings.stats()
+            lookups.add_metric(["embedding", "memory_hit"], embeddings["memory_hits"])
+            lookups.add_metric(["embedding", "disk_hit"], embeddings["disk_hits"])
+            lookups.add_metric(["embedding", "miss"], embeddings["misses"])
+        yield lookups
+
+
+_installed = False
+
+def install(engine: Optional[Engine] = None):
+    """Hook the database, RAG pipeline and message queue into the metrics; safe to call twice"""
+    global _installed
+    if _installed:
+        return
+    from app.db.database import engine as app_engine
+    from app.services.carebuddy_rag import rag_system
+    from app.services.message_queue import message_queue
+
+    instrument_engine(engine or app_engine)
+    rag_system.answer_listeners.append(observe_answer)
+    message_queue.listeners.append(observe_message)
+    REGISTRY.register(_StatsCollector())
+    _installed = True
+    logger.info("Metrics instrumentation installed")
+
+
+def render() -> tuple:
+    """Current metrics in the Prometheus text format, with its content type"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,227 @@
+# backend/app/core/server.py
+"""Pre-fork multi-worker serving.
+
+    python main.py --workers 4
+
+The parent process imports the app and the libraries the RAG pipeline
+loads, reads the local vector segments into the page cache and loads their
+chunk records, binds the listening socket and then forks the workers,
+which each run uvicorn on that socket. Code, preloaded modules and chunk
+records are shared copy-on-write, and the vector segments are
+memory-mapped read-only, so N workers hold one copy of the index. Each
+worker keeps its own answer cache and conversation memory; SharedCounters
+in SHARED_STATE_DIR tell the others when a buddy's documents change or a
+patient is answered elsewhere, and the local vector store reloads a
+namespace another worker has written. Each worker also listens on its own
+Unix socket in that directory; webhook messages for a patient another
+worker owns are forwarded there, so one worker's queue answers each
+patient in order. The parent restarts workers that die and forwards
+SIGTERM/SIGINT so each drains its queue.
+"""
+from typing import Dict, List
+import gc
+import logging
+import os
+import random
+import secrets
+import shutil
+import signal
+import socket
+import tempfile
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# A worker that dies sooner than this after starting is restarted after a pause
+MIN_WORKER_LIFETIME = 5.0
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+def _preload_modules():
+    """Import what CareBuddyRAG loads lazily, so workers share it instead of importing it each"""
+    import dotenv  # noqa: F401
+    import langchain.text_splitter  # noqa: F401
+    import app.services.embedding_cache  # noqa: F401
+
+    if not settings.OPENAI_FAKE:
+        import langchain_openai  # noqa: F401
+    if settings.VECTOR_STORE == "local":
+        import app.services.vectorstore  # noqa: F401
+    else:
+        import langchain_pinecone  # noqa: F401
+        import pinecone  # noqa: F401
+
+
+def _warm_page_cache(directory: str) -> int:
+    """Read every vector segment once so workers' memory maps start out resident; returns bytes read"""
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(".npy"):
+                with open(os.path.join(root, name), "rb") as f:
+                    while block := f.read(READ_BLOCK_SIZE):
+                        total += len(block)
+    return total
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _bind_unix(path: str) -> socket.socket:
+    if os.path.exists(path):
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX)
+    sock.bind(path)
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _configure_worker(worker_id: int, workers: int, state_dir: str, peer_paths: List[str], token: str):
+    """Per-process setup after the fork, before the app's lifespan starts"""
+    from app.db.database import engine
+    from app.services.carebuddy_rag import rag_system
+    from app.services.conversation_memory import conversation_memory
+    from app.services.conversation_recorder import conversation_recorder
+    from app.services.ingestion import ingestion_pool
+    from app.services.message_queue import message_queue
+    from app.services.session_router import session_router
+    from app.services.shared_counters import SharedCounters
+    from app.services.whatsapp import whatsapp_client
+
+    # Forked processes must not reuse the parent's connections or random state
+    engine.dispose(close=False)
+    random.seed()
+
+    rag_system.answer_cache.counters = SharedCounters(os.path.join(state_dir, "answers.counters"))
+    conversation_memory.counters = SharedCounters(os.path.join(state_dir, "sessions.counters"))
+    session_router.counters = SharedCounters(os.path.join(state_dir, "routes.counters"))
+    ingestion_pool.resume_pending = worker_id == 0
+    message_queue.worker_id = worker_id
+    message_queue.peer_sockets = peer_paths
+    message_queue.forward_token = token
+    if conversation_recorder.journal_path:
+        # One journal per worker slot, replayed by the worker that restarts in it
+        conversation_recorder.journal_path = f"{conversation_recorder.journal_path}.{worker_id}"
+
+    # The business number's send limit is shared by all workers
+    bucket = whatsapp_client.rate_limiter
+    bucket.rate /= workers
+    bucket.capacity = bucket.tokens = max(bucket.capacity / workers, 1.0)
+
+
+def _run_worker(app, sock: socket.socket, peers: List[socket.socket], peer_paths: List[str],
+                worker_id: int, workers: int, state_dir: str, token: str):
+    import uvicorn
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # Only this worker's own peer socket; the others belong to their workers
+    for i, peer in enumerate(peers):
+        if i != worker_id:
+            peer.close()
+    _configure_worker(worker_id, workers, state_dir, peer_paths, token)
+    logger.info(f"Worker {worker_id} started (pid {os.getpid()})")
+    # log_config=None keeps uvicorn's loggers on the app's queued pipeline
+    config = uvicorn.Config(app, log_config=None, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock, peers[worker_id]])
+
+
+def serve(app, host: str = "127.0.0.1", port: int = 8001, workers: int = 1):
+    """Serve the app from one process, or from `workers` pre-forked processes sharing one socket"""
+    import uvicorn
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        uvicorn.run(app, host=host, port=port, log_config=None)
+        return
+
+    from app.services.shared_counters import create
+
+    # A temporary state dir is ours to remove once every worker has exited
+    owns_state_dir = not settings.SHARED_STATE_DIR
+    state_dir = settings.SHARED_STATE_DIR or tempfile.mkdtemp(prefix="carebuddy-shared-")
+    for name in ("answers", "sessions", "routes"):
+        create(os.path.join(state_dir, f"{name}.counters"))
+
+    started = time.perf_counter()
+    _preload_modules()
+    warmed = rows = 0
+    if settings.VECTOR_STORE == "local":
+        from app.services.vectorstore import preload
+
+        warmed = _warm_page_cache(settings.LOCAL_VECTOR_DIR)
+        rows = preload(settings.LOCAL_VECTOR_DIR)
+    sock = _bind(host, port)
+    # Bound here rather than in the workers, so forwarded messages wait in the backlog while one restarts
+    peer_paths = [os.path.join(state_dir, f"worker-{i}.sock") for i in range(workers)]
+    peers = [_bind_unix(path) for path in peer_paths]
+    token = secrets.token_hex(16)
+    # Objects preloaded so far are never collected; keeping them out of GC passes
+    # stops workers' collections from writing to (and so copying) their pages
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Preloaded in {time.perf_counter() - started:.2f}s ({rows} chunks, {warmed} bytes of vectors); "
+                f"forking {workers} workers on {host}:{port}")
+
+    children: Dict[int, tuple] = {}
+    stopping = False
+
+    def spawn(worker_id: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(app, sock, peers, peer_paths, worker_id, workers, state_dir, token)
+            except BaseException:
+                logger.exception(f"Worker {worker_id} crashed")
+                code = 1
+            finally:
+                from app.core.logging import stop_logging
+
+                stop_logging()
+                os._exit(code)
+        children[pid] = (worker_id, time.monotonic())
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for worker_id in range(workers):
+        spawn(worker_id)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        worker_id, spawned_at = children.pop(pid, (None, 0.0))
+        if worker_id is None or stopping:
+            continue
+        logger.warning(f"Worker {worker_id} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}; restarting")
+        if time.monotonic() - spawned_at < MIN_WORKER_LIFETIME:
+            time.sleep(MIN_WORKER_LIFETIME)
+        if not stopping:
+            spawn(worker_id)
+
+    sock.close()
+    for peer, path in zip(peers, peer_paths):
+        peer.close()
+        os.unlink(path)
+    if owns_state_dir:
+        shutil.rmtree(state_dir, ignore_errors=True)
+    logger.info("All workers stopped")
@@ -0,0 +1,65 @@
+# backend/app/db/chunk_search.py
+"""BM25 search over stored document chunks with SQLite FTS5"""
+from typing import Dict, List, Optional
+import logging
+import re
+
+from sqlalchemy import text
+
+from app.db.database import engine
+
+logger = logging.getLogger(__name__)
+
+MAX_QUERY_TERMS = 32
+
+_SEARCH_SQL = text("""
+    SELECT document_chunks.document_id, document_chunks.chunk_hash, document_chunks.chunk_index,
+           document_chunks.text, bm25(document_chunks_fts) AS score
+    FROM document_chunks_fts
+    JOIN document_chunks ON document_chunks.id = document_chunks_fts.rowid
+    JOIN documents ON documents.id = document_chunks.document_id
+    WHERE document_chunks_fts MATCH :query AND documents.buddy_id = :buddy_id
+    ORDER BY score
+    LIMIT :k
+""")
+
+_available: Optional[bool] = None
+
+def fts_available() -> bool:
+    """Whether this database has the FTS5 chunk index (SQLite at migration 0006 or later)"""
+    global _available
+    if _available is None:
+        if engine.dialect.name != "sqlite":
+            _available = False
+        else:
+            with engine.connect() as conn:
+                _available = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'document_chunks_fts'"
+                )).first() is not None
+        if not _available:
+            logger.info("Full-text chunk index not available; retrieval is vector-only")
+    return _available
+
+def match_expression(query: str) -> Optional[str]:
+    """Quote each word of a free-text question and OR them, so FTS5 syntax in it is inert"""
+    terms = list(dict.fromkeys(re.findall(r"\w+", query.lower())))[:MAX_QUERY_TERMS]
+    return " OR ".join(f'"{term}"' for term in terms) or None
+
+def lexical_search(buddy_id: int, query: str, k: int) -> List[Dict]:
+    """Best BM25 matches among a buddy's chunks, best first"""
+    expression = match_expression(query)
+    if expression is None or not fts_available():
+        return []
+    with engine.connect() as conn:
+        rows = conn.execute(_SEARCH_SQL, {"query": expression, "buddy_id": buddy_id, "k": k}).all()
+    return [
+        {
+            "document_id": row.document_id,
+            "chunk_hash": row.chunk_hash,
+            "chunk_index": row.chunk_index,
+            "text": row.text,
+            # bm25() is lower-is-better; flip it so higher is better like vector scores
+            "score": -row.score
+        }
+        for row in rows
+    ]
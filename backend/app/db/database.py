@@ -1,27 +1,56 @@
 # backend/app/db/database.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
+from app.core.config import settings
+from app.db.base import Base
 import logging
-import os
 
 logger = logging.getLogger(__name__)
 
-# Create database URL
-DATABASE_URL = "sqlite:///carebuddy.db"
+def create_db_engine(url: str = settings.DATABASE_URL) -> Engine:
+    """Create the application's one engine, tuned for the configured backend"""
+    db_url = make_url(url)
+    if db_url.get_backend_name() != "sqlite":
+        return create_engine(
+            url,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_pre_ping=True,
+            pool_recycle=1800
+        )
+
+    pool_args = {}
+    if db_url.database not in (None, "", ":memory:"):
+        pool_args = {"pool_size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_MAX_OVERFLOW}
+    engine = create_engine(
+        url,
+        connect_args={
+            "check_same_thread": False,  # Needed for SQLite
+            "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000,
+            "cached_statements": settings.SQLITE_STATEMENT_CACHE_SIZE
+        },
+        **pool_args
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL lets dashboard reads proceed while a webhook write holds the lock
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+        cursor.close()
+
+    return engine
 
 # Create engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Needed for SQLite
-)
+engine = create_db_engine()
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Create declarative base
-Base = declarative_base()
-
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -32,11 +61,12 @@ def get_db():
 
 # Database initialization
 def init_db():
-    from app.db.models import Doctor, CareBuddy, UserSession, Conversation, Document
-    logger.info("Creating database tables...")
+    from app.db.migrations import upgrade_database
+    from app.db.models import Doctor
+    logger.info("Migrating database schema...")
     
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created")
+    upgrade_database()
+    logger.info("Database schema up to date")
     
     # Create test doctor
     db = SessionLocal()
@@ -0,0 +1,49 @@
+# backend/app/db/migrations.py
+from pathlib import Path
+from typing import Optional
+import logging
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from app.core.config import settings
+from app.db.database import create_db_engine
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+# Revision matching the schema that Base.metadata.create_all used to build
+BASELINE_REVISION = "0001"
+BASELINE_TABLES = {"doctors", "care_buddies", "user_sessions", "conversations", "documents"}
+
+def alembic_config(database_url: Optional[str] = None) -> Config:
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    if database_url:
+        config.set_main_option("sqlalchemy.url", database_url)
+    # Keep the caller's logging setup
+    config.attributes["configure_logger"] = False
+    return config
+
+def upgrade_database(database_url: Optional[str] = None, revision: str = "head"):
+    """Migrate the schema to `revision`, adopting databases created before migrations existed"""
+    config = alembic_config(database_url)
+    engine = create_db_engine(database_url or settings.DATABASE_URL)
+    try:
+        tables = set(inspect(engine).get_table_names())
+    finally:
+        engine.dispose()
+
+    if "alembic_version" not in tables and tables & BASELINE_TABLES:
+        missing = BASELINE_TABLES - tables
+        if missing:
+            raise RuntimeError(
+                f"Database predates migrations and is missing tables {sorted(missing)}; "
+                "recreate it or add them before upgrading"
+            )
+        logger.info(f"Stamping existing database at baseline revision {BASELINE_REVISION}")
+        command.stamp(config, BASELINE_REVISION)
+
+    command.upgrade(config, revision)
+    logger.info(f"Database schema upgraded to {revision}")
@@ -1,5 +1,5 @@
 # backend/app/db/models.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Float, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from app.db.database import Base
@@ -14,6 +14,9 @@ class Doctor(Base):
 
 class CareBuddy(Base):
     __tablename__ = 'care_buddies'
+    __table_args__ = (
+        Index('ix_care_buddies_doctor_id', 'doctor_id'),
+    )
     id = Column(Integer, primary_key=True)
     bid = Column(String(6), unique=True)
     name = Column(String(100))
@@ -25,6 +28,10 @@ class CareBuddy(Base):
 
 class UserSession(Base):
     __tablename__ = 'user_sessions'
+    __table_args__ = (
+        Index('ix_user_sessions_phone_number', 'phone_number'),
+        Index('ix_user_sessions_buddy_id_last_active', 'buddy_id', 'last_active'),
+    )
     id = Column(Integer, primary_key=True)
     phone_number = Column(String(20))
     buddy_id = Column(Integer, ForeignKey('care_buddies.id'))
@@ -35,6 +42,10 @@ class UserSession(Base):
 
 class Conversation(Base):
     __tablename__ = 'conversations'
+    __table_args__ = (
+        Index('ix_conversations_buddy_id_timestamp', 'buddy_id', 'timestamp'),
+        Index('ix_conversations_user_session_id_timestamp', 'user_session_id', 'timestamp'),
+    )
     id = Column(Integer, primary_key=True)
     buddy_id = Column(Integer, ForeignKey('care_buddies.id'))
     user_session_id = Column(Integer, ForeignKey('user_sessions.id'))
@@ -47,9 +58,72 @@ class Conversation(Base):
 
 class Document(Base):
     __tablename__ = 'documents'
+    __table_args__ = (
+        Index('ix_documents_buddy_id', 'buddy_id'),
+    )
     id = Column(Integer, primary_key=True)
     buddy_id = Column(Integer, ForeignKey('care_buddies.id'))
     filename = Column(String(255))
     content = Column(Text)
     upload_date = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    care_buddy = relationship("CareBuddy", back_populates="documents")
\ No newline at end of file
+    version = Column(Integer, default=1)
+    content_hash = Column(String(64), nullable=True)  # sha256 of the uploaded file
+    care_buddy = relationship("CareBuddy", back_populates="documents")
+    chunks = relationship("DocumentChunk", back_populates="document", cascade="all, delete-orphan")
+
+class DocumentChunk(Base):
+    """A chunk stored in the vector index, identified by the hash of its text"""
+    __tablename__ = 'document_chunks'
+    __table_args__ = (
+        Index('ix_document_chunks_document_id_chunk_hash', 'document_id', 'chunk_hash', unique=True),
+    )
+    id = Column(Integer, primary_key=True)
+    document_id = Column(Integer, ForeignKey('documents.id'))
+    chunk_hash = Column(String(64))
+    chunk_index = Column(Integer)  # Position in the version that added it
+    text = Column(Text)  # Indexed by document_chunks_fts on SQLite
+    version = Column(Integer)  # Document version that added it
+    document = relationship("Document", back_populates="chunks")
+
+class IngestJob(Base):
+    __tablename__ = 'ingest_jobs'
+    id = Column(String(32), primary_key=True)
+    buddy_id = Column(Integer, ForeignKey('care_buddies.id'))
+    status = Column(String(20), default="queued")  # queued, running, completed, partial, failed
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    finished_at = Column(DateTime, nullable=True)
+    files = relationship("IngestFile", back_populates="job")
+
+class IngestFile(Base):
+    __tablename__ = 'ingest_files'
+    __table_args__ = (
+        Index('ix_ingest_files_job_id', 'job_id'),
+    )
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String(32), ForeignKey('ingest_jobs.id'))
+    filename = Column(String(255))
+    path = Column(String(512))
+    status = Column(String(20), default="queued")  # queued, processing, completed, failed
+    chunks_total = Column(Integer, default=0)
+    chunks_done = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    document_id = Column(Integer, ForeignKey('documents.id'), nullable=True)
+    job = relationship("IngestJob", back_populates="files")
+
+class ConversationRollup(Base):
+    __tablename__ = 'conversation_rollups'
+    buddy_id = Column(Integer, ForeignKey('care_buddies.id'), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)  # UTC hour
+    questions = Column(Integer, default=0)
+    unique_patients = Column(Integer, default=0)
+    helpful = Column(Integer, default=0)
+    rated = Column(Integer, default=0)
+    latency_ms_sum = Column(Float, default=0.0)
+    latency_count = Column(Integer, default=0)
+
+class RollupPatient(Base):
+    """Which patients asked in each hourly bucket, for distinct counts over any range"""
+    __tablename__ = 'rollup_patients'
+    buddy_id = Column(Integer, ForeignKey('care_buddies.id'), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    user_session_id = Column(Integer, ForeignKey('user_sessions.id'), primary_key=True)
@@ -0,0 +1,165 @@
+# backend/app/db/rollups.py
+"""Hourly per-buddy conversation counters, maintained incrementally and rebuilt from history"""
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+import logging
+
+from sqlalchemy import case, delete, func, literal, select
+from sqlalchemy.orm import Session
+
+from app.db.models import Conversation, ConversationRollup, RollupPatient
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = ("hour", "day", "week", "month")
+
+# SQLite keeps DateTime as text in this layout, so bucket keys written by
+# either path compare equal
+_SQLITE_FORMATS = {
+    "hour": ("%Y-%m-%d %H:00:00.000000",),
+    "day": ("%Y-%m-%d 00:00:00.000000",),
+    "week": ("%Y-%m-%d 00:00:00.000000", "weekday 0", "-6 days"),
+    "month": ("%Y-%m-01 00:00:00.000000",),
+}
+
+def _utc_naive(timestamp: datetime) -> datetime:
+    """Timestamps are stored as naive UTC"""
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def hour_bucket(timestamp: datetime) -> datetime:
+    """Naive UTC start of the hour containing timestamp"""
+    return _utc_naive(timestamp).replace(minute=0, second=0, microsecond=0)
+
+def _insert(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+def _bucket_expr(db: Session, column, bucket: str):
+    """Truncate a timestamp column to the start of its hour, day, ISO week or month"""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc(bucket, column)
+    fmt, *modifiers = _SQLITE_FORMATS[bucket]
+    return func.strftime(fmt, column, *modifiers)
+
+def _as_datetime(value) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+def record_conversation(db: Session, buddy_id: int, user_session_id: int, timestamp: datetime,
+                        latency_seconds: Optional[float] = None, helpful: Optional[bool] = None):
+    """Add one answered question to its hourly bucket; the caller commits"""
+    insert = _insert(db)
+    bucket_start = hour_bucket(timestamp)
+
+    new_patient = db.execute(
+        insert(RollupPatient).values(
+            buddy_id=buddy_id,
+            bucket_start=bucket_start,
+            user_session_id=user_session_id
+        ).on_conflict_do_nothing()
+    ).rowcount == 1
+
+    counts = {
+        "questions": 1,
+        "unique_patients": int(new_patient),
+        "helpful": int(helpful is True),
+        "rated": int(helpful is not None),
+        "latency_ms_sum": latency_seconds * 1000 if latency_seconds is not None else 0.0,
+        "latency_count": int(latency_seconds is not None),
+    }
+    table = ConversationRollup.__table__
+    statement = insert(ConversationRollup).values(buddy_id=buddy_id, bucket_start=bucket_start, **counts)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.buddy_id, table.c.bucket_start],
+        set_={name: table.c[name] + statement.excluded[name] for name in counts}
+    ))
+
+def rebuild_rollups(db: Session, since: Optional[datetime] = None) -> int:
+    """Recompute rollups from the conversations table, from the hour containing since onwards.
+
+    Response latency is not stored on conversations, so rebuilt buckets only
+    carry latency for the answers recorded after the rebuild.
+    """
+    conversations = select(Conversation).where(Conversation.response.is_not(None))
+    if since is not None:
+        since = hour_bucket(since)
+        conversations = conversations.where(Conversation.timestamp >= since)
+        db.execute(delete(RollupPatient).where(RollupPatient.bucket_start >= since))
+        db.execute(delete(ConversationRollup).where(ConversationRollup.bucket_start >= since))
+    else:
+        db.execute(delete(RollupPatient))
+        db.execute(delete(ConversationRollup))
+    answered = conversations.subquery()
+
+    hour = _bucket_expr(db, answered.c.timestamp, "hour").label("bucket_start")
+    db.execute(RollupPatient.__table__.insert().from_select(
+        ["buddy_id", "bucket_start", "user_session_id"],
+        select(answered.c.buddy_id, hour, answered.c.user_session_id).distinct()
+    ))
+    result = db.execute(ConversationRollup.__table__.insert().from_select(
+        ["buddy_id", "bucket_start", "questions", "unique_patients", "helpful", "rated",
+         "latency_ms_sum", "latency_count"],
+        select(
+            answered.c.buddy_id,
+            hour,
+            func.count(),
+            func.count(func.distinct(answered.c.user_session_id)),
+            func.coalesce(func.sum(case((answered.c.helpful.is_(True), 1), else_=0)), 0),
+            func.count(answered.c.helpful),
+            literal(0.0),
+            literal(0)
+        ).group_by(answered.c.buddy_id, hour)
+    ))
+    db.commit()
+    logger.info(f"Rebuilt {result.rowcount} rollup buckets")
+    return result.rowcount
+
+def timeseries(db: Session, buddy_ids: Sequence[int], start: datetime, end: datetime,
+               bucket: str = "day") -> List[Dict]:
+    """Counters per bucket over [start, end) for the given buddies, read from the rollups only"""
+    start, end = hour_bucket(start), _utc_naive(end)
+    key = _bucket_expr(db, ConversationRollup.bucket_start, bucket).label("bucket")
+    rows = db.execute(
+        select(
+            key,
+            func.sum(ConversationRollup.questions),
+            func.sum(ConversationRollup.unique_patients),
+            func.sum(ConversationRollup.helpful),
+            func.sum(ConversationRollup.rated),
+            func.sum(ConversationRollup.latency_ms_sum),
+            func.sum(ConversationRollup.latency_count)
+        ).where(
+            ConversationRollup.buddy_id.in_(buddy_ids),
+            ConversationRollup.bucket_start >= start,
+            ConversationRollup.bucket_start < end
+        ).group_by(key).order_by(key)
+    ).all()
+
+    # Hourly counts already are distinct; wider buckets recount across hours
+    patients = {}
+    if bucket != "hour":
+        patient_key = _bucket_expr(db, RollupPatient.bucket_start, bucket).label("bucket")
+        patients = dict(db.execute(
+            select(patient_key, func.count(func.distinct(RollupPatient.user_session_id))).where(
+                RollupPatient.buddy_id.in_(buddy_ids),
+                RollupPatient.bucket_start >= start,
+                RollupPatient.bucket_start < end
+            ).group_by(patient_key)
+        ).all())
+
+    return [
+        {
+            "bucket_start": _as_datetime(key).isoformat(),
+            "questions": questions,
+            "unique_patients": patients.get(key, unique),
+            "helpful": helpful,
+            "rated": rated,
+            "average_rating": round((helpful / rated * 5) if rated > 0 else 0, 1),
+            "average_latency_ms": round(latency_sum / latency_count, 1) if latency_count else None
+        }
+        for key, questions, unique, helpful, rated, latency_sum, latency_count in rows
+    ]
@@ -1,26 +1,5 @@
 # backend/app/db/session.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-import logging
+# Kept for existing imports; the engine and sessions live in app.db.database
+from app.db.database import engine, SessionLocal, get_db
 
-logger = logging.getLogger(__name__)
-
-# Create SQLite database URL
-DATABASE_URL = "sqlite:///carebuddy.db"
-
-# Create engine
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False}  # Needed for SQLite
-)
-
-# Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+__all__ = ["engine", "SessionLocal", "get_db"]
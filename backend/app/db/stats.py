@@ -0,0 +1,65 @@
+# backend/app/db/stats.py
+"""Dashboard statistics computed with grouped queries inside the database"""
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from app.db.models import CareBuddy, Conversation, UserSession
+
+def _helpful_sum():
+    return func.coalesce(func.sum(case((Conversation.helpful.is_(True), 1), else_=0)), 0)
+
+def buddy_stats(db: Session, buddy_id: int, active_since: datetime) -> Dict:
+    """Question counts, ratings and active patients for one buddy in a single query"""
+    active_patients = select(func.count(UserSession.id)).where(
+        UserSession.buddy_id == buddy_id,
+        UserSession.last_active >= active_since
+    ).scalar_subquery()
+
+    total_questions, helpful_responses, total_rated, active = db.execute(
+        select(
+            func.count(Conversation.id),
+            _helpful_sum(),
+            func.count(Conversation.helpful),
+            active_patients
+        ).where(Conversation.buddy_id == buddy_id)
+    ).one()
+
+    return {
+        "total_questions": total_questions,
+        "active_patients": active,
+        "response_rate": round((helpful_responses / total_rated * 100) if total_rated > 0 else 0, 1),
+        "average_rating": round((helpful_responses / total_rated * 5) if total_rated > 0 else 0, 1)
+    }
+
+def doctor_impact(db: Session, doctor_id: int, start_date: datetime) -> Dict:
+    """Buddy, conversation and patient totals across one doctor's buddies in a single query"""
+    doctor_buddies = select(CareBuddy.id).where(CareBuddy.doctor_id == doctor_id)
+
+    total_buddies = select(func.count(CareBuddy.id)).where(
+        CareBuddy.doctor_id == doctor_id
+    ).scalar_subquery()
+    total_patients = select(func.count(func.distinct(UserSession.phone_number))).where(
+        UserSession.buddy_id.in_(doctor_buddies)
+    ).scalar_subquery()
+
+    buddies, conversations, helpful, patients = db.execute(
+        select(
+            total_buddies,
+            func.count(Conversation.id),
+            _helpful_sum(),
+            total_patients
+        ).where(
+            Conversation.buddy_id.in_(doctor_buddies),
+            Conversation.timestamp >= start_date
+        )
+    ).one()
+
+    return {
+        "total_buddies": buddies,
+        "total_conversations": conversations,
+        "total_patients": patients,
+        "average_rating": (helpful / conversations * 5) if conversations > 0 else 0
+    }
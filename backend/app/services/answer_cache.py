@@ -0,0 +1,179 @@
+# backend/app/services/answer_cache.py
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+
+from app.services.shared_counters import SharedCounters
+
+logger = logging.getLogger(__name__)
+
+
+class _BuddyAnswers:
+    """Cached answers for one buddy, with query vectors stacked for a single matmul"""
+
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.queries: List[str] = []
+        self.answers: List[str] = []
+        self.created_at: List[float] = []
+        self.last_hit: List[float] = []
+        self.latencies: List[float] = []
+        self.vectors: Optional[np.ndarray] = None
+
+    def remove(self, indexes: List[int]):
+        dropped = set(int(i) for i in indexes)
+        keep = [i for i in range(len(self.answers)) if i not in dropped]
+        for name in ("queries", "answers", "created_at", "last_hit", "latencies"):
+            values = getattr(self, name)
+            setattr(self, name, [values[i] for i in keep])
+        self.vectors = self.vectors[keep] if keep else None
+
+
+class SemanticAnswerCache:
+    """Per-buddy cache of answers, matched by query embedding similarity.
+
+    A lookup hits when a stored query for the same buddy has cosine
+    similarity >= threshold with the new one. Entries expire after
+    ttl_seconds, the least recently hit ones are evicted beyond
+    max_entries per buddy, and invalidate() drops a buddy's entries when
+    its documents change. With shared counters, an invalidation in any
+    worker process drops the entries in all of them.
+
+    Follow-up questions are cached on the standalone question they were
+    condensed to, keyed by the raw question and the history it followed,
+    so asking the same follow-up again skips the condensing LLM call.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: int = 86400, max_entries: int = 500,
+                 counters: Optional[SharedCounters] = None):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._buddies: Dict[int, _BuddyAnswers] = {}
+        # Bumped on invalidation so answers generated from stale documents are not stored
+        self._generations: Dict[int, int] = {}
+        # (buddy id, follow-up fingerprint) -> standalone question, least recently used first
+        self._condensed: "OrderedDict[Tuple[int, str], str]" = OrderedDict()
+        self.counters = counters
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, entries: _BuddyAnswers, now: float):
+        expired = [i for i, created in enumerate(entries.created_at) if now - created > self.ttl_seconds]
+        if expired:
+            entries.remove(expired)
+
+    def lookup(self, buddy_id: int, query_vector: List[float]) -> Optional[str]:
+        """Return a stored answer for a semantically equivalent query, if any"""
+        now = time.time()
+        with self._lock:
+            entries = self._buddies.get(buddy_id)
+            if entries is not None and entries.generation != self.generation(buddy_id):
+                # Another worker changed this buddy's documents
+                del self._buddies[buddy_id]
+                entries = None
+            if entries is not None:
+                self._expire(entries, now)
+            if entries is None or entries.vectors is None:
+                self.misses += 1
+                return None
+            scores = entries.vectors @ self._normalize(query_vector)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            entries.last_hit[best] = now
+            self.hits += 1
+            self.latency_saved += entries.latencies[best]
+            logger.debug("Answer cache hit for buddy %s (similarity %.3f)", buddy_id, scores[best])
+            return entries.answers[best]
+
+    @staticmethod
+    def followup_key(query: str, chat_history: List[Dict]) -> str:
+        """Fingerprint of a follow-up question and the turns it follows"""
+        payload = json.dumps([query, [(t["user"], t["assistant"]) for t in chat_history]])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def condensed(self, buddy_id: int, key: str) -> Optional[str]:
+        """The standalone question this follow-up was condensed to before, if remembered"""
+        with self._lock:
+            question = self._condensed.get((buddy_id, key))
+            if question is not None:
+                self._condensed.move_to_end((buddy_id, key))
+            return question
+
+    def remember_condensed(self, buddy_id: int, key: str, question: str):
+        # Condensing depends only on the question and history, so invalidation keeps these
+        with self._lock:
+            self._condensed[(buddy_id, key)] = question
+            self._condensed.move_to_end((buddy_id, key))
+            while len(self._condensed) > self.max_entries:
+                self._condensed.popitem(last=False)
+
+    def generation(self, buddy_id: int) -> int:
+        # Both parts only grow, so any invalidation anywhere changes the sum
+        shared = self.counters.get(buddy_id) if self.counters is not None else 0
+        return self._generations.get(buddy_id, 0) + shared
+
+    def store(
+        self,
+        buddy_id: int,
+        query: str,
+        query_vector: List[float],
+        answer: str,
+        latency: float,
+        generation: int,
+    ):
+        """Remember an answer and how long it took to generate"""
+        now = time.time()
+        vector = self._normalize(query_vector).reshape(1, -1)
+        with self._lock:
+            if generation != self.generation(buddy_id):
+                return
+            entries = self._buddies.get(buddy_id)
+            if entries is None or entries.generation != generation:
+                entries = self._buddies[buddy_id] = _BuddyAnswers(generation)
+            entries.queries.append(query)
+            entries.answers.append(answer)
+            entries.created_at.append(now)
+            entries.last_hit.append(now)
+            entries.latencies.append(latency)
+            entries.vectors = vector if entries.vectors is None else np.vstack([entries.vectors, vector])
+            if len(entries.answers) > self.max_entries:
+                overflow = len(entries.answers) - self.max_entries
+                entries.remove(list(np.argsort(entries.last_hit)[:overflow]))
+
+    def invalidate(self, buddy_id: int):
+        """Forget every answer for a buddy, e.g. after its documents change"""
+        with self._lock:
+            self._generations[buddy_id] = self._generations.get(buddy_id, 0) + 1
+            if self.counters is not None:
+                self.counters.bump(buddy_id)
+            if self._buddies.pop(buddy_id, None) is not None:
+                logger.debug(f"Invalidated answer cache for buddy {buddy_id}")
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = sum(len(b.answers) for b in self._buddies.values())
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+            "latency_saved_seconds": round(self.latency_saved, 3),
+            "entries": entries,
+        }
@@ -1,28 +1,211 @@
 # backend/app/services/carebuddy_rag.py
-from typing import Optional, Dict, List
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Iterable, Iterator, Optional, Dict, List, Tuple
+import hashlib
 import os
 import logging
-from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_pinecone import PineconeVectorStore
-from langchain.chains import ConversationalRetrievalChain
-from pinecone import Pinecone, ServerlessSpec
+import random
+import threading
+import time
+from app.core.config import settings
+from app.db.chunk_search import fts_available, lexical_search
+from app.services.answer_cache import SemanticAnswerCache
 
 logger = logging.getLogger(__name__)
 
+# Enhanced safety prompt
+SAFETY_PROMPT = """
+You are a medical information assistant with access to specific doctor-provided documents.
+Analyze the retrieved documents carefully and:
+1. IF you find relevant information that DIRECTLY answers the query, provide it and cite the source
+2. IF you find related but indirect information, still provide a "no direct information" response
+3. IF you find NO relevant information, respond with the standard message
+
+Please scrutinize the following query against your available documents: {query}
+"""
+
+ANSWER_SYSTEM_PROMPT = """Use the following pieces of context to answer the user's question.
+If you don't know the answer, just say that you don't know, don't try to make up an answer.
+----------------
+{context}"""
+
+CONDENSE_PROMPT = """Given the following conversation and a follow up question, rephrase the follow up question to be a standalone question, in its original language.
+
+Chat History:
+{chat_history}
+Follow Up Input: {question}
+Standalone question:"""
+
+SUMMARY_PROMPT = """Summarize this conversation between a patient and their care assistant in at most {max_words} words.
+Keep symptoms, medications, procedures and advice already given; drop greetings and repetition.
+
+Summary so far:
+{summary}
+
+New turns:
+{turns}
+
+Updated summary:"""
+
+@dataclass
+class ChunkSync:
+    """Outcome of storing a document version, by chunk hash"""
+    chunks: Dict[str, int]  # Every chunk of this version, with its first position
+    added: List[str]  # Embedded and upserted
+    removed: List[str]  # Deleted from the index
+
+@dataclass
+class RAGResult:
+    """An answer with the chunks it was grounded on and seconds spent per stage"""
+    answer: str
+    sources: List[Dict]
+    timings: Dict[str, float]
+    cached: bool = False
+    retrieval: str = "vector"  # "vector", "hybrid", "lexical" or "cache"
+    usage: Dict[str, int] = field(default_factory=dict)  # Token counts reported by the LLM
+
+def buddy_namespace(buddy_id: int) -> str:
+    """Each buddy's chunks live in their own vector namespace"""
+    return f"buddy-{buddy_id}"
+
+def document_key(document_id: int) -> str:
+    """doc_id stored with a document's chunks"""
+    return f"doc-{document_id}"
+
+def chunk_hash(text: str) -> str:
+    """Identity of a chunk's content; whitespace-only edits keep the same hash"""
+    from app.services.embedding_cache import normalize_text
+
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+def chunk_id(doc_id: str, digest: str) -> str:
+    """Vector id of a chunk, prefixed by its document so one document can be listed and deleted"""
+    return f"{doc_id}#{digest}"
+
 class CareBuddyRAG:
+    """Retrieval-augmented answering over doctor documents.
+
+    Construction is cheap: LangChain imports, OpenAI clients and the vector
+    store handshake happen in warm_up(), which the app lifespan runs in the
+    background and every public method triggers on first use.
+    """
+
     def __init__(self):
+        self.ready = False
+        self.init_error: Optional[str] = None
+        self.init_seconds: Optional[float] = None
+        self._init_lock = threading.Lock()
+        
+        # Answers to repeated questions, scoped per buddy
+        self.answer_cache = SemanticAnswerCache(
+            threshold=settings.ANSWER_CACHE_THRESHOLD,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES
+        )
+        
+        # Called with (buddy_id, result) after every answer, e.g. by metrics and load tests
+        self.answer_listeners: List[Callable[[int, "RAGResult"], None]] = []
+
+        # Medical-specific text splitter settings
+        self.chunk_size = 500
+        self.chunk_overlap = 100
+
+    def warm_up(self):
+        """Import providers and connect to them; safe to call from several threads"""
+        if self.ready:
+            return
+        with self._init_lock:
+            if self.ready:
+                return
+            try:
+                self._initialize()
+                self.init_error = None
+                self.ready = True
+            except Exception as e:
+                self.init_error = str(e)
+                logger.error(f"CareBuddyRAG initialization failed: {str(e)}", exc_info=True)
+                raise
+
+    def _initialize(self):
+        from dotenv import load_dotenv
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        from app.services.embedding_cache import CachedEmbeddings
+
+        start_time = time.perf_counter()
         load_dotenv()
         logger.info("Initializing CareBuddyRAG")
         
-        # Initialize OpenAI
-        self.embeddings = OpenAIEmbeddings()
-        self.llm = ChatOpenAI(
-            temperature=0.1,  # Low temperature for medical advice
-            model_name="gpt-4"  # Using GPT-4 for higher accuracy
+        # Initialize OpenAI, with repeated texts served from the embedding cache
+        openai_embeddings, self.llm = self._create_providers()
+        self.embeddings = CachedEmbeddings(
+            openai_embeddings,
+            model_name=openai_embeddings.model,
+            path=settings.EMBEDDING_CACHE_PATH,
+            memory_items=settings.EMBEDDING_CACHE_MEMORY_ITEMS,
+            max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES
         )
         
+        # Initialize the vectorstore
+        self.vectorstore = self._create_vectorstore()
+
+        # Query embeddings run here so retrieval can stop waiting on a slow provider
+        self._embed_pool = ThreadPoolExecutor(max_workers=settings.MESSAGE_WORKERS, thread_name_prefix="embed")
+        # Document embedding requests, shared by every ingestion worker to bound load on the provider
+        self._ingest_pool = ThreadPoolExecutor(
+            max_workers=settings.INGEST_EMBED_CONCURRENCY,
+            thread_name_prefix="ingest-embed"
+        )
+        
+        # Medical-specific text splitter
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
+            separators=["\n\n", "\n", ". ", "? ", "! ", ";"]
+        )
+        
+        self.init_seconds = time.perf_counter() - start_time
+        logger.info(f"CareBuddyRAG initialization complete in {self.init_seconds:.2f}s")
+
+    def _create_providers(self):
+        """Embeddings and chat model: OpenAI, or local stand-ins when settings.OPENAI_FAKE is set"""
+        if settings.OPENAI_FAKE:
+            from app.services.fakes import FakeChatModel, FakeEmbeddings
+
+            logger.info("Using local stand-ins for OpenAI")
+            return (
+                FakeEmbeddings(latency=settings.OPENAI_FAKE_EMBED_LATENCY),
+                FakeChatModel(
+                    latency=settings.OPENAI_FAKE_LLM_LATENCY,
+                    token_latency=settings.OPENAI_FAKE_TOKEN_LATENCY
+                )
+            )
+
+        from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+
+        llm = ChatOpenAI(
+            temperature=0.1,  # Low temperature for medical advice
+            model_name="gpt-4",  # Using GPT-4 for higher accuracy
+            stream_usage=True  # Token counts on the last streamed chunk
+        )
+        return OpenAIEmbeddings(), llm
+
+    def _create_vectorstore(self):
+        """Build the vector store backend selected by settings.VECTOR_STORE"""
+        if settings.VECTOR_STORE == "local":
+            from app.services.vectorstore import LocalVectorStore
+
+            logger.info(f"Using local vector store at {settings.LOCAL_VECTOR_DIR}")
+            return LocalVectorStore(
+                embedding=self.embeddings,
+                persist_directory=settings.LOCAL_VECTOR_DIR,
+                text_key="text"
+            )
+
+        from langchain_pinecone import PineconeVectorStore
+        from pinecone import Pinecone, ServerlessSpec
+
         # Initialize Pinecone
         self.pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
         self.index_name = "carebuddy-docs"
@@ -41,133 +224,411 @@ class CareBuddyRAG:
         # Get the index
         self.index = self.pc.Index(self.index_name)
         
-        # Initialize the vectorstore
-        self.vectorstore = PineconeVectorStore(
+        return PineconeVectorStore(
             embedding=self.embeddings,
             index=self.index,
-            text_key="text",
-            namespace="medical"
-        )
-        
-        # Initialize the retrieval chain
-        self.chain = ConversationalRetrievalChain.from_llm(
-            llm=self.llm,
-            retriever=self.vectorstore.as_retriever(
-                search_kwargs={"k": 3}  # Retrieve top 3 most relevant chunks
-            )
-        )
-        
-        # Medical-specific text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=100,
-            separators=["\n\n", "\n", ". ", "? ", "! ", ";"]
+            text_key="text"
         )
-        
-        logger.info("CareBuddyRAG initialization complete")
 
-    def process_doctor_document(self, doc_text: str, doc_id: str) -> bool:
+    def split_text_stream(self, text_blocks: Iterable[str]) -> Iterator[str]:
+        """Split text arriving in blocks into chunks, holding only a bounded window in memory"""
+        self.warm_up()
+        window = self.chunk_size * 8
+        buffer = ""
+        for block in text_blocks:
+            buffer += block
+            while len(buffer) >= window:
+                chunks = self.text_splitter.split_text(buffer)
+                if len(chunks) < 2:
+                    # No separator in the whole window; hard-cut so the buffer stays bounded
+                    yield buffer[:self.chunk_size]
+                    buffer = buffer[self.chunk_size - self.chunk_overlap:]
+                    continue
+                # Carry the last chunk over so it can merge with the next block
+                yield from chunks[:-1]
+                carry_start = buffer.rfind(chunks[-1])
+                if carry_start <= 0:
+                    carry_start = max(1, len(buffer) - len(chunks[-1]))
+                buffer = buffer[carry_start:]
+        if buffer.strip():
+            yield from self.text_splitter.split_text(buffer)
+
+    def process_doctor_document(
+        self,
+        doc_text: str,
+        buddy_id: int,
+        doc_id: str
+    ) -> bool:
         """Process and store a doctor's document"""
+        self.warm_up()
+        logger.debug(f"Processing document {doc_id}")
+        logger.debug(f"Document content preview: {doc_text[:200]}...")
+        try:
+            self.process_document_chunks(self.text_splitter.split_text(doc_text), buddy_id, doc_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error processing document: {str(e)}", exc_info=True)
+            return False
+
+    def process_document_chunks(
+        self,
+        chunks: Iterable[str],
+        buddy_id: int,
+        doc_id: str,
+        existing_hashes: Iterable[str] = (),
+        on_progress: Optional[Callable[[int, List[Dict]], None]] = None
+    ) -> ChunkSync:
+        """Store a document's chunks, consuming them lazily one embedding batch at a time.
+
+        Up to INGEST_EMBED_CONCURRENCY batches are embedded concurrently while
+        finished ones are upserted in order on this thread, so embedding and
+        upserting overlap. Chunks whose hash is in existing_hashes are already
+        in the index and are skipped; existing ones that no longer occur are
+        deleted at the end. on_progress(chunks_seen, stored_batch) runs after
+        each upsert, on this thread. Errors propagate once the embeddings
+        still in flight are cancelled.
+        """
+        pending: Deque[Tuple[int, List[Dict], Future]] = deque()
         try:
-            logger.debug(f"Processing document {doc_id}")
-            logger.debug(f"Document content preview: {doc_text[:200]}...")
-            
-            # Split the document into chunks
-            chunks = self.text_splitter.split_text(doc_text)
-            logger.debug(f"Split into {len(chunks)} chunks")
-            logger.debug(f"First chunk sample: {chunks[0][:100]}...")
-            
-            # Add metadata to each chunk
-            texts_with_metadata = [
-                {
+            self.warm_up()
+            batch_size = settings.INGEST_BATCH_SIZE
+            existing = set(existing_hashes)
+            seen: Dict[str, int] = {}
+            added = []
+            batch = []
+
+            def store_oldest():
+                chunks_seen, stored, embedding = pending.popleft()
+                added.extend(self._upsert_embeddings(buddy_id, stored, embedding.result()))
+                if on_progress:
+                    on_progress(chunks_seen, stored)
+
+            def submit(chunks_seen: int, batch: List[Dict]):
+                pending.append((chunks_seen, batch, self._ingest_pool.submit(self._embed_batch, [t["text"] for t in batch])))
+                # One batch beyond the pool's width waits queued, so the pool never idles during an upsert
+                while len(pending) > settings.INGEST_EMBED_CONCURRENCY:
+                    store_oldest()
+
+            for i, chunk in enumerate(chunks):
+                digest = chunk_hash(chunk)
+                # Repeated text is stored once
+                if digest in seen:
+                    continue
+                seen[digest] = i
+                if digest in existing:
+                    continue
+                batch.append({
                     "text": chunk,
                     "doc_id": doc_id,
                     "chunk_index": i,
+                    "chunk_hash": digest,
                     "source": "doctor_document"  # Add source
-                }
-                for i, chunk in enumerate(chunks)
-            ]
-            
-            # Get embeddings for debugging
-            first_embedding = self.embeddings.embed_query(chunks[0])
-            logger.debug(f"First embedding shape: {len(first_embedding)}")
-            
-            # Store in vector database with explicit namespace
+                })
+                if len(batch) == batch_size:
+                    submit(i + 1, batch)
+                    batch = []
+            if batch:
+                submit(len(seen), batch)
+            while pending:
+                store_oldest()
+
+            if not seen:
+                raise ValueError(f"Document {doc_id} produced no chunks")
+
+            removed = sorted(existing - seen.keys())
+            if removed:
+                self.delete_chunks(buddy_id, [chunk_id(doc_id, digest) for digest in removed])
+            logger.info(
+                f"Successfully processed and stored document {doc_id} ({len(added)} chunks embedded, "
+                f"{len(seen) - len(added)} unchanged, {len(removed)} removed)"
+            )
+            return ChunkSync(chunks=seen, added=added, removed=removed)
+
+        except Exception:
+            for _, _, embedding in pending:
+                embedding.cancel()
+            raise
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch of chunks, backing off exponentially when the provider fails or rate limits"""
+        for attempt in range(settings.INGEST_EMBED_MAX_RETRIES + 1):
             try:
-                self.vectorstore.add_texts(
-                    texts=[t["text"] for t in texts_with_metadata],
-                    metadatas=texts_with_metadata,
-                    namespace="medical"
-                )
-                logger.info(f"Successfully processed and stored document {doc_id}")
-                
-                # Verify storage
-                results = self.vectorstore.similarity_search(
-                    chunks[0][:100],
-                    k=1,
-                    namespace="medical"
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt == settings.INGEST_EMBED_MAX_RETRIES:
+                    raise
+                delay = settings.INGEST_EMBED_BACKOFF_SECONDS * (2 ** attempt) + random.uniform(0, 0.25)
+                logger.warning(f"Embedding {len(texts)} chunks failed ({type(e).__name__}: {e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+    def _upsert_embeddings(self, buddy_id: int, batch: List[Dict], vectors: List[List[float]]) -> List[str]:
+        """Upsert one embedded batch of chunks in the buddy's namespace"""
+        namespace = buddy_namespace(buddy_id)
+        ids = [chunk_id(t["doc_id"], t["chunk_hash"]) for t in batch]
+        if settings.VECTOR_STORE == "local":
+            self.vectorstore.add_embeddings(
+                texts=[t["text"] for t in batch],
+                embeddings=vectors,
+                metadatas=batch,
+                ids=ids,
+                namespace=namespace
+            )
+        else:
+            # The chunk dicts carry their text under the "text" key the store reads back
+            records = [{"id": i, "values": v, "metadata": t} for i, v, t in zip(ids, vectors, batch)]
+            for start in range(0, len(records), settings.INGEST_UPSERT_BATCH_SIZE):
+                self.index.upsert(
+                    vectors=records[start:start + settings.INGEST_UPSERT_BATCH_SIZE],
+                    namespace=namespace
                 )
-                logger.debug(f"Verification search results: {results}")
-                
-                return True
+        return [t["chunk_hash"] for t in batch]
+
+    def delete_chunks(self, buddy_id: int, ids: List[str]):
+        """Remove chunks by id from the buddy's namespace"""
+        self.warm_up()
+        self.vectorstore.delete(ids=ids, namespace=buddy_namespace(buddy_id))
+
+    def delete_document(self, buddy_id: int, doc_id: str):
+        """Remove one document's chunks from the buddy's namespace"""
+        self.warm_up()
+        namespace = buddy_namespace(buddy_id)
+        if settings.VECTOR_STORE == "local":
+            self.vectorstore.delete(filter={"doc_id": doc_id}, namespace=namespace)
+        else:
+            # Serverless indexes can't delete by metadata, but can list ids by prefix
+            for ids in self.index.list(prefix=f"{doc_id}#", namespace=namespace):
+                self.index.delete(ids=ids, namespace=namespace)
+        logger.info(f"Deleted chunks of document {doc_id} from {namespace}")
+
+    def delete_buddy(self, buddy_id: int):
+        """Remove every chunk stored for a buddy"""
+        self.warm_up()
+        namespace = buddy_namespace(buddy_id)
+        self.vectorstore.delete(delete_all=True, namespace=namespace)
+        logger.info(f"Deleted namespace {namespace}")
+
+    def _condense(self, query: str, chat_history: List[Dict]) -> str:
+        """Rewrite a follow-up question as a standalone one, using the conversation so far"""
+        history = "\n".join(
+            f"Human: {msg['user']}\nAssistant: {msg['assistant']}" for msg in chat_history
+        )
+        return self.llm.invoke(CONDENSE_PROMPT.format(chat_history=history, question=query)).content
+
+    def summarize_history(self, summary: str, turns: List[Dict]) -> str:
+        """Fold older turns into a short rolling summary of the conversation"""
+        self.warm_up()
+        formatted = "\n".join(f"Patient: {t['user']}\nAssistant: {t['assistant']}" for t in turns)
+        return self.llm.invoke(SUMMARY_PROMPT.format(
+            max_words=max(settings.MEMORY_TOKEN_BUDGET // 6, 30),
+            summary=summary or "(none)",
+            turns=formatted
+        )).content.strip()
+
+    def stream_answer(
+        self,
+        query: str,
+        buddy_id: int,
+        chat_history: List[Dict] = None
+    ) -> Iterator[Tuple[str, object]]:
+        """Answer a query with one retrieval and one generation call, as (event, data) pairs.
+
+        Yields ("sources", [...]) once retrieval is done, ("token", text) as
+        the LLM generates, then ("done", {"cached", "retrieval", "timings", "usage"})
+        with seconds per stage, to the first token and in total. Each answer is
+        also passed to the answer_listeners.
+        """
+        self.warm_up()
+        logger.debug("Processing query for buddy %s (%d chars)", buddy_id, len(query))
+        start_time = time.perf_counter()
+        timings = {}
+
+        def stage(name: str, fn, *args, **kwargs):
+            started = time.perf_counter()
+            result = fn(*args, **kwargs)
+            timings[name] = time.perf_counter() - started
+            return result
+
+        # Condensing needs an LLM call, so only follow-ups pay for it, and a repeated one only once
+        question = query
+        if chat_history:
+            followup_key = self.answer_cache.followup_key(query, chat_history)
+            question = self.answer_cache.condensed(buddy_id, followup_key)
+            if question is None:
+                question = stage("condense", self._condense, query, chat_history)
+                self.answer_cache.remember_condensed(buddy_id, followup_key, question)
+
+        # With the FTS5 index, BM25 runs while the embedding is in flight and
+        # stands in alone if the provider is slow or down
+        hybrid = settings.HYBRID_SEARCH and fts_available()
+        if hybrid:
+            embed_started = time.perf_counter()
+            embedding = self._embed_pool.submit(self.embeddings.embed_query, question)
+            lexical = stage("lexical", lexical_search, buddy_id, question, settings.HYBRID_CANDIDATES)
+            try:
+                query_vector = embedding.result(timeout=settings.EMBED_TIMEOUT_SECONDS)
+                timings["embed"] = time.perf_counter() - embed_started
             except Exception as e:
-                logger.error(f"Error storing in vectorstore: {str(e)}", exc_info=True)
-                return False
-                
-        except Exception as e:
-            logger.error(f"Error processing document: {str(e)}", exc_info=True)
-            return False
+                if not lexical:
+                    raise
+                logger.warning(f"Embedding unavailable ({type(e).__name__}: {e}); answering from lexical matches")
+                query_vector = None
+        else:
+            lexical = []
+            query_vector = stage("embed", self.embeddings.embed_query, question)
 
-    def get_response(self, query: str, chat_history: List[Dict] = None) -> str:
-        """Get a response for a user query"""
-        try:
-            logger.debug(f"Processing query: {query}")
-            
-            # First try a direct similarity search for debugging
-            similar_docs = self.vectorstore.similarity_search(
-                query,
-                k=3,
-                namespace="medical"
+        # The condensed question stands alone, so answers are cached on it either way
+        cache_generation = self.answer_cache.generation(buddy_id)
+        if query_vector is not None:
+            cached_answer = self.answer_cache.lookup(buddy_id, query_vector)
+            if cached_answer is not None:
+                yield "sources", []
+                yield "token", cached_answer
+                timings["total"] = time.perf_counter() - start_time
+                done = {"cached": True, "retrieval": "cache", "timings": timings, "usage": {}}
+                self._notify(buddy_id, RAGResult(answer=cached_answer, sources=[], **done))
+                yield "done", done
+                return
+
+        vector_hits = []
+        if query_vector is not None:
+            vector_hits = stage(
+                "search",
+                self.vectorstore.similarity_search_by_vector_with_score,
+                query_vector,
+                k=settings.HYBRID_CANDIDATES if hybrid else settings.RETRIEVAL_K,
+                namespace=buddy_namespace(buddy_id)
             )
-            logger.debug(f"Similar docs found: {len(similar_docs)}")
-            for i, doc in enumerate(similar_docs):
-                logger.debug(f"Doc {i} content: {doc.page_content[:200]}...")
-                logger.debug(f"Doc {i} metadata: {doc.metadata}")
-            
-            # Format chat history if provided
-            formatted_history = []
-            if chat_history:
-                for msg in chat_history:
-                    formatted_history.append((msg["user"], msg["assistant"]))
-                    
-            # Enhanced safety prompt
-            safety_prompt = """
-            You are a medical information assistant with access to specific doctor-provided documents.
-            Analyze the retrieved documents carefully and:
-            1. IF you find relevant information that DIRECTLY answers the query, provide it and cite the source
-            2. IF you find related but indirect information, still provide a "no direct information" response
-            3. IF you find NO relevant information, respond with the standard message
-            
-            Please scrutinize the following query against your available documents: {query}
-            """
-            
-            # Get response from chain with enhanced logging
+        if hybrid:
+            hits = stage("fuse", self._fuse, vector_hits, lexical, settings.RETRIEVAL_K)
+            retrieval = "hybrid" if query_vector is not None else "lexical"
+        else:
+            hits, retrieval = vector_hits, "vector"
+
+        logger.debug("Similar docs found: %d", len(hits))
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, (doc, score) in enumerate(hits):
+                logger.debug("Doc %d (%.3f) %s content: %.200s...", i, score, doc.metadata, doc.page_content)
+        yield "sources", [
+            {
+                "doc_id": doc.metadata.get("doc_id"),
+                "chunk_index": doc.metadata.get("chunk_index"),
+                "score": float(score),
+                "text": doc.page_content
+            }
+            for doc, score in hits
+        ]
+
+        messages = stage("prompt", self._build_messages, question, [doc for doc, _ in hits])
+
+        llm_started = time.perf_counter()
+        parts = []
+        usage = {}
+        for chunk in self.llm.stream(messages):
+            if chunk.usage_metadata:
+                usage = dict(chunk.usage_metadata)
+            if not chunk.content:
+                continue
+            if not parts:
+                timings["first_token"] = time.perf_counter() - start_time
+            parts.append(chunk.content)
+            yield "token", chunk.content
+        timings["llm"] = time.perf_counter() - llm_started
+        answer = "".join(parts)
+        logger.debug("Generated response: %d chars", len(answer))
+
+        total = time.perf_counter() - start_time
+        logger.info(
+            "Answered for buddy %s in %.0fms", buddy_id, total * 1000,
+            extra={"buddy_id": buddy_id, "retrieval": retrieval,
+                   "timings_ms": {name: round(seconds * 1000, 1) for name, seconds in timings.items()}}
+        )
+        if query_vector is not None:
+            self.answer_cache.store(
+                buddy_id,
+                question,
+                query_vector,
+                answer,
+                latency=total,
+                generation=cache_generation
+            )
+        timings["total"] = total
+        done = {"cached": False, "retrieval": retrieval, "timings": timings, "usage": usage}
+        self._notify(buddy_id, RAGResult(
+            answer=answer,
+            sources=[{"doc_id": doc.metadata.get("doc_id"), "score": float(score)} for doc, score in hits],
+            **done
+        ))
+        yield "done", done
+
+    def _notify(self, buddy_id: int, result: RAGResult):
+        for listener in self.answer_listeners:
             try:
-                response = self.chain(
-                    {"question": safety_prompt.format(query=query),
-                    "chat_history": formatted_history}
-                )
-                logger.debug(f"Generated response: {response['answer']}")
-                return response['answer']
-                
+                listener(buddy_id, result)
             except Exception as e:
-                logger.error(f"Error in chain response: {str(e)}", exc_info=True)
-                return "I encountered an error processing your query. Please try again or contact your healthcare provider."
-                
+                logger.error(f"Answer listener failed: {str(e)}")
+
+    def answer(self, query: str, buddy_id: int, chat_history: List[Dict] = None) -> RAGResult:
+        """Answer a query in one call, collecting the streamed events"""
+        sources, parts, done = [], [], {}
+        for event, data in self.stream_answer(query, buddy_id, chat_history):
+            if event == "sources":
+                sources = [{k: v for k, v in source.items() if k != "text"} for source in data]
+            elif event == "token":
+                parts.append(data)
+            else:
+                done = data
+        return RAGResult(
+            answer="".join(parts),
+            sources=sources,
+            timings=done["timings"],
+            cached=done["cached"],
+            retrieval=done["retrieval"],
+            usage=done["usage"]
+        )
+
+    @staticmethod
+    def _fuse(vector_hits: List[Tuple], lexical: List[Dict], k: int) -> List[Tuple]:
+        """Reciprocal rank fusion of vector hits and BM25 rows into the top k (document, score) pairs"""
+        from langchain_core.documents import Document as ChunkDocument
+
+        scores: Dict[str, float] = {}
+        docs = {}
+        for rank, (doc, _) in enumerate(vector_hits):
+            key = chunk_id(doc.metadata.get("doc_id"), doc.metadata.get("chunk_hash") or chunk_hash(doc.page_content))
+            scores[key] = scores.get(key, 0.0) + 1 / (settings.RRF_K + rank + 1)
+            docs[key] = doc
+        for rank, row in enumerate(lexical):
+            doc_id = document_key(row["document_id"])
+            key = chunk_id(doc_id, row["chunk_hash"])
+            scores[key] = scores.get(key, 0.0) + 1 / (settings.RRF_K + rank + 1)
+            docs.setdefault(key, ChunkDocument(
+                page_content=row["text"],
+                metadata={
+                    "text": row["text"],
+                    "doc_id": doc_id,
+                    "chunk_index": row["chunk_index"],
+                    "chunk_hash": row["chunk_hash"],
+                    "source": "doctor_document"
+                }
+            ))
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [(docs[key], scores[key]) for key in best]
+
+    @staticmethod
+    def _build_messages(question: str, docs: List) -> List[tuple]:
+        context = "\n\n".join(doc.page_content for doc in docs)
+        return [
+            ("system", ANSWER_SYSTEM_PROMPT.format(context=context)),
+            ("human", SAFETY_PROMPT.format(query=question))
+        ]
+
+    def get_response(self, query: str, buddy_id: int, chat_history: List[Dict] = None) -> str:
+        """Get a response for a user query"""
+        try:
+            return self.answer(query, buddy_id, chat_history).answer
         except Exception as e:
             logger.error(f"Error getting response: {str(e)}", exc_info=True)
             return f"I apologize, but I encountered an error. Please try again or contact your healthcare provider."
 
-    
-    
+
 rag_system = CareBuddyRAG()
\ No newline at end of file
@@ -0,0 +1,229 @@
+# backend/app/services/conversation_memory.py
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional
+import logging
+import threading
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Conversation
+from app.services.shared_counters import SharedCounters
+
+logger = logging.getLogger(__name__)
+
+Summarizer = Callable[[str, List[Dict]], str]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English)"""
+    return len(text) // 4 + 1
+
+
+def turn_tokens(turn: Dict) -> int:
+    return estimate_tokens(turn["user"]) + estimate_tokens(turn["assistant"])
+
+
+class _SessionHistory:
+    """Recent turns of one session, newest last, kept within the token budget"""
+
+    def __init__(self, turns: List[Dict], max_turns: int, version: int = 0):
+        self.turns: Deque[Dict] = deque(turns, maxlen=max_turns)
+        # The session's shared counter when these turns were last complete
+        self.version = version
+        self.summary = ""
+        # Turns trimmed from the budget and not yet folded into the summary
+        self.overflow: List[Dict] = []
+
+
+class ConversationMemory:
+    """Per-session chat history for follow-up questions.
+
+    The most recently active sessions are kept in an LRU of up to
+    max_sessions; a miss loads the latest max_turns answered turns from
+    the conversations table. History handed to the RAG is trimmed to
+    token_budget, oldest turns first. With a summarizer, trimmed turns
+    are folded into a rolling summary that is sent ahead of the turns.
+
+    Turns reach the database through the write-behind recorder, so a load
+    also takes the session's turns from pending_turns, which returns what
+    the recorder holds but has not yet committed. The recorder calls
+    written() after each commit. With shared counters, written() tells
+    the other worker processes to reload those sessions. They only see
+    the change once the turn is in the database.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 5000,
+        max_turns: int = 20,
+        token_budget: int = 1000,
+        summarizer: Optional[Summarizer] = None,
+        counters: Optional[SharedCounters] = None
+    ):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summarizer = summarizer
+        self.counters = counters
+        # session id -> answered turns not yet in the database, oldest first
+        self.pending_turns: Optional[Callable[[int], List[Dict]]] = None
+        self._sessions: "OrderedDict[int, _SessionHistory]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _version(self, session_id: int) -> int:
+        return self.counters.get(session_id) if self.counters is not None else 0
+
+    def _load(self, session_id: int, db: Session) -> _SessionHistory:
+        # Read the version first, so a turn committed meanwhile forces another reload
+        version = self._version(session_id)
+        rows = db.query(Conversation.query, Conversation.response).filter(
+            Conversation.user_session_id == session_id,
+            Conversation.response.isnot(None)
+        ).order_by(Conversation.timestamp.desc()).limit(self.max_turns).all()
+        turns = [{"user": query, "assistant": response} for query, response in reversed(rows)]
+        if self.pending_turns is not None:
+            turns.extend(self.pending_turns(session_id))
+        history = _SessionHistory(turns[-self.max_turns:], self.max_turns, version)
+        self._trim(history)
+        # Turns from before a load are dropped rather than summarized
+        history.overflow = []
+        return history
+
+    def _cached(self, session_id: int) -> Optional[_SessionHistory]:
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is not None and history.version == self._version(session_id):
+                self._sessions.move_to_end(session_id)
+                self.hits += 1
+                return history
+        return None
+
+    def _get(self, session_id: int, db: Session) -> _SessionHistory:
+        history = self._cached(session_id)
+        if history is not None:
+            return history
+
+        fresh = self._load(session_id, db)
+        with self._lock:
+            self.misses += 1
+            # Another thread may have loaded it meanwhile; keep the first current copy
+            history = self._sessions.get(session_id)
+            if history is None or history.version != fresh.version:
+                history = self._sessions[session_id] = fresh
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return history
+
+    def _trim(self, history: _SessionHistory):
+        budget = self.token_budget - (estimate_tokens(history.summary) if history.summary else 0)
+        total = sum(turn_tokens(turn) for turn in history.turns)
+        while history.turns and total > budget:
+            turn = history.turns.popleft()
+            total -= turn_tokens(turn)
+            history.overflow.append(turn)
+
+    def history(self, session_id: int, db: Session) -> List[Dict]:
+        """Turns to send with the next question, within the token budget"""
+        return self._turns(self._get(session_id, db))
+
+    def cached_history(self, session_id: int) -> Optional[List[Dict]]:
+        """The turns history() would return if they are cached and current, else None; never queries"""
+        history = self._cached(session_id)
+        return self._turns(history) if history is not None else None
+
+    def _turns(self, history: _SessionHistory) -> List[Dict]:
+        with self._lock:
+            turns = list(history.turns)
+            if history.summary:
+                turns.insert(0, {"user": "Summary of the earlier conversation", "assistant": history.summary})
+        return turns
+
+    def append(self, session_id: int, query: str, answer: str):
+        """Add an answered turn to the cached history.
+
+        The caller hands the conversation to the recorder first. Until the
+        recorder commits it, a reload takes the turn from pending_turns.
+        """
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is None:
+                # Not cached; the next history() call loads it, including this turn
+                return
+            if len(history.turns) == history.turns.maxlen:
+                history.overflow.append(history.turns[0])
+            history.turns.append({"user": query, "assistant": answer})
+            self._trim(history)
+            if self.summarizer is None:
+                history.overflow = []
+
+    def written(self, session_ids: Iterable[int]):
+        """Called by the recorder once these sessions' turns are committed"""
+        if self.counters is None:
+            return
+        with self._lock:
+            for session_id in set(session_ids):
+                version = self.counters.bump(session_id)
+                history = self._sessions.get(session_id)
+                # Anything but our own bump means another worker answered too; reload next time
+                if history is not None and version == history.version + 1:
+                    history.version = version
+
+    def needs_summary(self, session_id: int) -> bool:
+        with self._lock:
+            history = self._sessions.get(session_id)
+            return bool(history and history.overflow and self.summarizer)
+
+    def summarize(self, session_id: int):
+        """Fold trimmed turns into the rolling summary; makes an LLM call, so run it off the hot path"""
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is None or not history.overflow or self.summarizer is None:
+                return
+            summary, overflow = history.summary, history.overflow
+            history.overflow = []
+        try:
+            summary = self.summarizer(summary, overflow)
+        except Exception as e:
+            logger.error(f"Failed to summarize conversation for session {session_id}: {str(e)}")
+            return
+        with self._lock:
+            history.summary = summary
+            # Turns trimmed to make room for the summary are folded in next time
+            self._trim(history)
+
+    def forget(self, session_id: int):
+        """Drop a session's cached history, e.g. after it switches buddy"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            if self.counters is not None:
+                self.counters.bump(session_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "sessions": len(self._sessions),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+def _create_memory() -> ConversationMemory:
+    summarizer = None
+    if settings.MEMORY_SUMMARIES:
+        from app.services.carebuddy_rag import rag_system
+
+        summarizer = rag_system.summarize_history
+    return ConversationMemory(
+        max_sessions=settings.MEMORY_MAX_SESSIONS,
+        max_turns=settings.MEMORY_MAX_TURNS,
+        token_budget=settings.MEMORY_TOKEN_BUDGET,
+        summarizer=summarizer
+    )
+
+conversation_memory = _create_memory()
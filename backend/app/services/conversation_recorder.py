@@ -0,0 +1,326 @@
+# backend/app/services/conversation_recorder.py
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import bindparam, insert, or_
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import Conversation, UserSession
+from app.db.rollups import record_conversation
+from app.services.conversation_memory import conversation_memory
+
+logger = logging.getLogger(__name__)
+
+# A record that fails this many flushes on its own is dropped
+MAX_RECORD_ATTEMPTS = 3
+
+
+@dataclass
+class ConversationRecord:
+    buddy_id: int
+    user_session_id: int
+    query: str
+    response: Optional[str]  # None: the question was not answered
+    timestamp: datetime
+    latency_seconds: Optional[float] = None
+    attempts: int = 0  # Failed writes on its own
+
+
+def _describe(error: Exception) -> str:
+    """An error without the statement parameters SQLAlchemy appends, which hold patient text"""
+    return f"{type(error).__name__}: {getattr(error, 'orig', None) or error}"
+
+
+class ConversationRecorder:
+    """Write-behind storage for answered messages.
+
+    record() only buffers; a background task writes the buffer in one
+    transaction every flush_ms, or as soon as batch_size records are
+    waiting. Each flush inserts the conversations, adds answered ones to
+    the dashboard rollups and sets the sessions' last_active, so a burst
+    of messages costs one SQLite write lock per batch instead of two
+    commits per message. If a batch fails, its records are written one
+    at a time. Those that still fail are retried with the next flush and
+    dropped after MAX_RECORD_ATTEMPTS, so one bad record cannot block the
+    rest. Beyond max_pending the oldest records are dropped.
+
+    Buffered records are lost if the process dies before a flush unless
+    journal_path is set. Records are then appended to that file as JSON
+    lines and replayed on the next start. With journal_fsync each append
+    is fsynced, so call arecord() from the event loop. A crash between a
+    commit and the journal cleanup replays that batch, so delivery is at
+    least once.
+    """
+
+    def __init__(
+        self,
+        flush_ms: int = 200,
+        batch_size: int = 100,
+        max_pending: int = 10000,
+        journal_path: str = "",
+        journal_fsync: bool = False
+    ):
+        self.flush_ms = flush_ms
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.journal_path = journal_path
+        self.journal_fsync = journal_fsync
+        self._pending: Deque[ConversationRecord] = deque()
+        # The batch being written, still visible to pending_turns until committed
+        self._inflight: List[ConversationRecord] = []
+        # Held while appending to the buffer and journal; the flush lock keeps one flush at a time
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._journal = None
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failures = 0
+        self.dropped = 0
+
+    def start(self):
+        """Replay any journal left by a previous run and start the flush task"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        if self._replay():
+            # Written by the flush task rather than here, on the event loop
+            self._wake.set()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Started conversation recorder (every {self.flush_ms}ms or {self.batch_size} records)")
+
+    async def stop(self):
+        """Stop the flush task and write everything still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.to_thread(self.flush)
+        with self._lock:
+            if self._pending:
+                logger.error(f"Shutting down with {len(self._pending)} conversation records not written")
+            self._close_journal()
+
+    def record(self, record: ConversationRecord):
+        """Buffer one message's conversation row, rollup counts and session activity"""
+        with self._lock:
+            if self.journal_path:
+                self._append_journal([record])
+            self._pending.append(record)
+            self.recorded += 1
+            while len(self._pending) > self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            full = len(self._pending) >= self.batch_size
+        if full and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def arecord(self, record: ConversationRecord):
+        """record() from the event loop; an fsynced journal append runs in a thread"""
+        if self.journal_path and self.journal_fsync:
+            await asyncio.to_thread(self.record, record)
+        else:
+            self.record(record)
+
+    def pending_turns(self, session_id: int) -> List[Dict]:
+        """A session's answered turns that are buffered or being written, oldest first"""
+        with self._lock:
+            return [
+                {"user": record.query, "assistant": record.response}
+                for record in [*self._inflight, *self._pending]
+                if record.user_session_id == session_id and record.response is not None
+            ]
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception:
+                logger.error("Conversation recorder flush crashed", exc_info=True)
+
+    def flush(self) -> int:
+        """Write buffered records in one transaction; returns how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                batch = self._inflight = list(self._pending)
+                self._pending.clear()
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                self._write_batch(batch)
+                written, failed = batch, []
+            except Exception as e:
+                logger.warning(f"Failed to write {len(batch)} conversation records, writing them one by one: {_describe(e)}")
+                written, failed = self._write_each(batch)
+
+            with self._lock:
+                self._inflight = []
+                retry = []
+                for record in failed:
+                    record.attempts += 1
+                    if record.attempts >= MAX_RECORD_ATTEMPTS:
+                        self.dropped += 1
+                    else:
+                        retry.append(record)
+                # Retry with the next flush, ahead of anything recorded since
+                self._pending.extendleft(reversed(retry))
+                while len(self._pending) > self.max_pending:
+                    self._pending.popleft()
+                    self.dropped += 1
+                self.flushed += len(written)
+                self.flushes += 1
+                self.failures += bool(failed)
+                if self.journal_path:
+                    # The journal now only needs what is still buffered
+                    self._rewrite_journal(list(self._pending))
+            if written:
+                conversation_memory.written(record.user_session_id for record in written)
+            if failed:
+                logger.error(f"{len(failed)} conversation records failed; {len(failed) - len(retry)} dropped")
+            logger.debug("Wrote %d conversation records in %.1fms", len(written), (time.perf_counter() - started) * 1000)
+            return len(written)
+
+    def _write_batch(self, batch: List[ConversationRecord]):
+        db = SessionLocal()
+        try:
+            self._write(db, batch)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write_each(self, batch: List[ConversationRecord]):
+        """Write records in separate transactions; returns (written, failed)"""
+        written, failed = [], []
+        for record in batch:
+            try:
+                self._write_batch([record])
+                written.append(record)
+            except Exception as e:
+                logger.error(f"Failed to write conversation record for session {record.user_session_id}: {_describe(e)}")
+                failed.append(record)
+        return written, failed
+
+    @staticmethod
+    def _write(db, batch: List[ConversationRecord]):
+        db.execute(insert(Conversation), [
+            {
+                "buddy_id": record.buddy_id,
+                "user_session_id": record.user_session_id,
+                "timestamp": record.timestamp,
+                "query": record.query,
+                "response": record.response
+            }
+            for record in batch
+        ])
+        for record in batch:
+            if record.response is not None:
+                record_conversation(
+                    db,
+                    buddy_id=record.buddy_id,
+                    user_session_id=record.user_session_id,
+                    timestamp=record.timestamp,
+                    latency_seconds=record.latency_seconds
+                )
+        last_active: Dict[int, datetime] = {}
+        for record in batch:
+            session_id = record.user_session_id
+            last_active[session_id] = max(record.timestamp, last_active.get(session_id, record.timestamp))
+        # Core rather than ORM bulk update: a session that no longer exists matches no row instead of failing
+        sessions = UserSession.__table__
+        db.execute(
+            sessions.update()
+            .where(sessions.c.id == bindparam("session_id"))
+            .where(or_(sessions.c.last_active.is_(None), sessions.c.last_active < bindparam("touched_at")))
+            .values(last_active=bindparam("touched_at")),
+            [{"session_id": session_id, "touched_at": timestamp} for session_id, timestamp in last_active.items()]
+        )
+
+    def _append_journal(self, records: List[ConversationRecord]):
+        """Call with the lock held"""
+        if self._journal is None:
+            os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        for record in records:
+            entry = asdict(record)
+            entry["timestamp"] = record.timestamp.isoformat()
+            self._journal.write(json.dumps(entry) + "\n")
+        self._journal.flush()
+        if self.journal_fsync:
+            os.fsync(self._journal.fileno())
+
+    def _rewrite_journal(self, records: List[ConversationRecord]):
+        """Call with the lock held"""
+        self._close_journal()
+        open(self.journal_path, "w").close()
+        if records:
+            self._append_journal(records)
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _replay(self) -> bool:
+        """Buffer the records a previous run journaled but did not write; returns whether there were any"""
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return False
+        records = []
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    entry["timestamp"] = datetime.fromisoformat(entry["timestamp"])
+                    records.append(ConversationRecord(**entry))
+                except (ValueError, TypeError):
+                    # A line cut short by the crash
+                    continue
+        if records:
+            with self._lock:
+                self._pending.extend(records)
+            logger.info(f"Replaying {len(records)} conversation records from {self.journal_path}")
+        return bool(records)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "recorded": self.recorded,
+                "flushed": self.flushed,
+                "flushes": self.flushes,
+                "failures": self.failures,
+                "dropped": self.dropped
+            }
+
+
+conversation_recorder = ConversationRecorder(
+    flush_ms=settings.RECORDER_FLUSH_MS,
+    batch_size=settings.RECORDER_BATCH_SIZE,
+    max_pending=settings.RECORDER_MAX_PENDING,
+    journal_path=settings.RECORDER_JOURNAL_PATH,
+    journal_fsync=settings.RECORDER_JOURNAL_FSYNC
+)
+# Reloaded histories include turns the recorder has not written yet
+conversation_memory.pending_turns = conversation_recorder.pending_turns
@@ -0,0 +1,189 @@
+# backend/app/services/embedding_cache.py
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.core.metrics import EMBEDDING_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Disk hits whose last_access is written at once when nothing is stored meanwhile
+TOUCH_BATCH = 256
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: NFC unicode, collapsed whitespace"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class CachedEmbeddings(Embeddings):
+    """Content-addressed cache in front of an embeddings provider.
+
+    Vectors are keyed by sha256(model, normalized text) and kept in an
+    in-memory LRU backed by a size-bounded SQLite table, so documents and
+    queries share one cache and repeated text never reaches the provider.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model_name: str,
+        path: Optional[str] = None,
+        memory_items: int = 10000,
+        max_bytes: int = 512 * 1024 * 1024,
+    ):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        self._disk_bytes = 0
+        # key -> last access of disk hits not yet written; an open write would hold the file's lock
+        self._touched: Dict[str, float] = {}
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, "
+                "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_access ON embeddings (last_access)")
+            self._db.commit()
+            self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\n{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return vector
+        if self._db is not None:
+            row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._touched[key] = time.time()
+                if len(self._touched) >= TOUCH_BATCH:
+                    self._write_touches()
+                    self._db.commit()
+                vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+                self._remember(key, vector)
+                self.disk_hits += 1
+                return vector
+        self.misses += 1
+        return None
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _write_touches(self):
+        """Queue buffered last_access updates in the current transaction; the caller commits"""
+        if self._touched:
+            self._db.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _store(self, items: Dict[str, List[float]]):
+        for key, vector in items.items():
+            self._remember(key, vector)
+        if self._db is None or not items:
+            return
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            rows.append((key, blob, len(blob), now))
+        self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+        self._write_touches()
+        self._disk_bytes += sum(row[2] for row in rows)
+        self._db.commit()
+        if self._disk_bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used rows until the table is back under 90% of max_bytes"""
+        self._write_touches()
+        target = int(self.max_bytes * 0.9)
+        freed = 0
+        evicted = 0
+        for key, size in self._db.execute("SELECT key, size FROM embeddings ORDER BY last_access").fetchall():
+            if self._disk_bytes - freed <= target:
+                break
+            self._db.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+            freed += size
+            evicted += 1
+        self._db.commit()
+        self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        self.evictions += evicted
+        logger.debug(f"Evicted {evicted} cached embeddings ({freed} bytes)")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.key(text) for text in texts]
+        results: Dict[str, List[float]] = {}
+        missing: Dict[str, str] = {}
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in results or key in missing:
+                    continue
+                vector = self._lookup(key)
+                if vector is None:
+                    missing[key] = text
+                else:
+                    results[key] = vector
+
+        if missing:
+            started = time.perf_counter()
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            EMBEDDING_REQUEST_SECONDS.labels("documents").observe(time.perf_counter() - started)
+            computed = dict(zip(missing.keys(), vectors))
+            with self._lock:
+                self._store(computed)
+            results.update(computed)
+        return [results[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self.key(text)
+        with self._lock:
+            vector = self._lookup(key)
+        if vector is None:
+            started = time.perf_counter()
+            vector = self.underlying.embed_query(text)
+            EMBEDDING_REQUEST_SECONDS.labels("query").observe(time.perf_counter() - started)
+            with self._lock:
+                self._store({key: vector})
+        return vector
+
+    def stats(self) -> Dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0,
+            "evictions": self.evictions,
+            "memory_items": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+        }
@@ -0,0 +1,111 @@
+# backend/app/services/fakes.py
+"""Local stand-ins for external services, for offline development and testing"""
+from typing import Any, Dict, Iterator, List, Optional
+import asyncio
+import hashlib
+import itertools
+import json
+import re
+import time
+
+import httpx
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeGraphTransport(httpx.AsyncBaseTransport):
+    """Answers WhatsApp Graph API calls locally and records what was sent.
+
+    fail_statuses is consumed one status per request before normal
+    responses resume, e.g. [429, 503] to exercise the retry path.
+    """
+
+    def __init__(self, latency: float = 0.0, fail_statuses: Optional[List[int]] = None):
+        self.latency = latency
+        self.fail_statuses = list(fail_statuses or [])
+        self.sent: List[Dict] = []
+        self._ids = itertools.count(1)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail_statuses:
+            status = self.fail_statuses.pop(0)
+            return httpx.Response(status, json={"error": {"message": "Injected failure", "code": status}})
+
+        payload = json.loads(request.content or b"{}")
+        self.sent.append(payload)
+        return httpx.Response(200, json={
+            "messaging_product": "whatsapp",
+            "contacts": [{"input": payload.get("to"), "wa_id": payload.get("to")}],
+            "messages": [{"id": f"wamid.fake{next(self._ids)}"}]
+        })
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic bag-of-words vectors, so texts sharing words land close together.
+
+    latency is slept once per provider call, like one OpenAI request.
+    """
+
+    def __init__(self, dimension: int = 1536, latency: float = 0.0):
+        self.dimension = dimension
+        self.latency = latency
+        self.model = "fake-embedding"
+        self.calls = 0
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest()[:8], 16) % self.dimension] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers with a fixed text after a delay, streaming it word by word.
+
+    latency is the time to the first token and token_latency the gap between
+    tokens; usage is reported from rough word counts.
+    """
+
+    answer: str = "Please keep the wound dry for 48 hours and contact your care team if it becomes red or swollen."
+    latency: float = 0.0
+    token_latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _usage(self, messages: List[BaseMessage]) -> Dict[str, int]:
+        prompt = sum(len(str(message.content).split()) for message in messages)
+        completion = len(self.answer.split())
+        return {"input_tokens": prompt, "output_tokens": completion, "total_tokens": prompt + completion}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency + self.token_latency * len(self.answer.split()))
+        message = AIMessage(content=self.answer, usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        words = self.answer.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else f" {word}"))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages)))
@@ -0,0 +1,352 @@
+# backend/app/services/ingestion.py
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+import asyncio
+import codecs
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process serving only
+    fcntl = None
+
+from fastapi import UploadFile
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import CareBuddy, Document, DocumentChunk, IngestFile, IngestJob
+from app.services.carebuddy_rag import chunk_id, document_key, rag_system
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+def read_text_blocks(path: str, block_size: int) -> Iterator[str]:
+    """Yield a file's text in fixed-size blocks, decoding UTF-8 incrementally"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            text = decoder.decode(block)
+            if text:
+                yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def read_text(path: str, block_size: int) -> str:
+    """A file's whole text, decoded like read_text_blocks"""
+    return "".join(read_text_blocks(path, block_size))
+
+
+def file_sha256(path: str, block_size: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestionWorkerPool:
+    """Processes uploaded documents in the background with a bounded number of workers.
+
+    Uploads are written to INGEST_UPLOAD_DIR and recorded as IngestJob and
+    IngestFile rows; workers then chunk, embed and upsert one file each,
+    reporting progress on the file row as batches are stored. A stored
+    file's text is kept in Document.content, and a job's uploads are
+    deleted once all of its files are completed or failed.
+    """
+
+    def __init__(self, workers: int, upload_dir: str, block_size: int):
+        self.workers = workers
+        self.upload_dir = upload_dir
+        self.block_size = block_size
+        # With several server processes only one requeues unfinished files
+        self.resume_pending = True
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def start(self):
+        """Start the workers and requeue files left unfinished by a previous run"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+        pending = []
+        if self.resume_pending:
+            db = SessionLocal()
+            try:
+                pending = db.query(IngestFile.id).filter(
+                    IngestFile.status.in_(["queued", "processing"])
+                ).all()
+            finally:
+                db.close()
+        for (file_id,) in pending:
+            self._queue.put_nowait(file_id)
+        logger.info(f"Started {self.workers} ingestion workers ({len(pending)} files resumed)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(
+        self,
+        buddy: CareBuddy,
+        files: List[UploadFile],
+        db: Session,
+        replaces: Optional[Document] = None
+    ) -> IngestJob:
+        """Persist the uploads and queue them for processing.
+
+        Each upload becomes a new document, unless `replaces` is given: then
+        the single upload becomes the next version of that document.
+        """
+        self.start()
+        job = IngestJob(id=uuid.uuid4().hex, buddy_id=buddy.id, status="queued")
+        job_dir = os.path.join(self.upload_dir, job.id)
+        os.makedirs(job_dir, exist_ok=True)
+
+        ingest_files = []
+        for i, file in enumerate(files):
+            path = os.path.join(job_dir, f"{i}-{os.path.basename(file.filename or 'document')}")
+            with open(path, "wb") as f:
+                while True:
+                    block = await file.read(self.block_size)
+                    if not block:
+                        break
+                    f.write(block)
+            ingest_files.append(IngestFile(
+                job_id=job.id,
+                filename=file.filename,
+                path=path,
+                document_id=replaces.id if replaces else None
+            ))
+
+        db.add(job)
+        db.add_all(ingest_files)
+        db.commit()
+        for ingest_file in ingest_files:
+            self._queue.put_nowait(ingest_file.id)
+        logger.debug(f"Queued ingestion job {job.id} with {len(ingest_files)} files")
+        return job
+
+    async def _worker(self, worker_id: int):
+        while True:
+            file_id = await self._queue.get()
+            try:
+                await asyncio.to_thread(self._process_file, file_id)
+            except Exception as e:
+                logger.error(f"Ingestion worker {worker_id} failed on file {file_id}: {str(e)}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    def _process_file(self, file_id: int):
+        db = SessionLocal()
+        try:
+            ingest_file = db.query(IngestFile).filter(IngestFile.id == file_id).first()
+            if ingest_file is None or ingest_file.status in TERMINAL_STATUSES:
+                return
+            job = ingest_file.job
+            ingest_file.status = "processing"
+            job.status = "running"
+            db.commit()
+
+            # Chunk ids derive from the document id, so the row exists before any chunk is stored
+            created = not ingest_file.document_id
+            if created:
+                doc = Document(buddy_id=job.buddy_id, filename=ingest_file.filename, version=0)
+                db.add(doc)
+                db.flush()
+                ingest_file.document_id = doc.id
+                db.commit()
+            # One ingestion per document at a time, across threads and server processes:
+            # concurrent replacements would claim the same version and roll back each other's chunks
+            with self._document_lock(ingest_file.document_id):
+                # Read the version after the lock, as the previous holder may have stored one
+                doc = db.query(Document).filter(
+                    Document.id == ingest_file.document_id
+                ).populate_existing().first()
+                if doc is None:
+                    ingest_file.status = "failed"
+                    ingest_file.error = "Document was deleted while the file was queued"
+                    ingest_file.document_id = None
+                    db.commit()
+                else:
+                    self._ingest(db, job, ingest_file, doc, created)
+            rag_system.answer_cache.invalidate(job.buddy_id)
+
+            self._update_job(db, job)
+        finally:
+            db.close()
+
+    @contextmanager
+    def _lock(self, name: str) -> Iterator[None]:
+        """Hold a named lock, also against other processes sharing upload_dir"""
+        with self._locks_guard:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            lock_dir = os.path.join(self.upload_dir, ".locks")
+            os.makedirs(lock_dir, exist_ok=True)
+            with open(os.path.join(lock_dir, f"{name}.lock"), "a") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                yield
+
+    def _document_lock(self, document_id: int):
+        return self._lock(f"document-{document_id}")
+
+    def _ingest(self, db: Session, job: IngestJob, ingest_file: IngestFile, doc: Document, created: bool):
+        """Store a file as the next version of doc; call with the document's lock held"""
+        doc_id = document_key(doc.id)
+        version = (doc.version or 0) + 1
+
+        try:
+            content_hash = file_sha256(ingest_file.path, self.block_size)
+            existing = {digest for (digest,) in db.query(DocumentChunk.chunk_hash).filter(
+                DocumentChunk.document_id == doc.id
+            )}
+            if content_hash == doc.content_hash and existing:
+                logger.info(f"{ingest_file.filename} is unchanged from version {doc.version}")
+                if doc.content is None:
+                    doc.content = read_text(ingest_file.path, self.block_size)
+                ingest_file.chunks_done = ingest_file.chunks_total = len(existing)
+                ingest_file.status = "completed"
+                db.commit()
+                return
+            if not existing and not created:
+                # Stored before chunks were tracked; replace wholesale
+                rag_system.delete_document(job.buddy_id, doc_id)
+
+            def on_progress(seen: int, stored: List[Dict]):
+                # Track each stored chunk right away so a failed version can be rolled back
+                db.add_all(
+                    DocumentChunk(
+                        document_id=doc.id,
+                        chunk_hash=chunk["chunk_hash"],
+                        chunk_index=chunk["chunk_index"],
+                        text=chunk["text"],
+                        version=version
+                    )
+                    for chunk in stored
+                )
+                ingest_file.chunks_done = seen
+                db.commit()
+
+            # The file is streamed block by block; only one chunk batch is held at a time
+            chunks = rag_system.split_text_stream(read_text_blocks(ingest_file.path, self.block_size))
+            sync = rag_system.process_document_chunks(
+                chunks,
+                buddy_id=job.buddy_id,
+                doc_id=doc_id,
+                existing_hashes=existing,
+                on_progress=on_progress
+            )
+
+            if sync.removed:
+                db.query(DocumentChunk).filter(
+                    DocumentChunk.document_id == doc.id,
+                    DocumentChunk.chunk_hash.in_(sync.removed)
+                ).delete(synchronize_session=False)
+            # The upload is deleted with its job, so the text is kept with the document
+            doc.content = read_text(ingest_file.path, self.block_size)
+            doc.filename = ingest_file.filename
+            doc.upload_date = datetime.now(timezone.utc)
+            doc.version = version
+            doc.content_hash = content_hash
+            ingest_file.chunks_done = ingest_file.chunks_total = len(sync.chunks)
+            ingest_file.status = "completed"
+            db.commit()
+            logger.info(f"Stored {ingest_file.filename} as version {version} of document {doc.id}")
+        except Exception as e:
+            logger.error(f"Error ingesting {ingest_file.filename}: {str(e)}", exc_info=True)
+            db.rollback()
+            if created:
+                self._discard_document(db, job.buddy_id, doc)
+                ingest_file.document_id = None
+            else:
+                self._discard_version(db, job.buddy_id, doc, version)
+            ingest_file.status = "failed"
+            ingest_file.error = f"{type(e).__name__}: {e}"
+            db.commit()
+
+    def _discard_document(self, db: Session, buddy_id: int, doc: Document):
+        """Remove a document that failed ingestion, including any chunks already stored"""
+        try:
+            rag_system.delete_document(buddy_id, document_key(doc.id))
+        except Exception as e:
+            logger.error(f"Could not remove chunks of failed document {doc.id}: {str(e)}")
+        db.delete(doc)
+
+    def _discard_version(self, db: Session, buddy_id: int, doc: Document, version: int):
+        """Remove the chunks a failed new version added; the previous version stays live"""
+        added = db.query(DocumentChunk).filter(
+            DocumentChunk.document_id == doc.id,
+            DocumentChunk.version == version
+        )
+        ids = [chunk_id(document_key(doc.id), chunk.chunk_hash) for chunk in added]
+        try:
+            if ids:
+                rag_system.delete_chunks(buddy_id, ids)
+            added.delete(synchronize_session=False)
+        except Exception as e:
+            logger.error(f"Could not roll back version {version} of document {doc.id}: {str(e)}")
+
+    def _update_job(self, db: Session, job: IngestJob):
+        statuses = [f.status for f in job.files]
+        if not all(status in TERMINAL_STATUSES for status in statuses):
+            return
+        if all(status == "completed" for status in statuses):
+            job.status = "completed"
+        elif all(status == "failed" for status in statuses):
+            job.status = "failed"
+        else:
+            job.status = "partial"
+        job.finished_at = datetime.now(timezone.utc)
+        db.commit()
+        # Nothing reads the uploads once every file is stored or has failed
+        shutil.rmtree(os.path.join(self.upload_dir, job.id), ignore_errors=True)
+        logger.info(f"Ingestion job {job.id} finished with status {job.status}")
+
+
+def job_status(job: IngestJob) -> Dict:
+    """Serialize a job and its per-file progress"""
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "files": [
+            {
+                "name": f.filename,
+                "status": f.status,
+                "chunks_done": f.chunks_done,
+                "chunks_total": f.chunks_total,
+                "document_id": f.document_id,
+                "error": f.error
+            }
+            for f in job.files
+        ]
+    }
+
+
+ingestion_pool = IngestionWorkerPool(
+    workers=settings.INGEST_WORKERS,
+    upload_dir=settings.INGEST_UPLOAD_DIR,
+    block_size=settings.INGEST_READ_BLOCK_SIZE
+)
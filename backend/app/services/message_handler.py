@@ -0,0 +1,130 @@
+# backend/app/services/message_handler.py
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.services.carebuddy_rag import rag_system
+from app.services.conversation_memory import conversation_memory
+from app.services.conversation_recorder import ConversationRecord, conversation_recorder
+from app.services.message_queue import InboundMessage
+from app.services.session_router import session_router
+from app.services.whatsapp import whatsapp_client
+
+logger = logging.getLogger(__name__)
+
+
+async def handle_connect(from_number: str, message_body: str, db: Session):
+    """CONNECT <buddy id>: bind the number to that buddy and confirm"""
+    parts = message_body.split()
+    if len(parts) != 2:
+        await whatsapp_client.send_message(
+            to=from_number,
+            message="To connect, send 'CONNECT' followed by the buddy ID, for example: CONNECT BD42"
+        )
+        return
+
+    buddy_name, _ = await asyncio.to_thread(session_router.connect, from_number, parts[1], db)
+    if buddy_name is None:
+        logger.info("CONNECT to unknown buddy %.10s", parts[1])
+        await whatsapp_client.send_message(
+            to=from_number,
+            message=f"Sorry, I couldn't find a buddy with ID {parts[1]}. Please check the ID and try again."
+        )
+        return
+
+    await whatsapp_client.send_message(
+        to=from_number,
+        message=f"You're now connected to {buddy_name}. Send me any question about your care."
+    )
+
+
+async def handle_message(message: InboundMessage):
+    """Answer one queued WhatsApp message; runs on a message queue worker"""
+    from_number = message.phone_number
+    message_body = message.text
+    db = SessionLocal()
+    conversation = None
+    try:
+        # Message text and phone numbers are PHI, so only ids and sizes are logged
+        logger.debug("Processing message %s (%d chars)", message.message_id, len(message_body))
+
+        # Handle CONNECT command
+        words = message_body.split()
+        if words and words[0].upper() == "CONNECT":
+            await handle_connect(from_number, message_body, db)
+            return
+
+        # Handle regular message; the route is usually cached, and a miss queries off the event loop
+        found, route = session_router.cached(from_number)
+        if not found:
+            route = await asyncio.to_thread(session_router.resolve, from_number, db)
+
+        if not route or not route.buddy_id:
+            await whatsapp_client.send_message(
+                to=from_number,
+                message="Please connect to a buddy first using 'CONNECT' followed by the buddy ID."
+            )
+            return
+
+        logger.debug("Querying RAG for session %s on buddy %s", route.session_id, route.buddy_id)
+
+        # Recent turns for follow-up questions, usually served from memory
+        chat_history = conversation_memory.cached_history(route.session_id)
+        if chat_history is None:
+            chat_history = await asyncio.to_thread(conversation_memory.history, route.session_id, db)
+
+        # Stored with its answer by the recorder; timestamped on arrival as before
+        conversation = ConversationRecord(
+            buddy_id=route.buddy_id,
+            user_session_id=route.session_id,
+            query=message_body,
+            response=None,
+            timestamp=datetime.now(timezone.utc)
+        )
+
+        # Get response from RAG without blocking the event loop
+        started = time.perf_counter()
+        response = await asyncio.to_thread(
+            rag_system.get_response,
+            query=message_body,
+            chat_history=chat_history,
+            buddy_id=route.buddy_id
+        )
+        logger.debug("RAG response for message %s: %d chars", message.message_id, len(response))
+
+        # Save the conversation, count it in the rollups and mark the session active, in the next batch
+        conversation.response = response
+        conversation.latency_seconds = time.perf_counter() - started
+        await conversation_recorder.arecord(conversation)
+
+        conversation_memory.append(route.session_id, message_body, response)
+
+        # Send response
+        await whatsapp_client.send_message(
+            to=from_number,
+            message=response
+        )
+
+        if conversation_memory.needs_summary(route.session_id):
+            await asyncio.to_thread(conversation_memory.summarize, route.session_id)
+
+    except Exception:
+        db.rollback()
+        if conversation is not None and conversation.response is None:
+            # Unanswered questions still count as asked
+            await conversation_recorder.arecord(conversation)
+        try:
+            await whatsapp_client.send_message(
+                to=from_number,
+                message="Sorry, I encountered an error. Please try again."
+            )
+        except Exception:
+            logger.error("Failed to send error message to user", exc_info=True)
+        # Counted and logged by the queue worker
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,218 @@
+# backend/app/services/message_queue.py
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+import asyncio
+import logging
+import secrets
+import time
+import zlib
+
+import httpx
+from app.core.config import settings
+from app.core.logging import mask_phone
+
+logger = logging.getLogger(__name__)
+
+FORWARD_PATH = "/api/internal/messages"
+# Long enough to wait out a worker restart; the owner's parent keeps its socket listening meanwhile
+FORWARD_TIMEOUT_SECONDS = 10.0
+
+
+@dataclass
+class InboundMessage:
+    phone_number: str
+    text: str
+    message_id: Optional[str] = None
+    received_at: float = field(default_factory=time.time)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class _Shard:
+    """A FIFO drained by exactly one worker, so its messages are handled in order"""
+
+    def __init__(self):
+        self.items: Deque[InboundMessage] = deque()
+        self.ready = asyncio.Event()
+        self.busy = False
+
+
+class MessageQueue:
+    """In-process queue between the webhook and the message workers.
+
+    Messages are sharded by phone number across one worker per shard, which
+    keeps each patient's messages in arrival order while different patients
+    are served concurrently. Redelivered message ids are dropped.
+
+    With several server processes, each owns the patients whose number
+    hashes to it: submit() forwards a message another process owns to that
+    process's Unix socket in peer_sockets, so a patient's messages are still
+    queued, deduplicated and answered in one place.
+    """
+
+    def __init__(self, workers: int, max_depth: int, dedupe_size: int = 10000):
+        self.workers = workers
+        self.max_depth = max_depth
+        self.dedupe_size = dedupe_size
+        self._shards: List[_Shard] = []
+        self._tasks: List[asyncio.Task] = []
+        self._handler: Optional[Callable[[InboundMessage], Awaitable[None]]] = None
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._accepting = False
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.forwarded = 0
+        # Set per process by the pre-fork server; a single process owns every patient
+        self.worker_id = 0
+        self.peer_sockets: List[str] = []
+        self.forward_token = ""
+        self._peers: Dict[int, httpx.AsyncClient] = {}
+        # Called with (message, seconds since received, succeeded) after each message
+        self.listeners: List[Callable[[InboundMessage, float, bool], None]] = []
+
+    def start(self, handler: Callable[[InboundMessage], Awaitable[None]]):
+        self._handler = handler
+        self._shards = [_Shard() for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._worker(shard)) for shard in self._shards]
+        self._accepting = True
+        logger.info(f"Started {self.workers} message workers")
+
+    async def stop(self, timeout: float):
+        """Stop accepting messages and give the workers up to timeout seconds to drain"""
+        self._accepting = False
+        deadline = time.monotonic() + timeout
+        while self.depth() or any(shard.busy for shard in self._shards):
+            if time.monotonic() >= deadline:
+                logger.warning(f"Shutting down with {self.depth()} undelivered messages")
+                break
+            await asyncio.sleep(0.05)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for client in self._peers.values():
+            await client.aclose()
+        self._peers = {}
+
+    def _key(self, phone_number: str) -> int:
+        # crc32 rather than hash(), which is salted per process
+        return zlib.crc32(phone_number.encode())
+
+    def owner(self, phone_number: str) -> int:
+        """The server process whose queue takes this number's messages"""
+        if not self.peer_sockets:
+            return self.worker_id
+        return self._key(phone_number) % len(self.peer_sockets)
+
+    def accepts_forward(self, token: Optional[str]) -> bool:
+        """Whether a forwarded message carries this server's token"""
+        return bool(self.forward_token) and secrets.compare_digest(token or "", self.forward_token)
+
+    async def submit(self, message: InboundMessage) -> bool:
+        """Queue a message in the process that owns its number; returns False for a redelivery"""
+        owner = self.owner(message.phone_number)
+        if owner == self.worker_id:
+            return self.enqueue(message)
+
+        client = self._peers.get(owner)
+        if client is None:
+            client = self._peers[owner] = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(uds=self.peer_sockets[owner]),
+                base_url="http://worker",
+                timeout=FORWARD_TIMEOUT_SECONDS
+            )
+        try:
+            response = await client.post(FORWARD_PATH, json=asdict(message),
+                                         headers={"X-Forward-Token": self.forward_token})
+        except httpx.TransportError as e:
+            raise QueueFullError(f"Worker {owner} is unavailable ({type(e).__name__})")
+        if response.status_code == 503:
+            raise QueueFullError(response.json().get("detail", f"Worker {owner} is not accepting messages"))
+        response.raise_for_status()
+        self.forwarded += 1
+        return response.json()["queued"]
+
+    def enqueue(self, message: InboundMessage) -> bool:
+        """Queue a message; returns False if it is a redelivery of one already seen"""
+        if not self._accepting:
+            raise QueueFullError("Message queue is not accepting messages")
+        if message.message_id and message.message_id in self._seen:
+            self.duplicates += 1
+            return False
+        if self.depth() >= self.max_depth:
+            # Not remembered as seen, so Meta's retry of this delivery is accepted
+            self.rejected += 1
+            raise QueueFullError(f"Message queue is full ({self.max_depth} messages)")
+        if message.message_id:
+            self._seen[message.message_id] = None
+            while len(self._seen) > self.dedupe_size:
+                self._seen.popitem(last=False)
+
+        # Numbers owned by one process share key % processes, so shard on the rest of the key
+        key = self._key(message.phone_number) // max(len(self.peer_sockets), 1)
+        shard = self._shards[key % len(self._shards)]
+        shard.items.append(message)
+        shard.ready.set()
+        self.enqueued += 1
+        return True
+
+    async def _worker(self, shard: _Shard):
+        while True:
+            if not shard.items:
+                shard.ready.clear()
+                await shard.ready.wait()
+                continue
+            message = shard.items.popleft()
+            shard.busy = True
+            ok = False
+            try:
+                await self._handler(message)
+                self.processed += 1
+                ok = True
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error handling message {message.message_id} from {mask_phone(message.phone_number)}: {str(e)}",
+                             exc_info=True)
+            finally:
+                shard.busy = False
+            self._notify(message, time.time() - message.received_at, ok)
+
+    def _notify(self, message: InboundMessage, seconds: float, ok: bool):
+        for listener in self.listeners:
+            try:
+                listener(message, seconds, ok)
+            except Exception as e:
+                logger.error(f"Message listener failed: {str(e)}")
+
+    def depth(self) -> int:
+        return sum(len(shard.items) for shard in self._shards)
+
+    def oldest_age(self) -> float:
+        """Seconds the oldest waiting message has been queued"""
+        oldest = [shard.items[0].received_at for shard in self._shards if shard.items]
+        return time.time() - min(oldest) if oldest else 0.0
+
+    def stats(self) -> Dict:
+        return {
+            "depth": self.depth(),
+            "oldest_age_seconds": round(self.oldest_age(), 3),
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "forwarded": self.forwarded,
+            "workers": len(self._tasks),
+        }
+
+
+message_queue = MessageQueue(
+    workers=settings.MESSAGE_WORKERS,
+    max_depth=settings.MESSAGE_QUEUE_MAX_DEPTH
+)
@@ -0,0 +1,146 @@
+# backend/app/services/session_router.py
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, NamedTuple, Optional, Tuple
+import logging
+import threading
+import time
+import zlib
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import CareBuddy, UserSession
+from app.services.conversation_memory import conversation_memory
+from app.services.shared_counters import SharedCounters
+
+logger = logging.getLogger(__name__)
+
+
+class Route(NamedTuple):
+    session_id: int
+    buddy_id: Optional[int]
+
+
+class _Entry(NamedTuple):
+    route: Optional[Route]  # None: the number has no session yet
+    expires_at: float
+    version: int
+
+
+class SessionRouter:
+    """Phone number -> (session id, buddy id) for inbound WhatsApp messages.
+
+    Routes are kept in an LRU of up to max_entries for ttl_seconds, so a
+    patient's messages are routed without a database read. Numbers without
+    a session are cached too, as None. CONNECT writes the session through
+    to the database and the cache. With shared counters, a number connected
+    in another worker process is reloaded rather than routed to its old buddy.
+    """
+
+    def __init__(self, ttl_seconds: int = 300, max_entries: int = 10000, counters: Optional[SharedCounters] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.counters = counters
+        self._routes: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _version(self, phone_number: str) -> int:
+        # crc32 rather than hash(), which is salted per process
+        return self.counters.get(zlib.crc32(phone_number.encode())) if self.counters is not None else 0
+
+    def _put(self, phone_number: str, route: Optional[Route], version: int):
+        """Cache a route; call with the lock held"""
+        self._routes[phone_number] = _Entry(route, time.monotonic() + self.ttl_seconds, version)
+        self._routes.move_to_end(phone_number)
+        while len(self._routes) > self.max_entries:
+            self._routes.popitem(last=False)
+
+    def cached(self, phone_number: str) -> Tuple[bool, Optional[Route]]:
+        """(True, route) if the number's route is cached and current, else (False, None); never queries"""
+        with self._lock:
+            entry = self._routes.get(phone_number)
+            if (entry is not None and entry.expires_at > time.monotonic()
+                    and entry.version == self._version(phone_number)):
+                self._routes.move_to_end(phone_number)
+                self.hits += 1
+                return True, entry.route
+        return False, None
+
+    def resolve(self, phone_number: str, db: Session) -> Optional[Route]:
+        """The number's session and buddy, or None if it has never connected"""
+        found, route = self.cached(phone_number)
+        if found:
+            return route
+
+        # Read the version first, so a CONNECT committed meanwhile forces another load
+        version = self._version(phone_number)
+        row = db.query(UserSession.id, UserSession.buddy_id).filter(
+            UserSession.phone_number == phone_number
+        ).first()
+        route = Route(row.id, row.buddy_id) if row else None
+        with self._lock:
+            self.misses += 1
+            self._put(phone_number, route, version)
+        return route
+
+    def connect(self, phone_number: str, bid: str, db: Session) -> Tuple[Optional[str], Optional[Route]]:
+        """Bind a number to the buddy with this bid, creating its session if needed.
+
+        Commits, then updates the cache. Returns the buddy's name and the new
+        route, or (None, None) if no buddy has the bid.
+        """
+        buddy = db.query(CareBuddy).filter(CareBuddy.bid == bid.upper()).first()
+        if buddy is None:
+            return None, None
+
+        now = datetime.now(timezone.utc)
+        session = db.query(UserSession).filter(UserSession.phone_number == phone_number).first()
+        switched = session is not None and session.buddy_id != buddy.id
+        if session is None:
+            session = UserSession(phone_number=phone_number, buddy_id=buddy.id, first_seen=now)
+            db.add(session)
+        session.buddy_id = buddy.id
+        session.last_active = now
+        db.flush()
+        # Read before the commit expires them, which would cost two more queries
+        route, buddy_name = Route(session.id, buddy.id), buddy.name
+        db.commit()
+
+        if switched:
+            # Turns about the old buddy's documents would mislead the new one
+            conversation_memory.forget(route.session_id)
+
+        with self._lock:
+            version = self._version(phone_number)
+            if self.counters is not None:
+                version = self.counters.bump(zlib.crc32(phone_number.encode()))
+            self._put(phone_number, route, version)
+        logger.info("Session %s connected to buddy %s%s", route.session_id, route.buddy_id,
+                    " (switched)" if switched else "")
+        return buddy_name, route
+
+    def invalidate(self, phone_number: str):
+        """Drop a number's cached route, e.g. after its session is changed outside connect()"""
+        with self._lock:
+            self._routes.pop(phone_number, None)
+            if self.counters is not None:
+                self.counters.bump(zlib.crc32(phone_number.encode()))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "routes": len(self._routes),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+session_router = SessionRouter(
+    ttl_seconds=settings.SESSION_ROUTE_TTL_SECONDS,
+    max_entries=settings.SESSION_ROUTE_MAX_ENTRIES
+)
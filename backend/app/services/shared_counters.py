@@ -0,0 +1,73 @@
+# backend/app/services/shared_counters.py
+"""Change counters shared by every worker process through a memory-mapped file.
+
+In multi-worker mode each process keeps its own answer cache and
+conversation memory. A worker that changes a buddy's documents or answers
+a patient bumps the matching counter; the others compare it with the value
+their cached entry was built at and rebuild on a mismatch. Reading a
+counter is a plain memory read, so the check is cheap on every request.
+"""
+from typing import Optional
+import os
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process serving only
+    fcntl = None
+
+DEFAULT_SLOTS = 1 << 16
+
+
+class SharedCounters:
+    """A fixed table of int64 counters; keys are hashed into slots.
+
+    Two keys sharing a slot only cause extra rebuilds, never stale reads.
+    """
+
+    def __init__(self, path: str, slots: int = DEFAULT_SLOTS):
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._lock_fd: Optional[int] = None
+        self._lock_pid: Optional[int] = None
+        create(path, slots)
+        self._values = np.memmap(path, dtype=np.int64, mode="r+", shape=(slots,))
+
+    def get(self, key: int) -> int:
+        return int(self._values[key % self.slots])
+
+    def bump(self, key: int) -> int:
+        """Increment a key's counter across all processes and return the new value"""
+        slot = key % self.slots
+        with self._lock:
+            fd = self._file_lock()
+            try:
+                self._values[slot] += 1
+                return int(self._values[slot])
+            finally:
+                if fd is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _file_lock(self) -> Optional[int]:
+        if fcntl is None:
+            return None
+        # flock belongs to the open file, which a forked child shares; each process opens its own
+        if self._lock_pid != os.getpid():
+            self._lock_fd = os.open(self.path, os.O_RDWR)
+            self._lock_pid = os.getpid()
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        return self._lock_fd
+
+
+def create(path: str, slots: int = DEFAULT_SLOTS):
+    """Create a zeroed counter file if it does not exist yet"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if os.fstat(fd).st_size < slots * 8:
+            os.ftruncate(fd, slots * 8)
+    finally:
+        os.close(fd)
@@ -0,0 +1,487 @@
+# backend/app/services/vectorstore.py
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process serving only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per matrix multiply; bounds the temporary score matrix
+SEARCH_BLOCK_ROWS = 65536
+# Compact a namespace once it has this many segments or this share of deleted rows
+MAX_SEGMENTS = 16
+MAX_DELETED_RATIO = 0.25
+# Attempts at reading a namespace another process is compacting
+LOAD_ATTEMPTS = 3
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so a dot product is the cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _matches(metadata: Dict, filter: Optional[Dict]) -> bool:
+    """Evaluate a Pinecone-style metadata filter ($eq, $ne, $in, $nin)"""
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, expected in condition.items():
+            if op == "$eq" and value != expected:
+                return False
+            if op == "$ne" and value == expected:
+                return False
+            if op == "$in" and value not in expected:
+                return False
+            if op == "$nin" and value in expected:
+                return False
+    return True
+
+
+class _Segment:
+    """An immutable block of normalized vectors and the chunk records they belong to"""
+
+    def __init__(self, name: str, vectors: np.ndarray, records: List[Dict]):
+        self.name = name
+        self.vectors = vectors
+        self.records = records
+        self.alive = np.ones(len(records), dtype=bool)
+
+
+class _Namespace:
+    """The segments stored under one namespace directory"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.dim: Optional[int] = None
+        self.next_segment = 0
+        self.segments: List[_Segment] = []
+        self.deleted: set = set()
+        # Maps a live chunk id to its (segment, row)
+        self.locations: Dict[str, Tuple[_Segment, int]] = {}
+        # Identity of the manifest file this state matches; it is replaced on every save
+        self.manifest_stat: Optional[Tuple[int, int, int]] = None
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.path, "manifest.json")
+
+    def disk_stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def stale(self) -> bool:
+        """Whether another process has saved this namespace since it was loaded"""
+        return self.disk_stat() != self.manifest_stat
+
+    def load(self):
+        self.manifest_stat = self.disk_stat()
+        if self.manifest_stat is None:
+            return
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        self.dim = manifest["dim"]
+        self.next_segment = manifest["next_segment"]
+        self.deleted = set(manifest["deleted"])
+        for name in manifest["segments"]:
+            vectors = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+            with open(os.path.join(self.path, f"{name}.jsonl")) as f:
+                records = [json.loads(line) for line in f]
+            self._attach(_Segment(name, vectors, records))
+
+    def save_manifest(self):
+        manifest = {
+            "dim": self.dim,
+            "next_segment": self.next_segment,
+            "segments": [segment.name for segment in self.segments],
+            "deleted": sorted(self.deleted),
+        }
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+        self.manifest_stat = self.disk_stat()
+
+    def write_segment(self, vectors: np.ndarray, records: List[Dict]) -> _Segment:
+        """Persist a new segment and reopen its vectors memory-mapped"""
+        name = f"{self.next_segment:06d}"
+        self.next_segment += 1
+        vectors_path = os.path.join(self.path, f"{name}.npy")
+        np.save(vectors_path, np.ascontiguousarray(vectors, dtype=np.float32))
+        with open(os.path.join(self.path, f"{name}.jsonl"), "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        segment = _Segment(name, np.load(vectors_path, mmap_mode="r"), records)
+        self._attach(segment)
+        return segment
+
+    def remove_segment_files(self, segment: _Segment):
+        for suffix in (".npy", ".jsonl"):
+            try:
+                os.remove(os.path.join(self.path, f"{segment.name}{suffix}"))
+            except FileNotFoundError:
+                pass
+
+    def _attach(self, segment: _Segment):
+        self.segments.append(segment)
+        for row, record in enumerate(segment.records):
+            if record["id"] in self.deleted:
+                segment.alive[row] = False
+            else:
+                self._kill(record["id"])
+                self.locations[record["id"]] = (segment, row)
+
+    def _kill(self, chunk_id: str) -> bool:
+        location = self.locations.pop(chunk_id, None)
+        if location is None:
+            return False
+        segment, row = location
+        segment.alive[row] = False
+        return True
+
+    def delete(self, chunk_id: str) -> bool:
+        if self._kill(chunk_id):
+            self.deleted.add(chunk_id)
+            return True
+        return False
+
+    @property
+    def total_rows(self) -> int:
+        return sum(len(segment.records) for segment in self.segments)
+
+
+# Namespaces read by preload() before the server forks, by directory; each worker adopts them on first use
+_preloaded: Dict[str, _Namespace] = {}
+
+
+def preload(persist_directory: str) -> int:
+    """Load every namespace's records and vector maps, so forked workers share one copy; returns rows loaded"""
+    rows = 0
+    if not os.path.isdir(persist_directory):
+        return rows
+    for entry in os.scandir(persist_directory):
+        if not entry.is_dir():
+            continue
+        ns = _Namespace(entry.path)
+        try:
+            ns.load()
+        except FileNotFoundError:
+            # Being compacted; the worker loads it itself
+            continue
+        _preloaded[entry.path] = ns
+        rows += ns.total_rows
+    return rows
+
+
+class LocalVectorStore(VectorStore):
+    """In-process vector store backed by memory-mapped float32 segments on disk.
+
+    Mirrors the parts of the PineconeVectorStore interface CareBuddyRAG uses
+    (namespaces, metadata filters, upsert by id) so either backend can be
+    configured without changing callers. Search is brute-force cosine top-k.
+
+    Several processes can share one persist_directory: vectors are mapped
+    read-only from the same files, so the OS keeps one copy in memory;
+    writes take a per-namespace file lock, and a namespace saved by another
+    process is reloaded on its next use.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        persist_directory: str,
+        text_key: str = "text",
+        namespace: Optional[str] = None,
+    ):
+        self._embedding = embedding
+        self.persist_directory = persist_directory
+        self.text_key = text_key
+        self._default_namespace = namespace or ""
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.RLock()
+        os.makedirs(persist_directory, exist_ok=True)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def _path(self, namespace: str) -> str:
+        dirname = re.sub(r"[^A-Za-z0-9_.-]", "_", namespace) or "_default"
+        return os.path.join(self.persist_directory, dirname)
+
+    def _namespace(self, namespace: Optional[str]) -> _Namespace:
+        namespace = namespace or self._default_namespace
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None:
+                ns = _preloaded.pop(self._path(namespace), None)
+                if ns is not None:
+                    self._namespaces[namespace] = ns
+            if ns is None or ns.stale():
+                for attempt in range(LOAD_ATTEMPTS):
+                    ns = _Namespace(self._path(namespace))
+                    os.makedirs(ns.path, exist_ok=True)
+                    try:
+                        ns.load()
+                        break
+                    except FileNotFoundError:
+                        # A segment was compacted away between reading the manifest and opening it
+                        if attempt == LOAD_ATTEMPTS - 1:
+                            raise
+                self._namespaces[namespace] = ns
+            return ns
+
+    @contextmanager
+    def _writing(self, namespace: Optional[str]) -> Iterator[_Namespace]:
+        """A namespace brought up to date and held exclusively, also against other processes"""
+        namespace = namespace or self._default_namespace
+        with self._lock:
+            path = self._path(namespace)
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, ".lock"), "a") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                yield self._namespace(namespace)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        namespace: Optional[str] = None,
+        batch_size: int = 1000,
+        **kwargs: Any,
+    ) -> List[str]:
+        """Embed and upsert texts, batch_size texts per embedding call"""
+        texts = list(texts)
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            vectors.extend(self._embedding.embed_documents(texts[start:start + batch_size]))
+        return self.add_embeddings(texts, vectors, metadatas=metadatas, ids=ids, namespace=namespace)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        namespace: Optional[str] = None,
+    ) -> List[str]:
+        """Upsert precomputed embeddings as a new segment"""
+        if not texts:
+            return []
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = _normalize(embeddings)
+
+        records = []
+        for chunk_id, text, metadata in zip(ids, texts, metadatas):
+            metadata = {k: v for k, v in metadata.items() if k != self.text_key}
+            records.append({"id": chunk_id, "text": text, "metadata": metadata})
+
+        with self._writing(namespace) as ns:
+            if ns.dim is None:
+                ns.dim = vectors.shape[1]
+            elif vectors.shape[1] != ns.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {ns.dim}")
+            # Re-adding an id replaces it, as a Pinecone upsert does
+            ns.deleted.difference_update(ids)
+            ns.write_segment(vectors, records)
+            self._maybe_compact(ns)
+            ns.save_manifest()
+        logger.debug(f"Stored {len(records)} vectors in local namespace '{namespace or self._default_namespace}'")
+        return ids
+
+    def delete(
+        self,
+        ids: Optional[List[str]] = None,
+        delete_all: Optional[bool] = None,
+        namespace: Optional[str] = None,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> Optional[bool]:
+        """Delete chunks by id, by metadata filter, or the whole namespace"""
+        with self._writing(namespace) as ns:
+            if delete_all:
+                for segment in ns.segments:
+                    ns.remove_segment_files(segment)
+                ns.segments = []
+                ns.locations = {}
+                ns.deleted = set()
+                ns.save_manifest()
+                return True
+
+            targets = list(ids or [])
+            if filter:
+                targets.extend(
+                    chunk_id for chunk_id, (segment, row) in ns.locations.items()
+                    if _matches(segment.records[row]["metadata"], filter)
+                )
+            removed = sum(1 for chunk_id in targets if ns.delete(chunk_id))
+            if removed:
+                self._maybe_compact(ns)
+                ns.save_manifest()
+            return True
+
+    def _maybe_compact(self, ns: _Namespace):
+        """Merge all live rows into one segment when fragmentation gets too high"""
+        total = ns.total_rows
+        if not total:
+            return
+        dead = total - len(ns.locations)
+        if len(ns.segments) <= MAX_SEGMENTS and dead / total <= MAX_DELETED_RATIO:
+            return
+        old_segments = ns.segments
+        vectors = [segment.vectors[segment.alive] for segment in old_segments]
+        records = [
+            record
+            for segment in old_segments
+            for record, alive in zip(segment.records, segment.alive)
+            if alive
+        ]
+        ns.segments = []
+        ns.locations = {}
+        ns.deleted = set()
+        if records:
+            ns.write_segment(np.concatenate(vectors), records)
+        ns.save_manifest()
+        for segment in old_segments:
+            ns.remove_segment_files(segment)
+        logger.debug(f"Compacted {len(old_segments)} segments into {len(ns.segments)} ({len(records)} rows)")
+
+    def similarity_search_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        namespace: Optional[str] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        """Batched cosine top-k: one result list per query vector"""
+        queries = _normalize(embeddings)
+        ns = self._namespace(namespace)
+        with self._lock:
+            segments = list(ns.segments)
+            masks = [segment.alive.copy() for segment in segments]
+        if filter:
+            for segment, mask in zip(segments, masks):
+                for row, record in enumerate(segment.records):
+                    if mask[row] and not _matches(record["metadata"], filter):
+                        mask[row] = False
+
+        candidate_scores = []
+        candidate_refs = []
+        for seg_idx, (segment, mask) in enumerate(zip(segments, masks)):
+            for start in range(0, len(segment.records), SEARCH_BLOCK_ROWS):
+                block_mask = mask[start:start + SEARCH_BLOCK_ROWS]
+                if not block_mask.any():
+                    continue
+                scores = queries @ np.asarray(segment.vectors[start:start + SEARCH_BLOCK_ROWS]).T
+                scores[:, ~block_mask] = -np.inf
+                top = min(k, scores.shape[1])
+                rows = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+                candidate_scores.append(np.take_along_axis(scores, rows, axis=1))
+                candidate_refs.append(np.stack([np.full_like(rows, seg_idx), rows + start], axis=-1))
+
+        if not candidate_scores:
+            return [[] for _ in range(len(queries))]
+
+        all_scores = np.concatenate(candidate_scores, axis=1)
+        all_refs = np.concatenate(candidate_refs, axis=1)
+        results = []
+        for q in range(len(queries)):
+            order = np.argsort(-all_scores[q])[:k]
+            hits = []
+            for idx in order:
+                score = float(all_scores[q, idx])
+                if score == -np.inf:
+                    break
+                seg_idx, row = all_refs[q, idx]
+                record = segments[seg_idx].records[row]
+                doc = Document(page_content=record["text"], metadata=dict(record["metadata"]))
+                hits.append((doc, score))
+            results.append(hits)
+        return results
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        namespace: Optional[str] = None,
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vectors([embedding], k=k, filter=filter, namespace=namespace)[0]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        namespace: Optional[str] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        hits = self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter, namespace=namespace)
+        return [doc for doc, _ in hits]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None,
+        namespace: Optional[str] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter, namespace=namespace)
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None,
+        namespace: Optional[str] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        hits = self.similarity_search_with_score(query, k=k, filter=filter, namespace=namespace)
+        return [doc for doc, _ in hits]
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        persist_directory: str = "./vector_store",
+        namespace: Optional[str] = None,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(embedding=embedding, persist_directory=persist_directory, namespace=namespace)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
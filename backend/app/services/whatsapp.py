@@ -1,41 +1,164 @@
 # backend/app/services/whatsapp.py
-import httpx
+from typing import Dict, Iterable, Optional
+import asyncio
+import importlib.util
 import logging
+import random
+import time
+
+import httpx
 from app.core.config import settings
+from app.core.logging import mask_phone
+from app.core.metrics import WHATSAPP_RETRIES, WHATSAPP_SEND_SECONDS
 
 logger = logging.getLogger(__name__)
 
+# HTTP/2 needs the optional h2 package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Async token bucket: allows `rate` acquisitions per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
 class WhatsAppClient:
-    def __init__(self):
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
         self.access_token = settings.WHATSAPP_ACCESS_TOKEN
         self.phone_number_id = settings.WHATSAPP_PHONE_NUMBER_ID
         self.api_version = "v17.0"
         self.base_url = f"https://graph.facebook.com/{self.api_version}/{self.phone_number_id}"
+        self.transport = transport
+        self.max_retries = settings.WHATSAPP_MAX_RETRIES
+        self.rate_limiter = TokenBucket(
+            rate=settings.WHATSAPP_RATE_LIMIT,
+            capacity=settings.WHATSAPP_RATE_BURST
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Long-lived pooled client, created on first use inside the running event loop"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    "Authorization": f"Bearer {self.access_token}",
+                    "Content-Type": "application/json"
+                },
+                http2=HTTP2_AVAILABLE and self.transport is None,
+                limits=httpx.Limits(
+                    max_connections=settings.WHATSAPP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.WHATSAPP_MAX_CONNECTIONS,
+                    keepalive_expiry=60
+                ),
+                timeout=httpx.Timeout(settings.WHATSAPP_TIMEOUT_SECONDS, connect=5.0),
+                transport=self.transport
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def _backoff(attempt: int, response: Optional[httpx.Response]) -> float:
+        """Seconds to wait before a retry, honoring Retry-After when present"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        return 0.5 * (2 ** attempt) + random.uniform(0, 0.25)
 
     async def send_message(self, to: str, message: str):
         """Send a message via WhatsApp"""
+        payload = {
+            "messaging_product": "whatsapp",
+            "recipient_type": "individual",
+            "to": to,
+            "type": "text",
+            "text": {"body": message}
+        }
+
+        logger.debug("Sending WhatsApp message (%d chars)", len(message))
+        started = time.perf_counter()
+        outcome = "failed"
         try:
-            url = f"{self.base_url}/messages"
-            headers = {
-                "Authorization": f"Bearer {self.access_token}",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "messaging_product": "whatsapp",
-                "recipient_type": "individual",
-                "to": to,
-                "type": "text",
-                "text": {"body": message}
-            }
-
-            logger.debug(f"Sending WhatsApp message to {to}: {message}")
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=payload, headers=headers)
-                response.raise_for_status()
-                logger.debug(f"WhatsApp message sent successfully: {response.json()}")
-                return response.json()
-        except Exception as e:
-            logger.error(f"Error sending WhatsApp message: {str(e)}")
-            raise
-
-whatsapp_client = WhatsAppClient()
\ No newline at end of file
+            result = await self._send_with_retries(to, payload)
+            outcome = "sent"
+            return result
+        finally:
+            WHATSAPP_SEND_SECONDS.labels(outcome).observe(time.perf_counter() - started)
+
+    async def _send_with_retries(self, to: str, payload: Dict):
+        client = self._get_client()
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            response = None
+            try:
+                response = await client.post("/messages", json=payload)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    result = response.json()
+                    logger.debug("WhatsApp message sent: %s", result.get("messages"))
+                    return result
+                error = f"HTTP {response.status_code}"
+            except httpx.TransportError as e:
+                error = str(e) or type(e).__name__
+            except Exception as e:
+                logger.error(f"Error sending WhatsApp message: {str(e)}")
+                raise
+
+            if attempt == self.max_retries:
+                logger.error(f"Error sending WhatsApp message after {attempt + 1} attempts: {error}")
+                if response is not None:
+                    response.raise_for_status()
+                raise httpx.TransportError(error)
+            delay = self._backoff(attempt, response)
+            WHATSAPP_RETRIES.inc()
+            logger.warning(f"WhatsApp send to {mask_phone(to)} failed ({error}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def send_bulk(self, recipients: Iterable[str], message: str, concurrency: Optional[int] = None) -> Dict[str, Dict]:
+        """Send the same message to many patients concurrently; failures are reported per recipient"""
+        semaphore = asyncio.Semaphore(concurrency or settings.WHATSAPP_BULK_CONCURRENCY)
+
+        async def send_one(to: str):
+            async with semaphore:
+                try:
+                    return to, {"status": "sent", "response": await self.send_message(to, message)}
+                except Exception as e:
+                    return to, {"status": "failed", "error": str(e)}
+
+        results = await asyncio.gather(*(send_one(to) for to in recipients))
+        return dict(results)
+
+
+def _create_client() -> WhatsAppClient:
+    if settings.WHATSAPP_FAKE_TRANSPORT:
+        from app.services.fakes import FakeGraphTransport
+
+        logger.info("Using local stand-in transport for WhatsApp")
+        return WhatsAppClient(transport=FakeGraphTransport(latency=settings.WHATSAPP_FAKE_LATENCY))
+    return WhatsAppClient()
+
+whatsapp_client = _create_client()
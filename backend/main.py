@@ -1,23 +1,65 @@
 # backend/main.py
+import time
+
+# Measured from the very start of the import so /ready can report it
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import text
+import asyncio
 import logging
-import sys
-
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+
+from app.core.logging import setup_logging
+
+# Configure logging: JSON through a background thread, levels from settings
+setup_logging()
 
 # Create logger for this file
 logger = logging.getLogger(__name__)
 
+startup_times = {}
+
+async def _warm_up_rag():
+    """Connect to the AI providers in the background; failures are retried on first use"""
+    from app.services.carebuddy_rag import rag_system
+    try:
+        await asyncio.to_thread(rag_system.warm_up)
+    except Exception:
+        logger.warning("RAG warm-up failed; it will be retried on first use")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from app.core.config import settings
+    from app.services.conversation_recorder import conversation_recorder
+    from app.services.ingestion import ingestion_pool
+    from app.services.message_handler import handle_message
+    from app.services.message_queue import message_queue
+    from app.services.whatsapp import whatsapp_client
+
+    if settings.METRICS_ENABLED:
+        from app.core import metrics
+
+        metrics.install()
+    conversation_recorder.start()
+    message_queue.start(handle_message)
+    ingestion_pool.start()
+    warm_up_task = asyncio.create_task(_warm_up_rag())
+    startup_times["startup_seconds"] = round(time.perf_counter() - _import_started, 3)
+    logger.info(f"Startup complete in {startup_times['startup_seconds']}s")
+    yield
+    # Answer what is already queued before the process exits
+    await message_queue.stop(timeout=settings.SHUTDOWN_DRAIN_SECONDS)
+    # Then write the conversations those answers produced
+    await conversation_recorder.stop()
+    await ingestion_pool.stop()
+    await whatsapp_client.aclose()
+    warm_up_task.cancel()
+
 # Create FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -28,18 +70,79 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency by route for /metrics
+from app.core.config import settings
+if settings.METRICS_ENABLED:
+    from app.core.metrics import MetricsMiddleware
+
+    app.add_middleware(MetricsMiddleware)
+
 # Import routes after creating app
 from app.api.routes import router as api_router
 
 # Include routes with prefix
 app.include_router(api_router, prefix="/api")
 
+startup_times["import_seconds"] = round(time.perf_counter() - _import_started, 3)
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     logger.debug("Health check requested")
     return {"status": "healthy"}
 
+# Readiness check: dependencies are usable, unlike /health which only reports the process is up
+@app.get("/ready")
+async def readiness_check():
+    from app.core.config import settings
+    from app.db.database import engine
+    from app.services.carebuddy_rag import rag_system
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        database = "ok"
+    except Exception as e:
+        database = f"error: {str(e)}"
+
+    if rag_system.ready:
+        rag = "ready"
+    elif rag_system.init_error:
+        rag = f"error: {rag_system.init_error}"
+    else:
+        rag = "warming up"
+
+    ready = database == "ok" and rag_system.ready and not settings.missing_settings
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not ready",
+            "database": database,
+            "rag": rag,
+            "rag_init_seconds": rag_system.init_seconds,
+            "missing_settings": settings.missing_settings,
+            **startup_times
+        }
+    )
+
+# Prometheus scrape endpoint
+@app.get("/metrics")
+async def metrics_endpoint():
+    from app.core import metrics
+
+    if not settings.METRICS_ENABLED:
+        return JSONResponse(status_code=404, content={"detail": "Metrics are disabled"})
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8001)
\ No newline at end of file
+    import argparse
+    from app.core.server import serve
+
+    parser = argparse.ArgumentParser(description="Run the CareBuddy API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS,
+                        help="pre-forked worker processes sharing the socket and index memory")
+    args = parser.parse_args()
+    serve(app, host=args.host, port=args.port, workers=args.workers)
\ No newline at end of file
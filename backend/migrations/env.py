@@ -0,0 +1,58 @@
+# backend/migrations/env.py
+import sys
+from logging.config import fileConfig
+from pathlib import Path
+
+from alembic import context
+
+# Add the backend directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.db.database import create_db_engine
+from app.db.base import Base
+from app.db import models  # noqa: F401  (registers the tables on Base.metadata)
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+database_url = config.get_main_option("sqlalchemy.url") or settings.DATABASE_URL
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Leave the FTS5 table and its shadow tables, created by migration 0006, out of autogenerate"""
+    return not (type_ == "table" and name.startswith("document_chunks_fts"))
+
+
+def run_migrations_offline():
+    context.configure(
+        url=database_url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        include_object=include_object,
+        render_as_batch=database_url.startswith("sqlite"),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    engine = create_db_engine(database_url)
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+    engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,66 @@
+"""Initial schema, as previously created by Base.metadata.create_all
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'doctors',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('uid', sa.String(4), unique=True),
+        sa.Column('name', sa.String(100)),
+        sa.Column('email', sa.String(100), unique=True),
+    )
+    op.create_table(
+        'care_buddies',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('bid', sa.String(6), unique=True),
+        sa.Column('name', sa.String(100)),
+        sa.Column('doctor_id', sa.Integer(), sa.ForeignKey('doctors.id')),
+        sa.Column('creation_date', sa.DateTime()),
+    )
+    op.create_table(
+        'user_sessions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('phone_number', sa.String(20)),
+        sa.Column('buddy_id', sa.Integer(), sa.ForeignKey('care_buddies.id')),
+        sa.Column('first_seen', sa.DateTime()),
+        sa.Column('last_active', sa.DateTime()),
+    )
+    op.create_table(
+        'conversations',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('buddy_id', sa.Integer(), sa.ForeignKey('care_buddies.id')),
+        sa.Column('user_session_id', sa.Integer(), sa.ForeignKey('user_sessions.id')),
+        sa.Column('timestamp', sa.DateTime()),
+        sa.Column('query', sa.Text()),
+        sa.Column('response', sa.Text()),
+        sa.Column('helpful', sa.Boolean(), nullable=True),
+    )
+    op.create_table(
+        'documents',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('buddy_id', sa.Integer(), sa.ForeignKey('care_buddies.id')),
+        sa.Column('filename', sa.String(255)),
+        sa.Column('content', sa.Text()),
+        sa.Column('upload_date', sa.DateTime()),
+    )
+
+
+def downgrade():
+    op.drop_table('documents')
+    op.drop_table('conversations')
+    op.drop_table('user_sessions')
+    op.drop_table('care_buddies')
+    op.drop_table('doctors')
@@ -0,0 +1,46 @@
+"""Ingestion job and file tables for background document processing
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001a'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases adopted before this revision existed may already have them
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if 'ingest_jobs' not in existing:
+        op.create_table(
+            'ingest_jobs',
+            sa.Column('id', sa.String(32), primary_key=True),
+            sa.Column('buddy_id', sa.Integer(), sa.ForeignKey('care_buddies.id')),
+            sa.Column('status', sa.String(20)),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+        )
+    if 'ingest_files' not in existing:
+        op.create_table(
+            'ingest_files',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('job_id', sa.String(32), sa.ForeignKey('ingest_jobs.id')),
+            sa.Column('filename', sa.String(255)),
+            sa.Column('path', sa.String(512)),
+            sa.Column('status', sa.String(20)),
+            sa.Column('chunks_total', sa.Integer()),
+            sa.Column('chunks_done', sa.Integer()),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('document_id', sa.Integer(), sa.ForeignKey('documents.id'), nullable=True),
+        )
+
+
+def downgrade():
+    op.drop_table('ingest_files')
+    op.drop_table('ingest_jobs')
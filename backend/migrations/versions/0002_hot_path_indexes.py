@@ -0,0 +1,34 @@
+"""Indexes for the webhook and dashboard query paths
+
+Revision ID: 0002
+Revises: 0001a
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = '0002'
+down_revision = '0001a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Webhook: session lookup by sender
+    op.create_index('ix_user_sessions_phone_number', 'user_sessions', ['phone_number'])
+    # Dashboard: active patients per buddy
+    op.create_index('ix_user_sessions_buddy_id_last_active', 'user_sessions', ['buddy_id', 'last_active'])
+    # Dashboard: conversations per buddy, optionally within a time window
+    op.create_index('ix_conversations_buddy_id_timestamp', 'conversations', ['buddy_id', 'timestamp'])
+    op.create_index('ix_documents_buddy_id', 'documents', ['buddy_id'])
+    op.create_index('ix_care_buddies_doctor_id', 'care_buddies', ['doctor_id'])
+    op.create_index('ix_ingest_files_job_id', 'ingest_files', ['job_id'])
+
+
+def downgrade():
+    op.drop_index('ix_ingest_files_job_id', table_name='ingest_files')
+    op.drop_index('ix_care_buddies_doctor_id', table_name='care_buddies')
+    op.drop_index('ix_documents_buddy_id', table_name='documents')
+    op.drop_index('ix_conversations_buddy_id_timestamp', table_name='conversations')
+    op.drop_index('ix_user_sessions_buddy_id_last_active', table_name='user_sessions')
+    op.drop_index('ix_user_sessions_phone_number', table_name='user_sessions')
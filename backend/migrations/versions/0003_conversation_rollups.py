@@ -0,0 +1,39 @@
+"""Hourly per-buddy conversation rollups for the time-series dashboard
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'conversation_rollups',
+        sa.Column('buddy_id', sa.Integer(), sa.ForeignKey('care_buddies.id'), primary_key=True),
+        sa.Column('bucket_start', sa.DateTime(), primary_key=True),
+        sa.Column('questions', sa.Integer()),
+        sa.Column('unique_patients', sa.Integer()),
+        sa.Column('helpful', sa.Integer()),
+        sa.Column('rated', sa.Integer()),
+        sa.Column('latency_ms_sum', sa.Float()),
+        sa.Column('latency_count', sa.Integer()),
+    )
+    op.create_table(
+        'rollup_patients',
+        sa.Column('buddy_id', sa.Integer(), sa.ForeignKey('care_buddies.id'), primary_key=True),
+        sa.Column('bucket_start', sa.DateTime(), primary_key=True),
+        sa.Column('user_session_id', sa.Integer(), sa.ForeignKey('user_sessions.id'), primary_key=True),
+    )
+
+
+def downgrade():
+    op.drop_table('rollup_patients')
+    op.drop_table('conversation_rollups')
@@ -0,0 +1,22 @@
+"""Index for loading a patient's recent conversation turns
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Conversation memory: latest turns of one session
+    op.create_index('ix_conversations_user_session_id_timestamp', 'conversations', ['user_session_id', 'timestamp'])
+
+
+def downgrade():
+    op.drop_index('ix_conversations_user_session_id_timestamp', table_name='conversations')
@@ -0,0 +1,37 @@
+"""Document versions and content-hashed chunks for incremental re-ingestion
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('documents', sa.Column('version', sa.Integer(), server_default='1'))
+    op.add_column('documents', sa.Column('content_hash', sa.String(64), nullable=True))
+    op.create_table(
+        'document_chunks',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('document_id', sa.Integer(), sa.ForeignKey('documents.id')),
+        sa.Column('chunk_hash', sa.String(64)),
+        sa.Column('chunk_index', sa.Integer()),
+        sa.Column('version', sa.Integer()),
+    )
+    op.create_index('ix_document_chunks_document_id_chunk_hash', 'document_chunks',
+                    ['document_id', 'chunk_hash'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_document_chunks_document_id_chunk_hash', table_name='document_chunks')
+    op.drop_table('document_chunks')
+    with op.batch_alter_table('documents') as batch_op:
+        batch_op.drop_column('content_hash')
+        batch_op.drop_column('version')
@@ -0,0 +1,49 @@
+"""Chunk text with an FTS5 index for lexical retrieval (SQLite only)
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('document_chunks', sa.Column('text', sa.Text(), nullable=True))
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    # External-content index: the text lives in document_chunks, triggers keep it in sync
+    op.execute(
+        "CREATE VIRTUAL TABLE document_chunks_fts USING fts5("
+        "text, content='document_chunks', content_rowid='id', tokenize='porter unicode61')"
+    )
+    op.execute(
+        "CREATE TRIGGER document_chunks_fts_insert AFTER INSERT ON document_chunks BEGIN "
+        "INSERT INTO document_chunks_fts(rowid, text) VALUES (new.id, new.text); END"
+    )
+    op.execute(
+        "CREATE TRIGGER document_chunks_fts_delete AFTER DELETE ON document_chunks BEGIN "
+        "INSERT INTO document_chunks_fts(document_chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); END"
+    )
+    op.execute(
+        "CREATE TRIGGER document_chunks_fts_update AFTER UPDATE OF text ON document_chunks BEGIN "
+        "INSERT INTO document_chunks_fts(document_chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+        "INSERT INTO document_chunks_fts(rowid, text) VALUES (new.id, new.text); END"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS document_chunks_fts_update")
+        op.execute("DROP TRIGGER IF EXISTS document_chunks_fts_delete")
+        op.execute("DROP TRIGGER IF EXISTS document_chunks_fts_insert")
+        op.execute("DROP TABLE IF EXISTS document_chunks_fts")
+    with op.batch_alter_table('document_chunks') as batch_op:
+        batch_op.drop_column('text')
@@ -0,0 +1,40 @@
+# backend/scripts/backfill_rollups.py
+"""Rebuild the hourly conversation rollups from the conversations table.
+
+    python scripts/backfill_rollups.py [--since 2026-01-01T00:00:00]
+
+Without --since every bucket is rebuilt; with it only buckets from that hour on.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import logging
+from app.db.session import SessionLocal
+from app.db.rollups import rebuild_rollups
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None,
+                        help="only rebuild buckets from this UTC time onwards")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        buckets = rebuild_rollups(db, since=args.since)
+        logger.info(f"Backfilled {buckets} buckets in {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Backfill failed: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
@@ -0,0 +1,96 @@
+# backend/scripts/bench_dashboard.py
+"""Dashboard statistics latency as the conversations table grows.
+
+Compares the old approach (load every conversation row and count in Python)
+with the grouped queries in app.db.stats, on scratch databases seeded with
+the same generator as bench_indexes.
+
+    python scripts/bench_dashboard.py [conversations ...]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import logging
+from sqlalchemy.orm import sessionmaker
+from app.db.database import create_db_engine
+from app.db.migrations import upgrade_database
+from app.db.models import CareBuddy, Conversation, UserSession
+from app.db.stats import buddy_stats, doctor_impact
+
+import bench_indexes
+from bench_indexes import seed
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def rows_buddy_stats(db, buddy_id, active_since):
+    """The previous implementation: every row is loaded and counted in Python"""
+    conversations = db.query(Conversation).filter(Conversation.buddy_id == buddy_id).all()
+    helpful = len([c for c in conversations if c.helpful is True])
+    rated = len([c for c in conversations if c.helpful is not None])
+    active = db.query(UserSession).filter(
+        UserSession.buddy_id == buddy_id,
+        UserSession.last_active >= active_since
+    ).count()
+    return len(conversations), helpful, rated, active
+
+def rows_doctor_impact(db, doctor_id, start_date):
+    """The previous implementation for the impact panel"""
+    buddies = db.query(CareBuddy).filter(CareBuddy.doctor_id == doctor_id).count()
+    conversations = db.query(Conversation).join(CareBuddy).filter(
+        CareBuddy.doctor_id == doctor_id,
+        Conversation.timestamp >= start_date
+    ).all()
+    helpful = len([c for c in conversations if c.helpful])
+    return buddies, len(conversations), helpful
+
+def timed(fn, runs: int = 10) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def run(conversations: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        url = f"sqlite:///{path}"
+        upgrade_database(url)
+        seed(path, conversations)
+
+        engine = create_db_engine(url)
+        db = sessionmaker(bind=engine)()
+        now = bench_indexes.NOW
+        month = now - timedelta(days=30)
+        buddy = lambda: random.randrange(1, bench_indexes.BUDDIES + 1)
+        doctor = lambda: random.randrange(1, bench_indexes.DOCTORS + 1)
+
+        results = {
+            "buddy stats (rows)": timed(lambda: rows_buddy_stats(db, buddy(), month)),
+            "buddy stats (sql)": timed(lambda: buddy_stats(db, buddy(), month)),
+            "doctor impact (rows)": timed(lambda: rows_doctor_impact(db, doctor(), month)),
+            "doctor impact (sql)": timed(lambda: doctor_impact(db, doctor(), month)),
+        }
+        db.close()
+        engine.dispose()
+
+    logger.info(f"--- {conversations} conversations ---")
+    for name, median in results.items():
+        logger.info(f"{name}: median {median:.2f}ms")
+    return results
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    random.seed(42)
+    for size in sizes:
+        run(size)
@@ -0,0 +1,125 @@
+# backend/scripts/bench_indexes.py
+"""Query plans and timings for the hot query paths before and after the index migration.
+
+Seeds a scratch SQLite database at the baseline revision (no secondary
+indexes), runs each hot query, applies the remaining migrations and runs
+them again.
+
+    python scripts/bench_indexes.py [conversations] [sessions]
+"""
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import logging
+from app.db.migrations import upgrade_database
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DOCTORS = 50
+BUDDIES = 500
+SESSIONS = 50_000
+NOW = datetime(2026, 1, 1)
+
+HOT_QUERIES = {
+    "webhook session lookup": (
+        "SELECT id, buddy_id FROM user_sessions WHERE phone_number = ? LIMIT 1",
+        lambda: (f"+1555{random.randrange(SESSIONS):07d}",),
+    ),
+    "buddy conversation stats": (
+        "SELECT count(*), sum(helpful = 1), count(helpful) FROM conversations WHERE buddy_id = ?",
+        lambda: (random.randrange(1, BUDDIES + 1),),
+    ),
+    "buddy active patients": (
+        "SELECT count(*) FROM user_sessions WHERE buddy_id = ? AND last_active >= ?",
+        lambda: (random.randrange(1, BUDDIES + 1), (NOW - timedelta(days=30)).isoformat(" ")),
+    ),
+    "doctor impact (week)": (
+        "SELECT count(*) FROM conversations JOIN care_buddies ON care_buddies.id = conversations.buddy_id "
+        "WHERE care_buddies.doctor_id = ? AND conversations.timestamp >= ?",
+        lambda: (random.randrange(1, DOCTORS + 1), (NOW - timedelta(days=7)).isoformat(" ")),
+    ),
+    "buddy documents": (
+        "SELECT id, filename, upload_date FROM documents WHERE buddy_id = ?",
+        lambda: (random.randrange(1, BUDDIES + 1),),
+    ),
+}
+
+def seed(path: str, conversations: int):
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO doctors (id, uid, name, email) VALUES (?, ?, ?, ?)",
+                     [(i, f"D{i:03d}", f"Doctor {i}", f"d{i}@example.com") for i in range(1, DOCTORS + 1)])
+    conn.executemany("INSERT INTO care_buddies (id, bid, name, doctor_id, creation_date) VALUES (?, ?, ?, ?, ?)",
+                     [(i, f"B{i:05d}", f"Buddy {i}", (i % DOCTORS) + 1, NOW) for i in range(1, BUDDIES + 1)])
+    conn.executemany(
+        "INSERT INTO user_sessions (id, phone_number, buddy_id, first_seen, last_active) VALUES (?, ?, ?, ?, ?)",
+        [(i + 1, f"+1555{i:07d}", random.randrange(1, BUDDIES + 1), NOW,
+          NOW - timedelta(minutes=random.randrange(60 * 24 * 90))) for i in range(SESSIONS)]
+    )
+    conn.executemany("INSERT INTO documents (buddy_id, filename, upload_date) VALUES (?, ?, ?)",
+                     [(random.randrange(1, BUDDIES + 1), f"protocol-{i}.txt", NOW) for i in range(BUDDIES * 4)])
+
+    batch = []
+    for _ in range(conversations):
+        batch.append((
+            random.randrange(1, BUDDIES + 1),
+            random.randrange(1, SESSIONS + 1),
+            NOW - timedelta(minutes=random.randrange(60 * 24 * 365)),
+            "When can I shower after surgery?",
+            "After 48 hours, keep the dressing dry.",
+            random.choice([None, None, True, False]),
+        ))
+        if len(batch) == 100000:
+            conn.executemany("INSERT INTO conversations (buddy_id, user_session_id, timestamp, query, response, helpful) "
+                             "VALUES (?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO conversations (buddy_id, user_session_id, timestamp, query, response, helpful) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+def measure(path: str, label: str, runs: int = 20):
+    conn = sqlite3.connect(path)
+    logger.info(f"--- {label} ---")
+    for name, (sql, params) in HOT_QUERIES.items():
+        plan = "; ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params()))
+        timings = []
+        for _ in range(runs):
+            args = params()
+            start = time.perf_counter()
+            conn.execute(sql, args).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        logger.info(f"{name}: median {statistics.median(timings):.3f}ms | plan: {plan}")
+    conn.close()
+
+if __name__ == "__main__":
+    conversations = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    SESSIONS = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    random.seed(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        url = f"sqlite:///{path}"
+        upgrade_database(url, "0001")
+        start = time.perf_counter()
+        seed(path, conversations)
+        logger.info(f"Seeded {conversations} conversations in {time.perf_counter() - start:.1f}s")
+
+        measure(path, "baseline (0001, primary keys only)")
+        start = time.perf_counter()
+        upgrade_database(url, "head")
+        sqlite3.connect(path).execute("ANALYZE").connection.close()
+        logger.info(f"Applied index migrations in {time.perf_counter() - start:.1f}s")
+        measure(path, "after index migrations (head)")
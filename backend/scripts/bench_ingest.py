@@ -0,0 +1,70 @@
+# backend/scripts/bench_ingest.py
+"""Document ingestion time against a provider with fixed per-request latency.
+
+Chunks a generated guideline set (about 3,000 characters a page) and stores
+it through CareBuddyRAG.process_document_chunks on a scratch local vector
+store, with the fake embedding provider sleeping --latency per request.
+Each configuration is (chunks per embedding request, requests in flight);
+the serial (100, 1) row approximates the old one-batch-at-a-time path.
+
+    python scripts/bench_ingest.py [--pages 500] [--latency 0.3]
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CONFIGS = [(100, 1), (256, 1), (256, 4), (256, 8)]
+
+def guideline(pages: int) -> str:
+    paragraph = ("Section {n}. Patients recovering from procedure {n} should keep the site clean and dry, "
+                 "take prescribed medication {m} times a day and report fever above 38 degrees. ")
+    return "\n\n".join(paragraph.format(n=n, m=n % 4 + 1) * 3 for n in range(pages * 6))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per embedding request")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="carebuddy-ingest-")
+    os.environ.update({
+        "OPENAI_FAKE": "true",
+        "OPENAI_FAKE_EMBED_LATENCY": str(args.latency),
+        "VECTOR_STORE": "local",
+        "LOCAL_VECTOR_DIR": os.path.join(workdir, "vector_store"),
+        "EMBEDDING_CACHE_PATH": "",  # Every run pays for its embeddings
+    })
+
+    from app.core.config import settings
+    from app.services.carebuddy_rag import CareBuddyRAG
+
+    text = guideline(args.pages)
+    for run, (batch_size, concurrency) in enumerate(CONFIGS):
+        settings.INGEST_BATCH_SIZE = batch_size
+        settings.INGEST_EMBED_CONCURRENCY = concurrency
+        rag = CareBuddyRAG()
+        rag.warm_up()
+        chunks = rag.text_splitter.split_text(text)
+        requests = math.ceil(len(chunks) / batch_size)
+
+        started = time.perf_counter()
+        result = rag.process_document_chunks(chunks, buddy_id=run, doc_id="doc-1")
+        elapsed = time.perf_counter() - started
+        # Provider-bound floor: every request's latency, spread over the requests in flight
+        floor = math.ceil(requests / concurrency) * args.latency
+        logger.info(
+            f"batch {batch_size:>4} x {concurrency} in flight: {len(result.added)} chunks, {requests} requests "
+            f"in {elapsed:6.2f}s (provider floor {floor:.2f}s)"
+        )
@@ -0,0 +1,138 @@
+# backend/scripts/bench_logging.py
+"""Logging cost per webhook message on the request thread.
+
+Replays the log calls one answered WhatsApp message makes, before and
+after app.core.logging: the old basicConfig(DEBUG) setup writing
+synchronously with eager f-strings and an indented webhook dump, and the
+queued JSON setup at INFO and DEBUG with %-style calls and sampled payloads.
+Output goes to a scratch file so terminal speed does not skew the numbers.
+
+    python scripts/bench_logging.py [requests]
+"""
+import json
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.core.logging import log_payload, setup_logging, stop_logging
+
+logger = logging.getLogger("app.bench")
+report = logging.getLogger(__name__)
+
+PAYLOAD = {
+    "object": "whatsapp_business_account",
+    "entry": [{"id": "1029384756", "changes": [{"field": "messages", "value": {
+        "messaging_product": "whatsapp",
+        "metadata": {"display_phone_number": "15550001234", "phone_number_id": "1234567890"},
+        "contacts": [{"profile": {"name": "Patient"}, "wa_id": "447000000001"}],
+        "messages": [{"from": "447000000001", "id": "wamid.HBgLNDQ3MDAwMDAwMDEVAgASGBQzQTdGQ0I0",
+                      "timestamp": "1760000000", "type": "text",
+                      "text": {"body": "When can I shower after the operation?"}}]
+    }}]}]
+}
+DOCUMENTS = ["Keep the wound clean and dry. " * 40] * 5
+HITS = [({"doc_id": "doc-1", "chunk_index": i}, "Change the dressing daily. " * 20) for i in range(3)]
+ANSWER = "You can shower after 48 hours. Pat the wound dry and do not soak it in a bath."
+
+def old_request():
+    """The log calls of one message before structured logging"""
+    body = PAYLOAD
+    logger.debug(f"Received webhook: {json.dumps(body, indent=2)}")
+    message = body["entry"][0]["changes"][0]["value"]["messages"][0]
+    logger.debug(f"Processing message from {message['from']}: {message['text']['body']}")
+    logger.debug(f"About to query RAG with message: {message['text']['body']}")
+    logger.debug(f"Current buddy_id: {1}")
+    logger.debug(f"Found {len(DOCUMENTS)} documents for buddy")
+    for i, content in enumerate(DOCUMENTS):
+        logger.debug(f"Document {i} content preview: {content[:200]}")
+    logger.debug(f"Processing query: {message['text']['body']}")
+    logger.debug(f"Similar docs found: {len(HITS)}")
+    for i, (metadata, content) in enumerate(HITS):
+        logger.debug(f"Doc {i} ({0.9:.3f}) content: {content[:200]}...")
+        logger.debug(f"Doc {i} metadata: {metadata}")
+    logger.debug(f"Generated response: {ANSWER}")
+    timings = {"embed": 0.05, "search": 0.002, "llm": 0.6}
+    logger.info(
+        f"Answered for buddy {1} in {652:.0f}ms ("
+        + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in timings.items()) + ")"
+    )
+    logger.debug(f"RAG response: {ANSWER}")
+    logger.debug(f"Sending WhatsApp message to {message['from']}: {ANSWER}")
+    logger.debug(f"WhatsApp message sent successfully: {{'messages': [{{'id': 'wamid.1'}}]}}")
+
+def new_request():
+    """The same message's log calls as the app now makes them"""
+    body = PAYLOAD
+    log_payload(logger, "Webhook", body)
+    message = body["entry"][0]["changes"][0]["value"]["messages"][0]
+    logger.debug("Processing message %s (%d chars)", message["id"], len(message["text"]["body"]))
+    logger.debug("Querying RAG for session %s on buddy %s", 1, 1)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Found %d documents for buddy", len(DOCUMENTS))
+        for i, content in enumerate(DOCUMENTS):
+            logger.debug("Document %s content preview: %.200s", i, content)
+    logger.debug("Processing query for buddy %s (%d chars)", 1, len(message["text"]["body"]))
+    logger.debug("Similar docs found: %d", len(HITS))
+    if logger.isEnabledFor(logging.DEBUG):
+        for i, (metadata, content) in enumerate(HITS):
+            logger.debug("Doc %d (%.3f) %s content: %.200s...", i, 0.9, metadata, content)
+    logger.debug("Generated response: %d chars", len(ANSWER))
+    timings = {"embed": 0.05, "search": 0.002, "llm": 0.6}
+    logger.info(
+        "Answered for buddy %s in %.0fms", 1, 652,
+        extra={"buddy_id": 1, "retrieval": "hybrid",
+               "timings_ms": {name: round(seconds * 1000, 1) for name, seconds in timings.items()}}
+    )
+    logger.debug("RAG response for message %s: %d chars", message["id"], len(ANSWER))
+    logger.debug("Sending WhatsApp message (%d chars)", len(ANSWER))
+    logger.debug("WhatsApp message sent: %s", [{"id": "wamid.1"}])
+
+def measure(request, requests: int) -> list:
+    """Microseconds of request-thread time per replayed message"""
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        request()
+        samples.append((time.perf_counter() - started) * 1e6)
+    return samples
+
+def run(name: str, request, requests: int, configure):
+    with tempfile.TemporaryFile("w") as out:
+        configure(out)
+        measure(request, min(requests, 200))  # warm up
+        samples = sorted(measure(request, requests))
+        stop_logging()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+    return name, statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+def basic_config(level):
+    return lambda out: logging.basicConfig(
+        level=level, stream=out, force=True,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    settings.LOG_PAYLOAD_SAMPLE_RATE = 0.01
+
+    results = [
+        run("old: basicConfig DEBUG, sync", old_request, requests, basic_config(logging.DEBUG)),
+        run("old calls at INFO, sync", old_request, requests, basic_config(logging.INFO)),
+        run("new: queued JSON, INFO", new_request, requests,
+            lambda out: setup_logging(level="INFO", fmt="json", stream=out)),
+        run("new: queued JSON, DEBUG", new_request, requests,
+            lambda out: setup_logging(level="DEBUG", fmt="json", stream=out)),
+    ]
+
+    logging.basicConfig(level=logging.INFO, force=True)
+    for name, median, p99 in results:
+        report.info(f"{name:<32} median {median:8.1f}us  p99 {p99:8.1f}us per message")
@@ -0,0 +1,113 @@
+# backend/scripts/bench_recorder.py
+"""Conversation write cost under a burst of messages, before and after the recorder.
+
+Writes --messages answered conversations from --threads concurrent
+threads on a scratch SQLite database, the way message workers do: the
+old path commits the question, then commits again with the answer and its
+rollup counts; the new path hands each to ConversationRecorder, which
+also sets the sessions' last_active, and the wall time includes the
+flushes that write them. Reports messages per second and the p95 time a
+message thread spent on storage.
+
+    python scripts/bench_recorder.py [--messages 2000] [--threads 8]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SESSIONS = 200
+
+def burst(write, messages: int, threads: int) -> list:
+    """Seconds each message spent in write, from threads writing concurrently"""
+    samples = []
+    lock = threading.Lock()
+
+    def run(offset: int):
+        for i in range(offset, messages, threads):
+            started = time.perf_counter()
+            write(i)
+            with lock:
+                samples.append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return samples
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="carebuddy-recorder-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+
+    from app.db.database import SessionLocal, init_db
+    from app.db.models import CareBuddy, Conversation, UserSession
+    from app.db.rollups import record_conversation
+    from app.services.conversation_recorder import ConversationRecord, ConversationRecorder
+
+    init_db()
+    db = SessionLocal()
+    buddy = CareBuddy(bid="BR01", name="Recorder benchmark buddy", doctor_id=1)
+    db.add(buddy)
+    db.flush()
+    buddy_id = buddy.id
+    db.add_all([UserSession(phone_number=f"4470000{s:05d}", buddy_id=buddy_id) for s in range(SESSIONS)])
+    db.commit()
+    session_ids = [s.id for s in db.query(UserSession.id).all()]
+    db.close()
+
+    def old_write(i: int):
+        db = SessionLocal()
+        try:
+            conversation = Conversation(buddy_id=buddy_id, user_session_id=session_ids[i % SESSIONS],
+                                        query=f"Question {i}")
+            db.add(conversation)
+            db.commit()
+            conversation.response = f"Answer {i}"
+            record_conversation(db, buddy_id=buddy_id, user_session_id=conversation.user_session_id,
+                                timestamp=conversation.timestamp, latency_seconds=0.5)
+            db.commit()
+        finally:
+            db.close()
+
+    recorder = ConversationRecorder(batch_size=100)
+
+    def new_write(i: int):
+        recorder.record(ConversationRecord(buddy_id, session_ids[i % SESSIONS], f"Question {i}", f"Answer {i}",
+                                           datetime.now(timezone.utc), 0.5))
+        if i % recorder.batch_size == 0:
+            # Stands in for the flush task, which runs on its own thread
+            threading.Thread(target=recorder.flush).start()
+
+    for name, write in (("old: two commits per message", old_write), ("recorder, batches of 100", new_write)):
+        started = time.perf_counter()
+        samples = sorted(burst(write, args.messages, args.threads))
+        if write is new_write:
+            recorder.flush()
+        elapsed = time.perf_counter() - started
+        p95 = statistics.quantiles(samples, n=100)[94] * 1000
+        logger.info(f"{name:<30} {args.messages / elapsed:8.0f} messages/s  "
+                    f"p95 on the message thread {p95:8.3f}ms")
+
+    db = SessionLocal()
+    logger.info(f"{db.query(Conversation).count()} conversations written; recorder {recorder.stats()}")
+    db.close()
@@ -0,0 +1,200 @@
+# backend/scripts/bench_workers.py
+"""Throughput and memory of the API served by 1, 2 and 4 pre-forked workers.
+
+Seeds a buddy on a scratch database and local vector store, ingests
+generated documents once, then for each worker count starts
+`python main.py --workers N` against the fake OpenAI provider and drives
+POST /api/buddy/{bid}/ask (unique questions, so every request embeds,
+searches and generates) mixed with GET /api/buddy/{bid} at a fixed
+concurrency. Reports requests/s, p50/p95 and each worker's RSS and PSS from
+/proc/<pid>/smaps_rollup: PSS splits shared pages between the processes
+mapping them, so a flat per-worker PSS total means the index and code are
+shared rather than copied.
+
+    python scripts/bench_workers.py [--workers 1 2 4] [--requests 400] [--concurrency 24]
+
+Only meaningful on a machine with at least as many cores as workers.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+import httpx
+
+from load_test import QUESTIONS, document_text, percentiles
+
+BACKEND = Path(__file__).parent.parent
+
+def environment(workdir: str, args) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{workdir}/bench.db",
+        "VECTOR_STORE": "local",
+        "LOCAL_VECTOR_DIR": f"{workdir}/vector_store",
+        "EMBEDDING_CACHE_PATH": "",
+        "INGEST_UPLOAD_DIR": f"{workdir}/uploads",
+        "SHARED_STATE_DIR": f"{workdir}/shared",
+        "OPENAI_FAKE": "true",
+        "OPENAI_FAKE_EMBED_LATENCY": str(args.embed_latency),
+        "OPENAI_FAKE_LLM_LATENCY": str(args.llm_latency),
+        "OPENAI_FAKE_TOKEN_LATENCY": "0",
+        "WHATSAPP_FAKE_TRANSPORT": "true",
+        "LOG_LEVEL": "WARNING",
+        "LOG_FORMAT": "text",
+        "METRICS_ENABLED": "false",
+    })
+    env.setdefault("OPENAI_API_KEY", "bench")
+    env.setdefault("PINECONE_API_KEY", "bench")
+    return env
+
+def start_server(env: Dict[str, str], workers: int, port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "main.py", "--workers", str(workers), "--port", str(port)],
+        cwd=BACKEND, env=env
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with status {server.returncode}")
+        time.sleep(0.2)
+    stop_server(server)
+    raise TimeoutError("Server did not become ready in 60s")
+
+def stop_server(server: subprocess.Popen):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+def worker_pids(server: subprocess.Popen, workers: int) -> List[int]:
+    if workers <= 1:
+        return [server.pid]
+    children = Path(f"/proc/{server.pid}/task/{server.pid}/children")
+    return [int(pid) for pid in children.read_text().split()] if children.exists() else []
+
+def memory_kb(pid: int) -> Dict[str, int]:
+    """Rss, Pss and shared pages of a process in kB, from /proc (Linux only)"""
+    fields = {}
+    try:
+        for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+            name, _, value = line.partition(":")
+            if name in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty"):
+                fields[name] = int(value.split()[0])
+    except OSError:
+        return {}
+    return {"rss": fields["Rss"], "pss": fields["Pss"],
+            "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)}
+
+async def ingest(base_url: str, bid: str, documents: int, paragraphs: int):
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        files = [("files", (f"guide-{d}.txt", document_text(d, paragraphs).encode(), "text/plain"))
+                 for d in range(documents)]
+        response = await client.post(f"/api/buddy/{bid}/documents", files=files)
+        response.raise_for_status()
+        job_id = response.json()["job_id"]
+        while (status := (await client.get(f"/api/ingest/{job_id}")).json())["status"] in ("queued", "running"):
+            await asyncio.sleep(0.2)
+        if status["status"] != "completed":
+            raise RuntimeError(f"Ingestion ended {status['status']}: {status['files']}")
+
+async def drive(base_url: str, bid: str, requests: int, concurrency: int, run: int) -> Dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(client: httpx.AsyncClient, i: int):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if i % 4 == 3:
+                    response = await client.get(f"/api/buddy/{bid}")
+                else:
+                    # A unique question misses the answer cache and runs the whole pipeline
+                    query = f"{QUESTIONS[i % len(QUESTIONS)]} (run {run}, request {i})"
+                    response = await client.post(f"/api/buddy/{bid}/ask", json={"query": query})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+            except httpx.HTTPError:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client, i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+    return {"rps": len(latencies) / elapsed, "errors": errors, **percentiles(latencies)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=24,
+                        help="keep below DB_POOL_SIZE + DB_MAX_OVERFLOW; streamed answers hold a connection each")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--paragraphs", type=int, default=200)
+    parser.add_argument("--embed-latency", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8011)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="carebuddy-workers-")
+    env = environment(workdir, args)
+    os.environ.update(env)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    from app.db.database import SessionLocal, init_db
+    from app.db.models import CareBuddy
+
+    init_db()
+    db = SessionLocal()
+    db.add(CareBuddy(bid="BW01", name="Worker benchmark buddy", doctor_id=1))
+    db.commit()
+    db.close()
+
+    server = start_server(env, 1, args.port)
+    try:
+        asyncio.run(ingest(base_url, "BW01", args.documents, args.paragraphs))
+    finally:
+        stop_server(server)
+    logger.info(f"Ingested {args.documents} documents into {workdir}; {os.cpu_count()} CPUs available")
+
+    for run, workers in enumerate(args.workers):
+        server = start_server(env, workers, args.port)
+        try:
+            asyncio.run(drive(base_url, "BW01", min(args.requests, 50), args.concurrency, -1 - run))  # warm up
+            result = asyncio.run(drive(base_url, "BW01", args.requests, args.concurrency, run))
+            memory = [m for m in (memory_kb(pid) for pid in worker_pids(server, workers)) if m]
+        finally:
+            stop_server(server)
+        logger.info(
+            f"{workers} worker(s): {result['rps']:7.1f} req/s  p50 {result.get('p50_ms', 0):7.1f}ms  "
+            f"p95 {result.get('p95_ms', 0):7.1f}ms  errors {result['errors']}  "
+            f"RSS {sum(m['rss'] for m in memory) / 1024:6.1f}MB  "
+            f"PSS {sum(m['pss'] for m in memory) / 1024:6.1f}MB  "
+            f"shared/worker {sum(m['shared'] for m in memory) / 1024 / max(len(memory), 1):6.1f}MB"
+        )
@@ -8,20 +8,21 @@ project_root = str(Path(__file__).parent.parent)
 sys.path.append(project_root)
 
 import logging
-from app.db.session import engine, SessionLocal
-from app.db.models import Base, Doctor, CareBuddy, UserSession, Conversation, Document
+from app.db.session import SessionLocal
+from app.db.migrations import upgrade_database
+from app.db.models import Doctor
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def init_database():
-    logger.info("Creating database tables...")
+    logger.info("Migrating database schema...")
     
     try:
-        # Create all tables
-        Base.metadata.create_all(bind=engine)
-        logger.info("Successfully created database tables")
+        # Apply all pending migrations
+        upgrade_database()
+        logger.info("Successfully migrated database schema")
         
         # Create test doctor if it doesn't exist
         db = SessionLocal()
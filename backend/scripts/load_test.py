@@ -0,0 +1,361 @@
+# backend/scripts/load_test.py
+"""Load test the app in-process against local stand-ins for OpenAI and WhatsApp.
+
+Boots the FastAPI app (lifespan included) on a scratch database and local
+vector store, ingests generated documents, then drives /api/webhook and the
+dashboard endpoints at a fixed concurrency. Reports throughput and
+p50/p95/p99 per endpoint, per RAG stage and end-to-end per message.
+
+    python scripts/load_test.py [--messages 500] [--concurrency 20] [--output load.json]
+    python scripts/load_test.py --baseline load_baseline.json [--tolerance 0.2]
+
+With --baseline the run exits with status 1 if any p95 is more than
+tolerance slower, or any throughput more than tolerance lower, than the
+baseline's.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+# One line per request drowns the report
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+TOPICS = {
+    "wound": "Keep the wound clean and dry. Change the dressing daily and watch for redness, swelling or discharge.",
+    "medication": "Take the antibiotic twice a day with food until the course is finished, even if you feel better.",
+    "pain": "Paracetamol every six hours helps with pain. Avoid ibuprofen for the first three days after surgery.",
+    "diet": "Start with clear fluids, then soft food. Avoid alcohol and heavy meals for the first week.",
+    "exercise": "Walk gently every day. Do not lift anything heavier than five kilograms for six weeks.",
+    "shower": "You can shower after 48 hours. Pat the wound dry and do not soak it in a bath.",
+    "stitches": "Dissolvable stitches disappear within two weeks. Other stitches are removed at the clinic on day ten.",
+    "fever": "Call the care team if your temperature is above 38 degrees or you feel shivery and unwell.",
+}
+
+QUESTIONS = [
+    "When can I shower?",
+    "How often should I change the dressing?",
+    "Can I take ibuprofen for the pain?",
+    "What should I eat after the operation?",
+    "When are my stitches removed?",
+    "Is it normal to have a fever?",
+    "How long do I take the antibiotics?",
+    "When can I lift heavy things again?",
+    "The wound looks a bit red, what should I do?",
+    "Can I drink alcohol this week?",
+]
+
+def document_text(seed: int, paragraphs: int) -> str:
+    rng = random.Random(seed)
+    topics = list(TOPICS.items())
+    return "\n\n".join(
+        f"{name.title()} ({i + 1}). {advice} {rng.choice(topics)[1]}"
+        for i, (name, advice) in enumerate(rng.choice(topics) for _ in range(paragraphs))
+    )
+
+def webhook_payload(phone_number: str, text: str, message_id: str) -> Dict:
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{"changes": [{"value": {"messages": [{
+            "from": phone_number,
+            "id": message_id,
+            "type": "text",
+            "text": {"body": text}
+        }]}}]}]
+    }
+
+def percentiles(samples: List[float]) -> Dict:
+    """Count and mean/p50/p95/p99 in milliseconds"""
+    if not samples:
+        return {"count": 0}
+    ms = sorted(sample * 1000 for sample in samples)
+    cuts = statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else [ms[0]] * 99
+    return {
+        "count": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 2),
+        "p50_ms": round(cuts[49], 2),
+        "p95_ms": round(cuts[94], 2),
+        "p99_ms": round(cuts[98], 2),
+    }
+
+def configure_environment(args, workdir: str):
+    """Point every setting at scratch storage and the local stand-ins; must run before the app is imported"""
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{workdir}/load.db",
+        "VECTOR_STORE": "local",
+        "LOCAL_VECTOR_DIR": f"{workdir}/vector_store",
+        "EMBEDDING_CACHE_PATH": f"{workdir}/embedding_cache.db",
+        "INGEST_UPLOAD_DIR": f"{workdir}/uploads",
+        "OPENAI_FAKE": "true",
+        "OPENAI_FAKE_EMBED_LATENCY": str(args.embed_latency),
+        "OPENAI_FAKE_LLM_LATENCY": str(args.llm_latency),
+        "OPENAI_FAKE_TOKEN_LATENCY": str(args.token_latency),
+        "WHATSAPP_FAKE_TRANSPORT": "true",
+        "WHATSAPP_FAKE_LATENCY": str(args.graph_latency),
+        "MESSAGE_WORKERS": str(args.workers),
+        "MESSAGE_QUEUE_MAX_DEPTH": str(max(args.messages, 1000)),
+        # Importing the app replaces this script's logging setup; keep the report readable
+        "LOG_FORMAT": "text",
+    })
+    os.environ.setdefault("OPENAI_API_KEY", "load-test")
+    os.environ.setdefault("PINECONE_API_KEY", "load-test")
+
+def seed(buddies: int, patients: int) -> Dict[str, List[str]]:
+    """Buddies for the test doctor and patients already connected to them, by buddy bid"""
+    from app.db.database import SessionLocal, init_db
+    from app.db.models import CareBuddy, UserSession
+
+    init_db()
+    db = SessionLocal()
+    try:
+        phones = {}
+        for b in range(buddies):
+            buddy = CareBuddy(bid=f"LT{b:02d}", name=f"Load test buddy {b}", doctor_id=1)
+            db.add(buddy)
+            db.flush()
+            phones[buddy.bid] = []
+            for p in range(b, patients, buddies):
+                phone_number = f"4470000{p:05d}"
+                db.add(UserSession(phone_number=phone_number, buddy_id=buddy.id))
+                phones[buddy.bid].append(phone_number)
+        db.commit()
+        return phones
+    finally:
+        db.close()
+
+async def run_phase(requests, concurrency: int, timings: Dict[str, List[float]], errors: Dict[str, int]) -> float:
+    """Issue (name, coroutine factory) requests with at most concurrency in flight; returns elapsed seconds"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(name, send):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await send()
+                if response.status_code >= 400:
+                    errors[name] += 1
+            except Exception as e:
+                errors[name] += 1
+                logger.warning(f"{name} failed: {e}")
+            timings[name].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(name, send) for name, send in requests))
+    return time.perf_counter() - started
+
+async def ingest(client, phones: Dict[str, List[str]], documents: int, paragraphs: int, timeout: float) -> float:
+    started = time.perf_counter()
+    jobs = []
+    for b, bid in enumerate(phones):
+        files = [
+            ("files", (f"guide-{d}.txt", document_text(b * 1000 + d, paragraphs).encode(), "text/plain"))
+            for d in range(documents)
+        ]
+        response = await client.post(f"/api/buddy/{bid}/documents", files=files)
+        response.raise_for_status()
+        jobs.append(response.json()["job_id"])
+
+    deadline = time.monotonic() + timeout
+    for job_id in jobs:
+        while True:
+            status = (await client.get(f"/api/ingest/{job_id}")).json()
+            if status["status"] not in ("queued", "running"):
+                if status["status"] != "completed":
+                    raise RuntimeError(f"Ingestion job {job_id} ended {status['status']}: {status['files']}")
+                break
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Ingestion job {job_id} still {status['status']} after {timeout}s")
+            await asyncio.sleep(0.1)
+    return time.perf_counter() - started
+
+async def drain(queue, timeout: float):
+    deadline = time.monotonic() + timeout
+    while queue.processed + queue.failed < queue.enqueued:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{queue.depth()} messages still queued after {timeout}s")
+        await asyncio.sleep(0.05)
+
+async def run(args) -> Dict:
+    import httpx
+
+    import main
+    from app.services.carebuddy_rag import rag_system
+    from app.services.message_queue import message_queue
+    from app.services.whatsapp import whatsapp_client
+
+    phones = seed(args.buddies, args.patients)
+    rng = random.Random(args.seed)
+
+    stages: Dict[str, List[float]] = defaultdict(list)
+    tokens: Dict[str, int] = defaultdict(int)
+    answers = defaultdict(int)
+
+    def on_answer(buddy_id, result):
+        answers[result.retrieval] += 1
+        for name, seconds in result.timings.items():
+            stages[name].append(seconds)
+        for name, count in result.usage.items():
+            tokens[name] += count
+
+    message_latency: List[float] = []
+    message_failures = []
+
+    def on_message(message, seconds, ok):
+        message_latency.append(seconds)
+        if not ok:
+            message_failures.append(message.message_id)
+
+    rag_system.answer_listeners.append(on_answer)
+    message_queue.listeners.append(on_message)
+
+    http: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    results = {"config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "tolerance")}}
+
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=60) as client:
+            await asyncio.to_thread(rag_system.warm_up)
+            results["ingest_seconds"] = round(
+                await ingest(client, phones, args.documents, args.paragraphs, args.timeout), 3
+            )
+            logger.info(f"Ingested {args.documents * args.buddies} documents in {results['ingest_seconds']}s")
+
+            # Webhook phase: the request returns once queued, so drain the queue for end-to-end numbers
+            patients = [(bid, phone) for bid, numbers in phones.items() for phone in numbers]
+            webhooks = []
+            for i in range(args.messages):
+                _, phone_number = rng.choice(patients)
+                body = webhook_payload(phone_number, rng.choice(QUESTIONS), f"wamid.load{i}")
+                webhooks.append(("POST /api/webhook", lambda body=body: client.post("/api/webhook", json=body)))
+            started = time.perf_counter()
+            accepted = await run_phase(webhooks, args.concurrency, http, errors)
+            await drain(message_queue, args.timeout)
+            processed = time.perf_counter() - started
+            results["webhook"] = {
+                "messages": args.messages,
+                "accept_per_second": round(args.messages / accepted, 1),
+                "answered_per_second": round(len(message_latency) / processed, 1),
+                "failed": len(message_failures),
+                "sent": len(whatsapp_client.transport.sent),
+            }
+            logger.info(f"Answered {len(message_latency)} messages in {processed:.1f}s")
+
+            # Dashboard phase
+            bids = list(phones)
+            endpoints = [
+                ("GET /api/buddies", lambda: client.get("/api/buddies")),
+                ("GET /api/buddy/{id}", lambda: client.get(f"/api/buddy/{rng.choice(bids)}")),
+                ("GET /api/doctor/impact", lambda: client.get("/api/doctor/impact", params={"timespan": "month"})),
+                ("GET /api/doctor/timeseries", lambda: client.get("/api/doctor/timeseries", params={"bucket": "day"})),
+            ]
+            dashboard = [rng.choice(endpoints) for _ in range(args.dashboard_requests)]
+            elapsed = await run_phase(dashboard, args.concurrency, http, errors)
+            results["dashboard"] = {
+                "requests": args.dashboard_requests,
+                "requests_per_second": round(args.dashboard_requests / elapsed, 1),
+            }
+
+    rag_system.answer_listeners.remove(on_answer)
+    message_queue.listeners.remove(on_message)
+
+    results["endpoints"] = {name: {**percentiles(samples), "errors": errors[name]} for name, samples in http.items()}
+    results["stages"] = {name: percentiles(samples) for name, samples in stages.items()}
+    results["message_end_to_end"] = percentiles(message_latency)
+    results["answers"] = dict(answers)
+    results["tokens"] = dict(tokens)
+    return results
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Regressions of p95 latency or throughput beyond tolerance, as readable lines"""
+    regressions = []
+
+    def check_p95(name, current, previous):
+        if current.get("p95_ms") is None or not previous.get("p95_ms"):
+            return
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name} p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+
+    for section in ("endpoints", "stages"):
+        for name, current in results.get(section, {}).items():
+            check_p95(f"{section} {name}", current, baseline.get(section, {}).get(name, {}))
+    check_p95("message end-to-end", results["message_end_to_end"], baseline.get("message_end_to_end", {}))
+
+    for section, key in (("webhook", "accept_per_second"), ("webhook", "answered_per_second"),
+                         ("dashboard", "requests_per_second")):
+        previous = baseline.get(section, {}).get(key)
+        current = results.get(section, {}).get(key)
+        if previous and current is not None and current < previous * (1 - tolerance):
+            regressions.append(f"{section} {key} {previous} -> {current}")
+    return regressions
+
+def report(results: Dict):
+    logger.info(f"Webhook: {results['webhook']}")
+    logger.info(f"Dashboard: {results['dashboard']}")
+    logger.info(f"Answers by retrieval: {results['answers']}; tokens: {results['tokens']}")
+    rows = [("endpoint " + name, stats) for name, stats in results["endpoints"].items()]
+    rows += [("stage " + name, stats) for name, stats in results["stages"].items()]
+    rows.append(("message end-to-end", results["message_end_to_end"]))
+    for name, stats in rows:
+        if stats["count"]:
+            logger.info(f"{name:<36} n={stats['count']:<6} p50 {stats['p50_ms']:>8.1f}ms  "
+                        f"p95 {stats['p95_ms']:>8.1f}ms  p99 {stats['p99_ms']:>8.1f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--buddies", type=int, default=3)
+    parser.add_argument("--patients", type=int, default=100)
+    parser.add_argument("--documents", type=int, default=2, help="documents per buddy")
+    parser.add_argument("--paragraphs", type=int, default=40, help="paragraphs per document")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--dashboard-requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20, help="requests in flight")
+    parser.add_argument("--workers", type=int, default=8, help="message queue workers")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="seconds per embedding call")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds to the first token")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="seconds per streamed token")
+    parser.add_argument("--graph-latency", type=float, default=0.05, help="seconds per WhatsApp send")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds to wait for ingestion or the queue")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="load_test.json")
+    parser.add_argument("--baseline", default=None, help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed fractional regression")
+    args = parser.parse_args()
+
+    # Read before the run writes its output, which must not replace the baseline it is compared to
+    baseline = None
+    if args.baseline:
+        if Path(args.baseline).resolve() == Path(args.output).resolve():
+            parser.error("--output and --baseline are the same file; pass another --output")
+        baseline = json.loads(Path(args.baseline).read_text())
+
+    with tempfile.TemporaryDirectory(prefix="carebuddy-load-") as workdir:
+        configure_environment(args, workdir)
+        results = asyncio.run(run(args))
+
+    report(results)
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    logger.info(f"Wrote results to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            logger.error(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        logger.info(f"No regressions beyond {args.tolerance:.0%} of {args.baseline}")
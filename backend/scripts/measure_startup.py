@@ -0,0 +1,44 @@
+# backend/scripts/measure_startup.py
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+import logging
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# Runs in a fresh interpreter so nothing is already imported
+PROBE = """
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter() - start
+print(json.dumps({"import_seconds": imported}))
+"""
+
+def measure(runs: int = 5):
+    """Time a cold import of the app in separate processes"""
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE],
+            cwd=BACKEND_DIR,
+            env={**os.environ, "PYTHONPATH": str(BACKEND_DIR)},
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1])["import_seconds"])
+
+    logger.info(f"Cold import of main over {runs} runs: "
+                f"median {statistics.median(samples):.3f}s, max {max(samples):.3f}s")
+    return samples
+
+if __name__ == "__main__":
+    measure(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
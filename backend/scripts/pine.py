@@ -1,10 +1,136 @@
-import pinecone
-from dotenv import load_dotenv
-import os
+# backend/scripts/pine.py
+"""Remove chunks from the vector index without wiping everyone's documents, or rebuild them.
 
-load_dotenv()
-pc = pinecone.Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-index = pc.Index("carebuddy-docs")
+The documents themselves stay, but their tracked chunks and content hash
+are cleared, so uploading the same file again embeds it anew. --reindex
+re-embeds documents from their stored text into their buddy's namespace;
+--legacy does that for every document without tracked chunks before it
+deletes the old shared namespace, and refuses while any of them has no
+stored text to rebuild from.
 
-# Delete all vectors
-index.delete(delete_all=True, namespace="medical")
\ No newline at end of file
+    python scripts/pine.py --buddy 3                 # all chunks of buddy 3
+    python scripts/pine.py --buddy 3 --document 12   # one document of buddy 3
+    python scripts/pine.py --reindex [--buddy 3]     # re-embed every document (of buddy 3)
+    python scripts/pine.py --legacy                  # the old shared "medical" namespace
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import logging
+from typing import List
+from app.db.database import SessionLocal
+from app.db.models import Document, DocumentChunk
+from app.services.carebuddy_rag import document_key, rag_system
+from app.services.ingestion import ingestion_pool
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def forget_chunks(buddy_id: int, document_id: int = None):
+    """Clear the chunk rows and content hashes of documents whose chunks were deleted"""
+    db = SessionLocal()
+    try:
+        documents = db.query(Document).filter(Document.buddy_id == buddy_id)
+        if document_id is not None:
+            documents = documents.filter(Document.id == document_id)
+        ids = [doc.id for doc in documents]
+        removed = db.query(DocumentChunk).filter(DocumentChunk.document_id.in_(ids)).delete(synchronize_session=False)
+        documents.update({Document.content_hash: None}, synchronize_session=False)
+        db.commit()
+        logger.info(f"Cleared {removed} tracked chunks of {len(ids)} documents")
+    finally:
+        db.close()
+
+def reindex(documents: List[int]) -> List[int]:
+    """Re-embed documents from their stored text into their buddy's namespace; returns those without text"""
+    missing = []
+    for document_id in documents:
+        # Held like an upload of a new version, so a running server can't interleave one
+        with ingestion_pool._document_lock(document_id):
+            db = SessionLocal()
+            try:
+                doc = db.get(Document, document_id)
+                if doc is None:
+                    continue
+                if doc.content is None:
+                    logger.warning(f"Document {doc.id} ({doc.filename}) has no stored text; upload it again")
+                    missing.append(doc.id)
+                    continue
+                doc_id = document_key(doc.id)
+                rag_system.delete_document(doc.buddy_id, doc_id)
+                db.query(DocumentChunk).filter(DocumentChunk.document_id == doc.id).delete(synchronize_session=False)
+
+                def on_progress(seen, stored):
+                    db.add_all(
+                        DocumentChunk(
+                            document_id=doc.id,
+                            chunk_hash=chunk["chunk_hash"],
+                            chunk_index=chunk["chunk_index"],
+                            text=chunk["text"],
+                            version=doc.version
+                        )
+                        for chunk in stored
+                    )
+                    db.commit()
+
+                sync = rag_system.process_document_chunks(
+                    rag_system.split_text_stream([doc.content]),
+                    buddy_id=doc.buddy_id,
+                    doc_id=doc_id,
+                    on_progress=on_progress
+                )
+                db.commit()
+                logger.info(f"Re-indexed document {doc.id} into buddy-{doc.buddy_id} ({len(sync.chunks)} chunks)")
+            finally:
+                db.close()
+    return missing
+
+def documents_to_reindex(buddy_id: int = None, document_id: int = None, untracked_only: bool = False) -> List[int]:
+    """Ids of the documents to re-embed, optionally only those without tracked chunks"""
+    db = SessionLocal()
+    try:
+        documents = db.query(Document.id).order_by(Document.id)
+        if buddy_id is not None:
+            documents = documents.filter(Document.buddy_id == buddy_id)
+        if document_id is not None:
+            documents = documents.filter(Document.id == document_id)
+        if untracked_only:
+            documents = documents.filter(~Document.chunks.any())
+        return [id for (id,) in documents]
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--buddy", type=int, help="buddy database id")
+    parser.add_argument("--document", type=int, help="document database id (requires --buddy)")
+    parser.add_argument("--reindex", action="store_true",
+                        help="re-embed documents from their stored text (all, or those of --buddy / --document)")
+    parser.add_argument("--legacy", action="store_true",
+                        help='delete the shared "medical" namespace used before per-buddy partitioning')
+    args = parser.parse_args()
+
+    if args.reindex:
+        missing = reindex(documents_to_reindex(args.buddy, args.document))
+        if missing:
+            sys.exit(f"{len(missing)} documents have no stored text: {missing}")
+    elif args.legacy:
+        # Documents only in the shared namespace are moved first, so no buddy loses its index
+        missing = reindex(documents_to_reindex(untracked_only=True))
+        if missing:
+            sys.exit(f'Kept namespace "medical": {len(missing)} documents have no stored text: {missing}')
+        rag_system.warm_up()
+        rag_system.vectorstore.delete(delete_all=True, namespace="medical")
+        logger.info('Deleted legacy namespace "medical"')
+    elif args.buddy is not None and args.document is not None:
+        rag_system.delete_document(args.buddy, document_key(args.document))
+        forget_chunks(args.buddy, args.document)
+    elif args.buddy is not None:
+        rag_system.delete_buddy(args.buddy)
+        forget_chunks(args.buddy)
+    else:
+        parser.error("pass --buddy, --buddy with --document, --reindex or --legacy")
@@ -0,0 +1,115 @@
+# backend/tests/conftest.py
+"""Point every setting at scratch storage and the local stand-ins before the app is imported"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+_workdir = tempfile.mkdtemp(prefix="carebuddy-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_workdir}/test.db",
+    "VECTOR_STORE": "local",
+    "LOCAL_VECTOR_DIR": f"{_workdir}/vector_store",
+    "EMBEDDING_CACHE_PATH": f"{_workdir}/embedding_cache.db",
+    "INGEST_UPLOAD_DIR": f"{_workdir}/uploads",
+    "SHARED_STATE_DIR": f"{_workdir}/shared",
+    "RECORDER_JOURNAL_PATH": "",
+    "OPENAI_FAKE": "true",
+    "OPENAI_FAKE_EMBED_LATENCY": "0",
+    "OPENAI_FAKE_LLM_LATENCY": "0",
+    "OPENAI_FAKE_TOKEN_LATENCY": "0",
+    "WHATSAPP_FAKE_TRANSPORT": "true",
+    "METRICS_ENABLED": "false",
+    "LOG_LEVEL": "WARNING",
+})
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("PINECONE_API_KEY", "test")
+
+
+@pytest.fixture(scope="session")
+def database():
+    """The app's database, migrated to the latest revision"""
+    from app.db.database import init_db
+
+    init_db()
+
+
+@pytest.fixture
+def buddy(database):
+    """A new buddy of the test doctor; returns its database id"""
+    import uuid
+
+    from app.db.database import SessionLocal
+    from app.db.models import CareBuddy
+
+    db = SessionLocal()
+    buddy = CareBuddy(bid=f"T{uuid.uuid4().hex[:5].upper()}", name="Test buddy", doctor_id=1)
+    db.add(buddy)
+    db.commit()
+    buddy_id = buddy.id
+    db.close()
+    return buddy_id
+
+
+@pytest.fixture
+def ingest(database):
+    """Store text as an upload of a new job and process it the way an ingestion worker does.
+
+    Returns the file's final row as a dict; pass document_id to upload a new version of it.
+    """
+    import uuid
+
+    from app.db.database import SessionLocal
+    from app.db.models import IngestFile, IngestJob
+    from app.services.ingestion import ingestion_pool
+
+    def ingest(buddy_id: int, text: str, filename: str = "protocol.txt", document_id: int = None) -> dict:
+        db = SessionLocal()
+        try:
+            job = IngestJob(id=uuid.uuid4().hex, buddy_id=buddy_id, status="queued")
+            job_dir = os.path.join(ingestion_pool.upload_dir, job.id)
+            os.makedirs(job_dir, exist_ok=True)
+            path = os.path.join(job_dir, f"0-{filename}")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            ingest_file = IngestFile(job_id=job.id, filename=filename, path=path, document_id=document_id)
+            db.add_all([job, ingest_file])
+            db.commit()
+            file_id = ingest_file.id
+        finally:
+            db.close()
+
+        ingestion_pool._process_file(file_id)
+
+        db = SessionLocal()
+        try:
+            row = db.get(IngestFile, file_id)
+            return {
+                "status": row.status,
+                "error": row.error,
+                "document_id": row.document_id,
+                "chunks_done": row.chunks_done,
+                "job_id": row.job_id,
+                "job_status": row.job.status,
+                "path": row.path
+            }
+        finally:
+            db.close()
+
+    return ingest
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    """The app behind a TestClient, with its lifespan running"""
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,126 @@
+# backend/tests/test_answer_cache.py
+"""Semantic answer cache: similarity hits, generation invalidation and eviction"""
+import time
+
+from app.db.database import SessionLocal
+from app.db.models import CareBuddy
+from app.services import answer_cache as answer_cache_module
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.carebuddy_rag import rag_system
+from app.services.fakes import FakeEmbeddings
+from app.services.shared_counters import SharedCounters
+
+embeddings = FakeEmbeddings(dimension=256)
+
+
+def vector(text: str):
+    return embeddings.embed_query(text)
+
+
+def remember(cache: SemanticAnswerCache, buddy_id: int, query: str, answer: str, generation: int = None):
+    if generation is None:
+        generation = cache.generation(buddy_id)
+    cache.store(buddy_id, query, vector(query), answer, latency=1.5, generation=generation)
+
+
+def test_equivalent_queries_hit_within_the_same_buddy():
+    cache = SemanticAnswerCache(threshold=0.95)
+    remember(cache, 1, "When can I shower?", "After 48 hours.")
+
+    assert cache.lookup(1, vector("when can I shower")) == "After 48 hours."
+    assert cache.lookup(1, vector("Can I take ibuprofen?")) is None
+    assert cache.lookup(2, vector("When can I shower?")) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["latency_saved_seconds"] == 1.5
+
+
+def test_invalidate_drops_answers_and_refuses_ones_generated_before_it():
+    cache = SemanticAnswerCache()
+    remember(cache, 1, "When can I shower?", "After 48 hours.")
+    remember(cache, 2, "When can I shower?", "Tomorrow.")
+    # An answer is being generated from the old documents while they change
+    stale_generation = cache.generation(1)
+
+    cache.invalidate(1)
+    remember(cache, 1, "Can I take ibuprofen?", "With food.", generation=stale_generation)
+
+    assert cache.lookup(1, vector("When can I shower?")) is None
+    assert cache.lookup(1, vector("Can I take ibuprofen?")) is None
+    assert cache.lookup(2, vector("When can I shower?")) == "Tomorrow."
+    remember(cache, 1, "Can I take ibuprofen?", "With food.")
+    assert cache.lookup(1, vector("Can I take ibuprofen?")) == "With food."
+
+
+def test_invalidation_in_another_process_drops_local_answers(tmp_path):
+    path = str(tmp_path / "answers.counters")
+    here = SemanticAnswerCache(counters=SharedCounters(path))
+    there = SemanticAnswerCache(counters=SharedCounters(path))
+    remember(here, 1, "When can I shower?", "After 48 hours.")
+    stale_generation = here.generation(1)
+
+    there.invalidate(1)
+
+    assert here.lookup(1, vector("When can I shower?")) is None
+    remember(here, 1, "When can I shower?", "After 48 hours.", generation=stale_generation)
+    assert here.stats()["entries"] == 0
+
+
+def test_answers_expire_after_the_ttl(monkeypatch):
+    cache = SemanticAnswerCache(ttl_seconds=60)
+    remember(cache, 1, "When can I shower?", "After 48 hours.")
+    remember(cache, 1, "Can I take ibuprofen?", "With food.")
+    now = time.time()
+
+    monkeypatch.setattr(answer_cache_module.time, "time", lambda: now + 59)
+    assert cache.lookup(1, vector("When can I shower?")) == "After 48 hours."
+    monkeypatch.setattr(answer_cache_module.time, "time", lambda: now + 61)
+    assert cache.lookup(1, vector("When can I shower?")) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_hit_answers_are_evicted_first(monkeypatch):
+    cache = SemanticAnswerCache(max_entries=2)
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(answer_cache_module.time, "time", lambda: next(clock))
+    remember(cache, 1, "When can I shower?", "After 48 hours.")
+    remember(cache, 1, "Can I take ibuprofen?", "With food.")
+    cache.lookup(1, vector("When can I shower?"))
+
+    remember(cache, 1, "Is swelling normal?", "For a week.")
+
+    assert cache.lookup(1, vector("Can I take ibuprofen?")) is None
+    assert cache.lookup(1, vector("When can I shower?")) == "After 48 hours."
+    assert cache.lookup(1, vector("Is swelling normal?")) == "For a week."
+
+
+def bid(buddy_id: int) -> str:
+    db = SessionLocal()
+    try:
+        return db.get(CareBuddy, buddy_id).bid
+    finally:
+        db.close()
+
+
+def wait_for_job(client, job_id: str, timeout: float = 30) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/api/ingest/{job_id}").json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        assert time.monotonic() < deadline, "ingestion did not finish in time"
+        time.sleep(0.05)
+
+
+def test_replacing_or_deleting_a_document_drops_the_buddys_answers(client, buddy, ingest):
+    cache = rag_system.answer_cache
+    document_id = ingest(buddy, "Keep the dressing dry for 48 hours.")["document_id"]
+
+    remember(cache, buddy, "When can I shower?", "After 48 hours.")
+    response = client.put(f"/api/buddy/{bid(buddy)}/documents/{document_id}",
+                          files={"file": ("protocol.txt", b"Keep the dressing dry for 72 hours.")})
+    assert response.status_code == 202
+    assert wait_for_job(client, response.json()["job_id"])["status"] == "completed"
+    assert cache.lookup(buddy, vector("When can I shower?")) is None
+
+    remember(cache, buddy, "When can I shower?", "After 72 hours.")
+    assert client.delete(f"/api/buddy/{bid(buddy)}/documents/{document_id}").status_code == 200
+    assert cache.lookup(buddy, vector("When can I shower?")) is None
@@ -0,0 +1,106 @@
+# backend/tests/test_ask.py
+"""Streaming answers over server-sent events, with the stand-in chat model"""
+import json
+
+from app.db.database import SessionLocal
+from app.db.models import CareBuddy
+from app.services.carebuddy_rag import document_key, rag_system
+
+DOCUMENT = "\n\n".join([
+    "Keep the dressing dry for 48 hours after surgery, then shower normally.",
+    "Take ibuprofen with food, at most three times a day, for the swelling.",
+])
+
+
+def bid(buddy_id: int) -> str:
+    db = SessionLocal()
+    try:
+        return db.get(CareBuddy, buddy_id).bid
+    finally:
+        db.close()
+
+
+def events(response) -> list:
+    """(event, data) pairs of a server-sent event stream"""
+    parsed = []
+    for block in response.text.split("\n\n"):
+        if not block.strip():
+            continue
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        parsed.append((fields["event"], json.loads(fields["data"])))
+    return parsed
+
+
+def test_get_streams_sources_then_tokens_then_done(client, buddy, ingest):
+    document_id = ingest(buddy, DOCUMENT)["document_id"]
+
+    response = client.get(f"/api/buddy/{bid(buddy)}/ask", params={"q": "When can I shower after surgery?"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    stream = events(response)
+    names = [name for name, _ in stream]
+    assert names[0] == "sources" and names[-1] == "done"
+    assert set(names[1:-1]) == {"token"} and len(names) > 3
+    assert stream[0][1][0]["doc_id"] == document_key(document_id)
+    assert stream[-1][1]["cached"] is False
+    assert "".join(data for name, data in stream if name == "token")
+
+
+def test_post_with_history_condenses_and_streams(client, buddy, ingest):
+    ingest(buddy, DOCUMENT)
+
+    response = client.post(f"/api/buddy/{bid(buddy)}/ask", json={
+        "query": "And how often can I take it?",
+        "history": [{"user": "Which painkiller is fine?", "assistant": "Ibuprofen, with food."}]
+    })
+
+    stream = events(response)
+    assert [name for name, _ in stream][0] == "sources"
+    assert "condense" in stream[-1][1]["timings"]
+
+
+def test_repeated_follow_up_is_answered_without_the_llm(client, buddy, ingest, monkeypatch):
+    ingest(buddy, DOCUMENT)
+    follow_up = {
+        "query": "And how often can I take it?",
+        "history": [{"user": "Which painkiller is fine?", "assistant": "Ibuprofen, with food."}]
+    }
+    first = events(client.post(f"/api/buddy/{bid(buddy)}/ask", json=follow_up))
+
+    class NoModel:
+        def invoke(self, prompt):
+            raise AssertionError("the LLM was called")
+
+        stream = invoke
+
+    monkeypatch.setattr(rag_system, "llm", NoModel())
+    second = events(client.post(f"/api/buddy/{bid(buddy)}/ask", json=follow_up))
+
+    assert second[-1][0] == "done" and second[-1][1]["cached"] is True
+    assert "condense" not in second[-1][1]["timings"]
+    assert [data for name, data in second if name == "token"] == [
+        "".join(data for name, data in first if name == "token")
+    ]
+
+
+def test_error_mid_stream_ends_with_an_error_event(client, buddy, ingest, monkeypatch):
+    ingest(buddy, DOCUMENT)
+
+    class BrokenModel:
+        def stream(self, messages):
+            yield type("Chunk", (), {"content": "Keep", "usage_metadata": None})()
+            raise ConnectionError("provider went away")
+
+    monkeypatch.setattr(rag_system, "llm", BrokenModel())
+    response = client.get(f"/api/buddy/{bid(buddy)}/ask", params={"q": "Is swelling normal after a week?"})
+
+    assert response.status_code == 200
+    names = [name for name, _ in events(response)]
+    assert names == ["sources", "token", "error"]
+    assert "provider went away" not in response.text
+
+
+def test_unknown_buddy_and_empty_question_are_rejected(client, buddy):
+    assert client.get("/api/buddy/NOPE1/ask", params={"q": "Hello?"}).status_code == 404
+    assert client.get(f"/api/buddy/{bid(buddy)}/ask", params={"q": "  "}).status_code == 400
@@ -0,0 +1,124 @@
+# backend/tests/test_conversation_memory.py
+"""Per-session conversation memory: loading, token budget, summaries and cross-process reloads"""
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.db.database import SessionLocal
+from app.db.models import Conversation, UserSession
+from app.services.conversation_memory import ConversationMemory, turn_tokens
+from app.services.shared_counters import SharedCounters
+
+
+@pytest.fixture
+def session(buddy):
+    """A patient session of the buddy with five answered turns and one unanswered; returns its id"""
+    db = SessionLocal()
+    patient = UserSession(phone_number=f"+44{uuid.uuid4().int % 10**10:010d}", buddy_id=buddy)
+    db.add(patient)
+    db.flush()
+    started = datetime.now(timezone.utc) - timedelta(hours=1)
+    db.add_all([
+        Conversation(buddy_id=buddy, user_session_id=patient.id, query=f"Question {i}",
+                     response=f"Answer {i}.", timestamp=started + timedelta(minutes=i))
+        for i in range(5)
+    ])
+    db.add(Conversation(buddy_id=buddy, user_session_id=patient.id, query="Unanswered",
+                        timestamp=started + timedelta(minutes=5)))
+    db.commit()
+    session_id = patient.id
+    db.close()
+    return session_id
+
+
+def turns(*numbers: int) -> list:
+    return [{"user": f"Question {i}", "assistant": f"Answer {i}."} for i in numbers]
+
+
+def history(memory: ConversationMemory, session_id: int) -> list:
+    db = SessionLocal()
+    try:
+        return memory.history(session_id, db)
+    finally:
+        db.close()
+
+
+def test_history_loads_the_latest_answered_turns_then_stays_cached(session):
+    memory = ConversationMemory(max_turns=3, token_budget=1000)
+
+    assert memory.cached_history(session) is None
+    assert history(memory, session) == turns(2, 3, 4)
+    memory.append(session, "Question 5", "Answer 5.")
+    assert memory.cached_history(session) == turns(3, 4, 5)
+    assert memory.stats()["misses"] == 1 and memory.stats()["hits"] == 1
+
+
+def test_history_is_trimmed_to_the_token_budget_oldest_first(session):
+    budget = 3 * turn_tokens(turns(0)[0])
+    memory = ConversationMemory(max_turns=20, token_budget=budget)
+
+    assert history(memory, session) == turns(2, 3, 4)
+    memory.append(session, "Question 5", "Answer 5.")
+    assert history(memory, session) == turns(3, 4, 5)
+
+
+def test_trimmed_turns_are_folded_into_a_summary(session):
+    folded = []
+
+    def summarizer(summary, overflow):
+        folded.append([turn["user"] for turn in overflow])
+        return "Asked about questions " + ", ".join(turn["user"][-1] for turn in overflow)
+
+    memory = ConversationMemory(max_turns=20, token_budget=3 * turn_tokens(turns(0)[0]), summarizer=summarizer)
+    history(memory, session)
+    assert not memory.needs_summary(session)  # Turns trimmed at load are dropped
+
+    memory.append(session, "Question 5", "Answer 5.")
+    assert memory.needs_summary(session)
+    memory.summarize(session)
+
+    result = history(memory, session)
+    assert folded == [["Question 2"]]
+    assert result[0] == {"user": "Summary of the earlier conversation", "assistant": "Asked about questions 2"}
+    # Room for the summary comes out of the oldest turns, which are folded in next time
+    assert result[1:] == turns(4, 5)
+    assert memory.needs_summary(session)
+
+
+def test_least_recently_used_sessions_are_dropped(session):
+    memory = ConversationMemory(max_sessions=1)
+    history(memory, session)
+    history(memory, session + 10**6)  # A session without turns still takes a slot
+
+    assert memory.stats()["sessions"] == 1
+    history(memory, session)
+    assert memory.stats()["misses"] == 3
+
+
+def test_turns_written_by_another_process_are_reloaded(session, tmp_path):
+    path = str(tmp_path / "memory.counters")
+    here = ConversationMemory(counters=SharedCounters(path))
+    there = ConversationMemory(counters=SharedCounters(path))
+    history(here, session)
+    history(there, session)
+
+    # The other worker answers and commits a turn
+    db = SessionLocal()
+    buddy_id = db.get(UserSession, session).buddy_id
+    db.add(Conversation(buddy_id=buddy_id, user_session_id=session, query="Question 5", response="Answer 5."))
+    db.commit()
+    db.close()
+    there.append(session, "Question 5", "Answer 5.")
+    there.written([session])
+
+    assert history(here, session)[-1] == turns(5)[0]
+    assert history(there, session)[-1] == turns(5)[0]
+    assert there.stats()["misses"] == 1  # Its own write does not force a reload
+
+
+def test_unwritten_turns_come_from_the_recorder(session):
+    memory = ConversationMemory()
+    memory.pending_turns = lambda session_id: turns(5) if session_id == session else []
+
+    assert history(memory, session)[-2:] == turns(4, 5)
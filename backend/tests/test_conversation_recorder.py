@@ -0,0 +1,119 @@
+# backend/tests/test_conversation_recorder.py
+"""Write-behind conversation storage: batching, per-record fallback, journal replay and shutdown"""
+import asyncio
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from app.db.database import SessionLocal
+from app.db.models import Conversation, UserSession
+from app.services.conversation_recorder import MAX_RECORD_ATTEMPTS, ConversationRecord, ConversationRecorder
+
+
+@pytest.fixture
+def session(buddy):
+    """A patient session of the buddy; returns (buddy id, session id)"""
+    db = SessionLocal()
+    patient = UserSession(phone_number=f"+44{uuid.uuid4().int % 10**10:010d}", buddy_id=buddy)
+    db.add(patient)
+    db.commit()
+    session_id = patient.id
+    db.close()
+    return buddy, session_id
+
+
+def record(session, query: str, response: str = "An answer.") -> ConversationRecord:
+    buddy_id, session_id = session
+    return ConversationRecord(buddy_id, session_id, query, response, datetime.now(timezone.utc), 0.5)
+
+
+def stored_queries(session) -> list:
+    db = SessionLocal()
+    try:
+        return [query for (query,) in db.query(Conversation.query).filter(
+            Conversation.user_session_id == session[1]
+        ).order_by(Conversation.id)]
+    finally:
+        db.close()
+
+
+def test_flush_writes_a_batch_and_sets_last_active(session):
+    recorder = ConversationRecorder()
+    records = [record(session, f"Question {i}") for i in range(5)]
+    for r in records:
+        recorder.record(r)
+
+    assert recorder.pending_turns(session[1])[-1] == {"user": "Question 4", "assistant": "An answer."}
+    assert recorder.flush() == 5
+    assert stored_queries(session) == [f"Question {i}" for i in range(5)]
+    assert recorder.pending_turns(session[1]) == []
+    db = SessionLocal()
+    last_active = db.get(UserSession, session[1]).last_active
+    db.close()
+    assert last_active.replace(tzinfo=timezone.utc) >= records[-1].timestamp.replace(microsecond=0)
+
+
+def test_failed_batch_falls_back_to_one_record_at_a_time(session, monkeypatch):
+    write = ConversationRecorder._write
+
+    def failing_write(db, batch):
+        if any(r.query == "poison" for r in batch):
+            raise ValueError("cannot store this record")
+        write(db, batch)
+
+    monkeypatch.setattr(ConversationRecorder, "_write", staticmethod(failing_write))
+    recorder = ConversationRecorder()
+    for query in ("before", "poison", "after"):
+        recorder.record(record(session, query))
+
+    assert recorder.flush() == 2
+    assert stored_queries(session) == ["before", "after"]
+    # The bad record is retried with later flushes, then dropped
+    assert recorder.stats()["pending"] == 1
+    for _ in range(MAX_RECORD_ATTEMPTS - 1):
+        recorder.flush()
+    stats = recorder.stats()
+    assert stats["pending"] == 0 and stats["dropped"] == 1 and stats["flushed"] == 2
+
+
+def test_journal_is_replayed_after_a_crash(session, tmp_path):
+    journal = str(tmp_path / "recorder.jsonl")
+    crashed = ConversationRecorder(journal_path=journal, journal_fsync=True)
+    for i in range(3):
+        crashed.record(record(session, f"Journaled {i}"))
+    # The process dies before a flush, leaving a line cut short
+    crashed._close_journal()
+    with open(journal, "a") as f:
+        f.write('{"buddy_id": 1, "user_se')
+
+    async def restart():
+        recovered = ConversationRecorder(journal_path=journal)
+        recovered.start()
+        await asyncio.sleep(0.05)
+        await recovered.stop()
+        return recovered
+
+    recovered = asyncio.run(restart())
+
+    assert stored_queries(session) == [f"Journaled {i}" for i in range(3)]
+    assert recovered.stats()["pending"] == 0
+    with open(journal) as f:
+        assert f.read() == ""
+
+
+def test_stop_writes_everything_still_buffered(session):
+    async def serve():
+        # A flush interval longer than the test, so only stop() can write
+        recorder = ConversationRecorder(flush_ms=60000)
+        recorder.start()
+        for i in range(3):
+            await recorder.arecord(record(session, f"Late {i}"))
+        assert stored_queries(session) == []
+        await recorder.stop()
+        return recorder
+
+    recorder = asyncio.run(serve())
+
+    assert stored_queries(session) == [f"Late {i}" for i in range(3)]
+    assert recorder.stats()["pending"] == 0
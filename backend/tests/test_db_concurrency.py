@@ -0,0 +1,126 @@
+# backend/tests/test_db_concurrency.py
+"""Webhook-style writes and dashboard reads on the tuned engine do not block each other"""
+import threading
+import time
+
+from sqlalchemy import func, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db.base import Base
+from app.db.database import create_db_engine
+from app.db.models import CareBuddy, Conversation, Doctor, UserSession
+
+WRITERS = 4
+READERS = 4
+DURATION_SECONDS = 2
+# A read waiting on a writer would take the whole busy timeout
+READ_BOUND_SECONDS = 0.5
+
+
+def test_engine_connections_use_wal_and_busy_timeout(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'pragmas.db'}")
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == settings.SQLITE_BUSY_TIMEOUT_MS
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+    engine.dispose()
+
+
+def test_read_is_not_blocked_by_an_open_write_transaction(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'writer.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO doctors (id, uid, name, email) VALUES (1, 'DOC1', 'Test Doctor', 'a@b.c')"))
+
+    writer = engine.connect()
+    # EXCLUSIVE keeps rollback-journal readers out until commit; WAL readers see the last commit
+    writer.exec_driver_sql("BEGIN EXCLUSIVE")
+    writer.execute(text("INSERT INTO doctors (id, uid, name, email) VALUES (2, 'DOC2', 'Other Doctor', 'd@e.f')"))
+    try:
+        started = time.perf_counter()
+        with engine.connect() as reader:
+            count = reader.execute(text("SELECT COUNT(*) FROM doctors")).scalar()
+        elapsed = time.perf_counter() - started
+    finally:
+        writer.rollback()
+        writer.close()
+        engine.dispose()
+
+    assert count == 1
+    assert elapsed < READ_BOUND_SECONDS
+
+
+def test_concurrent_writes_and_reads_do_not_lock(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'concurrency.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    db.add(Doctor(id=1, uid="DOC1", name="Test Doctor", email="test@example.com"))
+    db.add(CareBuddy(id=1, bid="BD01", name="Test Buddy", doctor_id=1))
+    db.add_all(UserSession(id=i, phone_number=f"+1555000{i:04d}", buddy_id=1) for i in range(1, 101))
+    db.commit()
+    db.close()
+
+    stop = threading.Event()
+    errors = []
+    writes = [0]
+    reads = [0]
+    lock = threading.Lock()
+
+    def writer(worker_id):
+        db = Session()
+        while not stop.is_set():
+            try:
+                # The webhook pattern: store the question, then the answer
+                conversation = Conversation(buddy_id=1, user_session_id=worker_id + 1, query="When can I shower?")
+                db.add(conversation)
+                db.commit()
+                conversation.response = "After 48 hours."
+                db.commit()
+                with lock:
+                    writes[0] += 1
+            except OperationalError as e:
+                db.rollback()
+                with lock:
+                    errors.append(str(e))
+        db.close()
+
+    def reader():
+        db = Session()
+        while not stop.is_set():
+            try:
+                db.query(func.count(Conversation.id)).filter(Conversation.buddy_id == 1).scalar()
+                db.query(UserSession).filter(UserSession.buddy_id == 1).count()
+                db.commit()
+                with lock:
+                    reads[0] += 1
+            except OperationalError as e:
+                db.rollback()
+                with lock:
+                    errors.append(str(e))
+        db.close()
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(WRITERS)]
+    threads += [threading.Thread(target=reader) for _ in range(READERS)]
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION_SECONDS)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert not [error for error in errors if "database is locked" in error]
+    assert not errors
+    assert writes[0] > 0 and reads[0] > 0
+
+    db = Session()
+    assert db.query(Conversation).count() == writes[0]
+    assert db.query(Conversation).filter(Conversation.response.is_(None)).count() == 0
+    per_session = dict(db.query(Conversation.user_session_id, func.count(Conversation.id)).group_by(
+        Conversation.user_session_id
+    ).all())
+    assert set(per_session) == set(range(1, WRITERS + 1))
+    db.close()
+    engine.dispose()
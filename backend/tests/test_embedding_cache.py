@@ -0,0 +1,64 @@
+# backend/tests/test_embedding_cache.py
+"""Embedding cache in front of the local stand-in provider"""
+import sqlite3
+
+import numpy as np
+
+from app.services.embedding_cache import CachedEmbeddings
+from app.services.fakes import FakeEmbeddings
+
+TEXTS = [
+    "Keep the dressing dry for 48 hours after surgery.",
+    "Take ibuprofen with food, at most three times a day.",
+    "Walk for ten minutes every hour to prevent clots.",
+]
+
+
+def test_cache_serves_repeated_texts_without_the_provider(tmp_path):
+    provider = FakeEmbeddings(dimension=64)
+    path = str(tmp_path / "cache.db")
+    cache = CachedEmbeddings(provider, model_name=provider.model, path=path)
+
+    first = cache.embed_documents(TEXTS)
+    calls = provider.calls
+    assert cache.embed_documents(TEXTS) == first
+    assert cache.embed_query(TEXTS[0]) == first[0]
+    assert provider.calls == calls
+
+    # A new process finds the vectors on disk
+    reopened = CachedEmbeddings(provider, model_name=provider.model, path=path)
+    np.testing.assert_allclose(reopened.embed_documents(TEXTS), first, rtol=1e-6)
+    assert provider.calls == calls
+    assert reopened.disk_hits == len(TEXTS)
+
+
+def test_disk_hits_leave_the_cache_file_writable(tmp_path):
+    provider = FakeEmbeddings(dimension=64)
+    path = str(tmp_path / "cache.db")
+    CachedEmbeddings(provider, model_name=provider.model, path=path).embed_documents(TEXTS)
+
+    reader = CachedEmbeddings(provider, model_name=provider.model, path=path, memory_items=0)
+    reader.embed_documents(TEXTS)
+    assert reader.disk_hits == len(TEXTS)
+
+    # Another process sharing the file can still write right away
+    other = sqlite3.connect(path, timeout=0)
+    other.execute("UPDATE embeddings SET last_access = 0")
+    other.commit()
+    other.close()
+
+
+def test_eviction_keeps_the_file_under_max_bytes_and_drops_the_least_recent(tmp_path):
+    provider = FakeEmbeddings(dimension=64)
+    row_bytes = 64 * 4
+    cache = CachedEmbeddings(provider, model_name=provider.model, path=str(tmp_path / "cache.db"),
+                             memory_items=0, max_bytes=row_bytes * 3)
+    for text in TEXTS + ["Rest with your leg raised."]:
+        cache.embed_query(text)
+
+    assert cache.evictions >= 1
+    assert cache.stats()["disk_bytes"] <= row_bytes * 3
+    calls = provider.calls
+    cache.embed_query(TEXTS[0])
+    # The oldest text was evicted and goes back to the provider
+    assert provider.calls == calls + 1
@@ -0,0 +1,122 @@
+# backend/tests/test_ingestion.py
+"""Document ingestion: versions, incremental re-embedding by chunk hash, rollback and cleanup"""
+import os
+import threading
+
+from app.db.database import SessionLocal
+from app.db.models import Document, DocumentChunk
+from app.services.carebuddy_rag import buddy_namespace, chunk_hash, document_key, rag_system
+
+PARAGRAPHS = [
+    f"Step {i}: " + " ".join(f"instruction{i}x{j}" for j in range(40)) + "."
+    for i in range(8)
+]
+
+
+def protocol(*paragraphs: str) -> str:
+    return "\n\n".join(paragraphs)
+
+
+def document(document_id: int):
+    db = SessionLocal()
+    try:
+        doc = db.get(Document, document_id)
+        chunks = db.query(DocumentChunk.chunk_hash, DocumentChunk.version).filter(
+            DocumentChunk.document_id == document_id
+        ).all()
+        return doc, chunks
+    finally:
+        db.close()
+
+
+def stored_ids(buddy_id: int, document_id: int) -> set:
+    """Chunk ids of the document in the vector store"""
+    query = rag_system.embeddings.embed_query(PARAGRAPHS[0])
+    hits = rag_system.vectorstore.similarity_search_by_vector_with_score(
+        query, k=1000, namespace=buddy_namespace(buddy_id), filter={"doc_id": document_key(document_id)}
+    )
+    return {doc.metadata["chunk_hash"] for doc, _ in hits}
+
+
+def test_upload_stores_text_chunks_and_removes_the_upload(buddy, ingest):
+    result = ingest(buddy, protocol(*PARAGRAPHS))
+
+    assert result["status"] == "completed", result["error"]
+    assert result["job_status"] == "completed"
+    assert not os.path.exists(os.path.dirname(result["path"]))
+    doc, chunks = document(result["document_id"])
+    assert doc.version == 1
+    assert doc.content == protocol(*PARAGRAPHS)
+    assert chunks and {version for _, version in chunks} == {1}
+    assert stored_ids(buddy, doc.id) == {digest for digest, _ in chunks}
+
+
+def test_new_version_embeds_only_changed_chunks(buddy, ingest):
+    first = ingest(buddy, protocol(*PARAGRAPHS))
+    _, before = document(first["document_id"])
+
+    edited = PARAGRAPHS[:-1] + ["Step 7: call the clinic instead."]
+    second = ingest(buddy, protocol(*edited), document_id=first["document_id"])
+
+    assert second["status"] == "completed", second["error"]
+    doc, after = document(first["document_id"])
+    assert doc.version == 2
+    added = [digest for digest, version in after if version == 2]
+    assert 0 < len(added) < len(after)
+    # Chunks only the old last paragraph had are gone from the table and the index
+    assert stored_ids(buddy, doc.id) == {digest for digest, _ in after}
+    assert {digest for digest, _ in before} - {digest for digest, _ in after}
+
+
+def test_unchanged_upload_keeps_the_version(buddy, ingest):
+    first = ingest(buddy, protocol(*PARAGRAPHS))
+    again = ingest(buddy, protocol(*PARAGRAPHS), document_id=first["document_id"])
+
+    assert again["status"] == "completed"
+    assert document(first["document_id"])[0].version == 1
+
+
+def test_same_filename_without_replace_is_a_new_document(buddy, ingest):
+    first = ingest(buddy, protocol(*PARAGRAPHS), filename="protocol.pdf")
+    other = ingest(buddy, protocol(*PARAGRAPHS[:2]), filename="protocol.pdf")
+
+    assert other["document_id"] != first["document_id"]
+    assert document(first["document_id"])[0].content == protocol(*PARAGRAPHS)
+
+
+def test_failed_version_reports_its_error_and_keeps_the_previous_one(buddy, ingest):
+    first = ingest(buddy, protocol(*PARAGRAPHS))
+    _, before = document(first["document_id"])
+
+    failed = ingest(buddy, "", document_id=first["document_id"])
+
+    assert failed["status"] == "failed"
+    assert "produced no chunks" in failed["error"]
+    doc, after = document(first["document_id"])
+    assert doc.version == 1
+    assert sorted(after) == sorted(before)
+    assert stored_ids(buddy, doc.id) == {digest for digest, _ in before}
+
+
+def test_concurrent_replacements_of_one_document_take_turns(buddy, ingest):
+    first = ingest(buddy, protocol(*PARAGRAPHS))
+    texts = [protocol(*PARAGRAPHS[:4]), protocol(*PARAGRAPHS[4:]), protocol(*PARAGRAPHS[2:6])]
+    results = []
+
+    def replace(text):
+        results.append(ingest(buddy, text, document_id=first["document_id"]))
+
+    threads = [threading.Thread(target=replace, args=(text,)) for text in texts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [result["status"] for result in results] == ["completed"] * 3
+    doc, chunks = document(first["document_id"])
+    assert doc.version == 4
+    # Whichever ran last is live, with exactly its chunks in the table and the index
+    assert doc.content in texts
+    live = {chunk_hash(chunk) for chunk in rag_system.split_text_stream([doc.content])}
+    assert {digest for digest, _ in chunks} == live
+    assert stored_ids(buddy, doc.id) == live
@@ -0,0 +1,212 @@
+# backend/tests/test_message_queue.py
+"""Webhook message queue: per-number ordering, redelivery dedupe, backpressure, draining and forwarding"""
+import asyncio
+import random
+import time
+import uuid
+
+import httpx
+import pytest
+
+from app.db.database import SessionLocal
+from app.db.models import CareBuddy, Conversation, UserSession
+from app.services import message_queue as message_queue_module
+from app.services.conversation_recorder import conversation_recorder
+from app.services.message_queue import InboundMessage, MessageQueue, QueueFullError, message_queue
+from app.services.whatsapp import whatsapp_client
+
+PHONES = [f"4477009{i:05d}" for i in range(6)]
+
+
+class Recorder:
+    """Handler that takes a random moment per message and records what it saw, per number"""
+
+    def __init__(self):
+        self.seen = {}
+        self.running = 0
+        self.most_running = 0
+
+    async def __call__(self, message: InboundMessage):
+        self.running += 1
+        self.most_running = max(self.most_running, self.running)
+        await asyncio.sleep(random.uniform(0, 0.005))
+        self.seen.setdefault(message.phone_number, []).append(message.text)
+        self.running -= 1
+
+
+def test_each_numbers_messages_are_handled_in_order_while_numbers_run_concurrently():
+    async def run():
+        handler = Recorder()
+        queue = MessageQueue(workers=4, max_depth=1000)
+        queue.start(handler)
+        for n in range(10):
+            for phone in PHONES:
+                queue.enqueue(InboundMessage(phone, f"message {n}", message_id=f"{phone}-{n}"))
+        await queue.stop(timeout=10)
+        return handler, queue
+
+    handler, queue = asyncio.run(run())
+
+    assert handler.seen == {phone: [f"message {n}" for n in range(10)] for phone in PHONES}
+    assert handler.most_running > 1
+    assert queue.stats()["processed"] == 60
+
+
+def test_redelivered_message_ids_are_dropped():
+    async def run():
+        handler = Recorder()
+        queue = MessageQueue(workers=2, max_depth=100)
+        queue.start(handler)
+        first = queue.enqueue(InboundMessage(PHONES[0], "hello", message_id="wamid.1"))
+        again = queue.enqueue(InboundMessage(PHONES[0], "hello", message_id="wamid.1"))
+        await queue.stop(timeout=5)
+        return handler, queue, first, again
+
+    handler, queue, first, again = asyncio.run(run())
+
+    assert (first, again) == (True, False)
+    assert handler.seen == {PHONES[0]: ["hello"]}
+    assert queue.duplicates == 1
+
+
+def test_a_full_queue_rejects_without_remembering_the_message():
+    async def run():
+        release = asyncio.Event()
+
+        async def blocked(message):
+            await release.wait()
+
+        queue = MessageQueue(workers=1, max_depth=2)
+        queue.start(blocked)
+        queue.enqueue(InboundMessage(PHONES[0], "message 0", message_id="m0"))
+        await asyncio.sleep(0.01)  # The worker takes the first and blocks; two more fill the queue
+        for n in range(1, 3):
+            queue.enqueue(InboundMessage(PHONES[0], f"message {n}", message_id=f"m{n}"))
+        with pytest.raises(QueueFullError):
+            queue.enqueue(InboundMessage(PHONES[0], "one too many", message_id="m3"))
+        release.set()
+        await asyncio.sleep(0.01)
+        # Meta's redelivery of the rejected message is accepted once there is room
+        accepted = queue.enqueue(InboundMessage(PHONES[0], "one too many", message_id="m3"))
+        await queue.stop(timeout=5)
+        return queue, accepted
+
+    queue, accepted = asyncio.run(run())
+
+    assert accepted
+    assert queue.rejected == 1 and queue.processed == 4
+
+
+def test_stop_drains_queued_messages_then_refuses_new_ones():
+    async def run():
+        handler = Recorder()
+        queue = MessageQueue(workers=2, max_depth=100)
+        queue.start(handler)
+        for n in range(20):
+            queue.enqueue(InboundMessage(PHONES[n % 2], f"message {n}"))
+        await queue.stop(timeout=10)
+        with pytest.raises(QueueFullError):
+            queue.enqueue(InboundMessage(PHONES[0], "after shutdown"))
+        return handler
+
+    handler = asyncio.run(run())
+
+    assert sum(len(texts) for texts in handler.seen.values()) == 20
+
+
+def test_messages_for_another_worker_are_forwarded_in_order_and_deduplicated(monkeypatch):
+    from app.api import routes
+    from main import app
+
+    # Forwarded requests reach the app in-process instead of over the owner's Unix socket
+    monkeypatch.setattr(message_queue_module.httpx, "AsyncHTTPTransport",
+                        lambda uds: httpx.ASGITransport(app=app))
+
+    async def run():
+        handlers = [Recorder(), Recorder()]
+        queues = [MessageQueue(workers=2, max_depth=100) for _ in handlers]
+        for worker_id, (queue, handler) in enumerate(zip(queues, handlers)):
+            queue.worker_id = worker_id
+            queue.peer_sockets = ["worker-0.sock", "worker-1.sock"]
+            queue.forward_token = "secret"
+            queue.start(handler)
+        # The app stands in for worker 1, so forwarded messages are the numbers worker 1 owns
+        monkeypatch.setattr(routes, "message_queue", queues[1])
+        phones = [phone for phone in PHONES if queues[0].owner(phone) == 1]
+
+        async def deliver(phone):
+            for n in range(5):
+                # Webhooks land on either worker
+                await queues[n % 2].submit(InboundMessage(phone, f"message {n}", message_id=f"{phone}-{n}"))
+            return await queues[0].submit(InboundMessage(phone, "message 0", message_id=f"{phone}-0"))
+
+        redelivered = await asyncio.gather(*(deliver(phone) for phone in phones))
+        for queue in queues:
+            await queue.stop(timeout=10)
+        return handlers, queues, phones, redelivered
+
+    handlers, queues, phones, redelivered = asyncio.run(run())
+
+    assert phones and redelivered == [False] * len(phones)
+    assert handlers[1].seen == {phone: [f"message {n}" for n in range(5)] for phone in phones}
+    assert handlers[0].seen == {}
+    assert queues[0].forwarded == 4 * len(phones)
+    assert queues[1].duplicates == len(phones)
+
+
+def test_forwarded_messages_need_the_token(client):
+    response = client.post("/api/internal/messages", json={"phone_number": PHONES[0], "text": "hi"},
+                           headers={"X-Forward-Token": ""})
+    assert response.status_code == 404
+
+
+def webhook(phone: str, text: str, message_id: str) -> dict:
+    return {"object": "whatsapp_business_account", "entry": [{"changes": [{"value": {"messages": [
+        {"from": phone, "id": message_id, "type": "text", "text": {"body": text}}
+    ]}}]}]}
+
+
+def wait_until_handled(count: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while message_queue.processed + message_queue.failed < count:
+        assert time.monotonic() < deadline, "messages were not handled in time"
+        time.sleep(0.02)
+
+
+def test_webhook_answers_one_patient_in_order_and_once_per_message(client, buddy):
+    db = SessionLocal()
+    bid = db.get(CareBuddy, buddy).bid
+    db.close()
+    phone = f"4477{uuid.uuid4().int % 10**8:08d}"
+    others = [f"4478{uuid.uuid4().int % 10**8:08d}" for _ in range(3)]
+    transport = whatsapp_client.transport
+    handled = message_queue.processed + message_queue.failed
+
+    expected = 0
+    for number in [phone] + others:
+        client.post("/api/webhook", json=webhook(number, f"CONNECT {bid}", f"{number}-connect"))
+        expected += 1
+    wait_until_handled(handled + expected)
+    for n in range(5):
+        for number in [phone] + others:
+            assert client.post("/api/webhook", json=webhook(number, f"Question {n}?", f"{number}-{n}")).json()["queued"] == 1
+            expected += 1
+        # Meta redelivers; the message is answered once
+        assert client.post("/api/webhook", json=webhook(phone, f"Question {n}?", f"{phone}-{n}")).json()["queued"] == 0
+    wait_until_handled(handled + expected)
+    conversation_recorder.flush()
+
+    db = SessionLocal()
+    session_id = db.query(UserSession.id).filter(UserSession.phone_number == phone).scalar()
+    queries = [q for (q,) in db.query(Conversation.query).filter(
+        Conversation.user_session_id == session_id
+    ).order_by(Conversation.timestamp, Conversation.id)]
+    db.close()
+    assert queries == [f"Question {n}?" for n in range(5)]
+    assert len([payload for payload in transport.sent if payload.get("to") == phone]) == 6
+
+
+def test_webhook_returns_503_when_the_queue_is_full(client, monkeypatch):
+    monkeypatch.setattr(message_queue, "max_depth", 0)
+    response = client.post("/api/webhook", json=webhook(PHONES[0], "Hello?", f"full-{uuid.uuid4().hex}"))
+    assert response.status_code == 503
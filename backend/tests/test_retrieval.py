@@ -0,0 +1,106 @@
+# backend/tests/test_retrieval.py
+"""Hybrid retrieval: BM25 over the FTS5 chunk index fused with vector hits, end to end on the local stand-ins"""
+import pytest
+from langchain_core.documents import Document as ChunkDocument
+
+from app.core.config import settings
+from app.db.chunk_search import lexical_search, match_expression
+from app.db.database import SessionLocal
+from app.db.models import DocumentChunk
+from app.services.carebuddy_rag import CareBuddyRAG, chunk_hash, document_key, rag_system
+
+DOCUMENT = "\n\n".join([
+    "Keep the dressing dry for 48 hours after surgery, then shower normally.",
+    "Take ibuprofen with food, at most three times a day, for the swelling.",
+    "Walk for ten minutes every hour while awake to prevent blood clots.",
+    "Call the clinic if the wound is red, hot or leaking after the first week.",
+] * 3)
+
+
+def vector_hit(doc_id: str, text: str, score: float = 0.5):
+    return ChunkDocument(page_content=text, metadata={"doc_id": doc_id, "chunk_hash": chunk_hash(text)}), score
+
+
+def lexical_row(document_id: int, text: str, chunk_index: int = 0):
+    return {"document_id": document_id, "chunk_hash": chunk_hash(text), "chunk_index": chunk_index,
+            "text": text, "score": 1.0}
+
+
+def test_fuse_ranks_chunks_found_by_both_retrievers_first():
+    vector_hits = [vector_hit("doc-1", "a"), vector_hit("doc-1", "b"), vector_hit("doc-2", "c")]
+    lexical = [lexical_row(2, "c"), lexical_row(3, "d")]
+
+    fused = CareBuddyRAG._fuse(vector_hits, lexical, k=4)
+
+    assert [doc.page_content for doc, _ in fused][0] == "c"
+    # Otherwise only the rank in each list counts, not which retriever found the chunk
+    scores = {doc.page_content: score for doc, score in fused}
+    assert scores["c"] == pytest.approx(1 / (settings.RRF_K + 3) + 1 / (settings.RRF_K + 1))
+    assert scores["a"] == pytest.approx(scores["d"] * (settings.RRF_K + 2) / (settings.RRF_K + 1))
+    assert len(fused) == 4
+
+
+def test_fuse_turns_lexical_only_rows_into_documents_and_keeps_k():
+    fused = CareBuddyRAG._fuse([], [lexical_row(7, "only bm25", chunk_index=3), lexical_row(7, "second")], k=1)
+
+    assert len(fused) == 1
+    doc, score = fused[0]
+    assert doc.page_content == "only bm25"
+    assert doc.metadata["doc_id"] == document_key(7)
+    assert doc.metadata["chunk_index"] == 3
+    assert score == pytest.approx(1 / (settings.RRF_K + 1))
+
+
+@pytest.fixture
+def ingested(buddy, ingest):
+    """A buddy with one stored document; returns (buddy id, document key)"""
+    result = ingest(buddy, DOCUMENT, filename="aftercare.txt")
+    assert result["status"] == "completed", result["error"]
+    return buddy, document_key(result["document_id"])
+
+
+def test_match_expression_quotes_every_word():
+    assert match_expression('wound AND "red" NOT hot*') == '"wound" OR "and" OR "red" OR "not" OR "hot"'
+    assert match_expression("?!") is None
+
+
+def test_lexical_search_is_scoped_to_the_buddy_and_follows_deletes(ingested, ingest):
+    buddy_id, doc_id = ingested
+    other = ingest(buddy_id, "Ibuprofen leaflet: take ibuprofen with food.", filename="leaflet.txt")
+
+    rows = lexical_search(buddy_id, "ibuprofen food", k=10)
+    assert {document_key(row["document_id"]) for row in rows} == {doc_id, document_key(other["document_id"])}
+    assert rows == sorted(rows, key=lambda row: row["score"], reverse=True)
+    assert lexical_search(buddy_id + 10000, "ibuprofen food", k=10) == []
+
+    db = SessionLocal()
+    db.query(DocumentChunk).filter(DocumentChunk.document_id == other["document_id"]).delete()
+    db.commit()
+    db.close()
+    assert {document_key(row["document_id"]) for row in lexical_search(buddy_id, "ibuprofen food", k=10)} == {doc_id}
+
+
+def test_hybrid_answer_cites_the_ingested_document(ingested):
+    buddy_id, doc_id = ingested
+
+    result = rag_system.answer("How long must the dressing stay dry after surgery?", buddy_id)
+
+    assert result.retrieval == "hybrid"
+    assert not result.cached
+    assert result.answer
+    assert result.sources and result.sources[0]["doc_id"] == doc_id
+    assert "fuse" in result.timings and "lexical" in result.timings
+
+
+def test_lexical_matches_answer_when_embedding_fails(ingested, monkeypatch):
+    buddy_id, doc_id = ingested
+
+    def unavailable(text):
+        raise ConnectionError("provider down")
+
+    monkeypatch.setattr(rag_system.embeddings, "embed_query", unavailable)
+    result = rag_system.answer("Which painkiller should I take with food?", buddy_id)
+
+    assert result.retrieval == "lexical"
+    assert result.answer
+    assert result.sources and all(source["doc_id"] == doc_id for source in result.sources)
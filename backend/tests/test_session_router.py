@@ -0,0 +1,104 @@
+# backend/tests/test_session_router.py
+"""Phone number routing: cached lookups, CONNECT write-through and buddy switches"""
+import uuid
+
+import pytest
+
+from app.db.database import SessionLocal
+from app.db.models import CareBuddy, UserSession
+from app.services.conversation_memory import conversation_memory
+from app.services.session_router import Route, SessionRouter
+from app.services.shared_counters import SharedCounters
+
+
+@pytest.fixture
+def phone():
+    return f"+44{uuid.uuid4().int % 10**10:010d}"
+
+
+def bid(buddy_id: int) -> str:
+    db = SessionLocal()
+    try:
+        return db.get(CareBuddy, buddy_id).bid
+    finally:
+        db.close()
+
+
+def call(method, *args):
+    db = SessionLocal()
+    try:
+        return method(*args, db)
+    finally:
+        db.close()
+
+
+def test_unknown_numbers_and_routes_are_cached(buddy, phone):
+    router = SessionRouter()
+
+    assert router.cached(phone) == (False, None)
+    assert call(router.resolve, phone) is None
+    assert router.cached(phone) == (True, None)
+    name, route = call(router.connect, phone, bid(buddy).lower())
+
+    assert name == "Test buddy" and route.buddy_id == buddy
+    assert call(router.resolve, phone) == route
+    assert router.cached(phone) == (True, route)
+    assert router.stats()["misses"] == 1 and router.stats()["hits"] == 3
+
+
+def test_connect_to_an_unknown_buddy_changes_nothing(phone):
+    router = SessionRouter()
+
+    assert call(router.connect, phone, "NOPE1") == (None, None)
+    assert call(router.resolve, phone) is None
+
+
+def test_routes_expire_and_the_oldest_are_evicted(buddy, phone):
+    router = SessionRouter(ttl_seconds=0, max_entries=1)
+    call(router.connect, phone, bid(buddy))
+
+    assert call(router.resolve, phone).buddy_id == buddy
+    call(router.resolve, phone + "1")
+    assert router.stats() == {"routes": 1, "hits": 0, "misses": 2, "hit_rate": 0.0}
+
+
+def test_switching_buddy_drops_the_conversation_memory(buddy, phone):
+    db = SessionLocal()
+    other = CareBuddy(bid=f"T{uuid.uuid4().hex[:5].upper()}", name="Other buddy", doctor_id=1)
+    db.add(other)
+    db.commit()
+    other_id, other_bid = other.id, other.bid
+    db.close()
+    router = SessionRouter()
+    _, route = call(router.connect, phone, bid(buddy))
+    call(conversation_memory.history, route.session_id)
+
+    # Reconnecting to the same buddy keeps the conversation going
+    call(router.connect, phone, bid(buddy))
+    assert route.session_id in conversation_memory._sessions
+
+    _, switched = call(router.connect, phone, other_bid)
+    assert switched == Route(route.session_id, other_id)
+    assert route.session_id not in conversation_memory._sessions
+    assert call(router.resolve, phone) == switched
+
+
+def test_connect_in_another_process_reroutes_the_number(buddy, phone, tmp_path):
+    path = str(tmp_path / "routes.counters")
+    here = SessionRouter(counters=SharedCounters(path))
+    there = SessionRouter(counters=SharedCounters(path))
+    call(here.resolve, phone)
+
+    _, route = call(there.connect, phone, bid(buddy))
+
+    assert call(here.resolve, phone) == route
+    assert call(there.resolve, phone) == route
+    assert there.stats()["misses"] == 0
+
+    # A change made outside connect() is picked up after invalidate()
+    db = SessionLocal()
+    db.query(UserSession).filter(UserSession.id == route.session_id).update({UserSession.buddy_id: None})
+    db.commit()
+    db.close()
+    there.invalidate(phone)
+    assert call(here.resolve, phone) == Route(route.session_id, None)
@@ -0,0 +1,89 @@
+# backend/tests/test_vectorstore.py
+"""Local vector store: per-namespace search, persistence and deletion"""
+from app.services import vectorstore
+from app.services.fakes import FakeEmbeddings
+from app.services.vectorstore import LocalVectorStore, preload
+
+TEXTS = [
+    "Keep the dressing dry for 48 hours after surgery.",
+    "Take ibuprofen with food, at most three times a day.",
+    "Walk for ten minutes every hour to prevent clots.",
+]
+
+
+def test_local_store_searches_one_namespace_and_persists(tmp_path):
+    embeddings = FakeEmbeddings(dimension=64)
+    store = LocalVectorStore(embedding=embeddings, persist_directory=str(tmp_path), text_key="text")
+    store.add_embeddings(
+        texts=TEXTS,
+        embeddings=embeddings.embed_documents(TEXTS),
+        metadatas=[{"doc_id": "doc-1", "chunk_index": i} for i in range(len(TEXTS))],
+        ids=[f"doc-1#{i}" for i in range(len(TEXTS))],
+        namespace="buddy-1"
+    )
+    store.add_embeddings(
+        texts=["Keep the dressing dry and clean."],
+        embeddings=embeddings.embed_documents(["Keep the dressing dry and clean."]),
+        metadatas=[{"doc_id": "doc-2", "chunk_index": 0}],
+        ids=["doc-2#0"],
+        namespace="buddy-2"
+    )
+
+    query = embeddings.embed_query("How long should the dressing stay dry?")
+    hits = store.similarity_search_by_vector_with_score(query, k=2, namespace="buddy-1")
+    assert hits[0][0].page_content == TEXTS[0]
+    assert {doc.metadata["doc_id"] for doc, _ in hits} == {"doc-1"}
+
+    reopened = LocalVectorStore(embedding=embeddings, persist_directory=str(tmp_path), text_key="text")
+    assert reopened.similarity_search_by_vector_with_score(query, k=1, namespace="buddy-1")[0][0].page_content == TEXTS[0]
+
+    reopened.delete(filter={"doc_id": "doc-1"}, namespace="buddy-1")
+    assert reopened.similarity_search_by_vector_with_score(query, k=2, namespace="buddy-1") == []
+
+
+def test_readding_an_id_replaces_the_chunk(tmp_path):
+    embeddings = FakeEmbeddings(dimension=64)
+    store = LocalVectorStore(embedding=embeddings, persist_directory=str(tmp_path), text_key="text")
+    store.add_texts([TEXTS[0]], metadatas=[{"doc_id": "doc-1"}], ids=["doc-1#0"], namespace="buddy-1")
+    store.add_texts([TEXTS[1]], metadatas=[{"doc_id": "doc-1"}], ids=["doc-1#0"], namespace="buddy-1")
+
+    hits = store.similarity_search_by_vector_with_score(embeddings.embed_query(TEXTS[0]), k=5, namespace="buddy-1")
+    assert [doc.page_content for doc, _ in hits] == [TEXTS[1]]
+
+
+def test_a_namespace_written_by_another_store_is_reloaded(tmp_path):
+    embeddings = FakeEmbeddings(dimension=64)
+    reader = LocalVectorStore(embedding=embeddings, persist_directory=str(tmp_path), text_key="text")
+    writer = LocalVectorStore(embedding=embeddings, persist_directory=str(tmp_path), text_key="text")
+    query = embeddings.embed_query(TEXTS[2])
+    writer.add_texts(TEXTS[:1], ids=["a"], namespace="buddy-1")
+    assert len(reader.similarity_search_by_vector_with_score(query, k=5, namespace="buddy-1")) == 1
+
+    # Another worker process adds to and deletes from the same namespace
+    writer.add_texts(TEXTS[1:], ids=["b", "c"], namespace="buddy-1")
+    writer.delete(ids=["a"], namespace="buddy-1")
+
+    hits = reader.similarity_search_by_vector_with_score(query, k=5, namespace="buddy-1")
+    assert hits[0][0].page_content == TEXTS[2]
+    assert {doc.page_content for doc, _ in hits} == set(TEXTS[1:])
+
+
+def test_preloaded_namespaces_are_adopted_unless_written_since(tmp_path):
+    embeddings = FakeEmbeddings(dimension=64)
+    writer = LocalVectorStore(embedding=embeddings, persist_directory=str(tmp_path), text_key="text")
+    for namespace in ("buddy-1", "buddy-2"):
+        writer.add_embeddings(texts=TEXTS, embeddings=embeddings.embed_documents(TEXTS),
+                              ids=[f"doc-1#{i}" for i in range(len(TEXTS))], namespace=namespace)
+
+    assert preload(str(tmp_path)) == 2 * len(TEXTS)
+    preloaded = dict(vectorstore._preloaded)
+    writer.delete(ids=["doc-1#0"], namespace="buddy-2")
+
+    # What a forked worker does on its first search of each namespace
+    worker = LocalVectorStore(embedding=embeddings, persist_directory=str(tmp_path), text_key="text")
+    query = embeddings.embed_query(TEXTS[0])
+    assert worker.similarity_search_by_vector_with_score(query, k=3, namespace="buddy-1")[0][0].page_content == TEXTS[0]
+    assert len(worker.similarity_search_by_vector_with_score(query, k=3, namespace="buddy-2")) == 2
+    assert worker._namespaces["buddy-1"] is preloaded[str(tmp_path / "buddy-1")]
+    assert worker._namespaces["buddy-2"] is not preloaded[str(tmp_path / "buddy-2")]
+    assert vectorstore._preloaded == {}
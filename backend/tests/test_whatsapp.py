@@ -0,0 +1,111 @@
+# backend/tests/test_whatsapp.py
+"""WhatsApp client against the stand-in Graph transport: retries, Retry-After and the send rate"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services.fakes import FakeGraphTransport
+from app.services.whatsapp import TokenBucket, WhatsAppClient
+
+
+class RetryAfterTransport(FakeGraphTransport):
+    """Injected failures carry a Retry-After header, like Graph API throttling"""
+
+    def __init__(self, retry_after: str, **kwargs):
+        super().__init__(**kwargs)
+        self.retry_after = retry_after
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await super().handle_async_request(request)
+        if response.status_code != 200:
+            response.headers["Retry-After"] = self.retry_after
+        return response
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    """Record the back-off sleeps instead of waiting them out"""
+    recorded = []
+    sleep = asyncio.sleep
+
+    async def record(seconds, *args, **kwargs):
+        recorded.append(seconds)
+        await sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", record)
+    return recorded
+
+
+def make_client(transport: FakeGraphTransport, max_retries: int = 3, rate: float = 1000, burst: float = 1000) -> WhatsAppClient:
+    client = WhatsAppClient(transport=transport)
+    client.max_retries = max_retries
+    client.rate_limiter = TokenBucket(rate=rate, capacity=burst)
+    return client
+
+
+async def send(client: WhatsAppClient, *args, bulk: bool = False, **kwargs):
+    try:
+        if bulk:
+            return await client.send_bulk(*args, **kwargs)
+        return await client.send_message(*args, **kwargs)
+    finally:
+        await client.aclose()
+
+
+def test_retry_after_is_honored(delays):
+    transport = RetryAfterTransport("7", fail_statuses=[429, 503])
+    result = asyncio.run(send(make_client(transport), "447700900001", "Take your medication"))
+
+    assert result["messages"][0]["id"].startswith("wamid.")
+    assert delays == [7.0, 7.0]
+    assert [payload["to"] for payload in transport.sent] == ["447700900001"]
+
+
+def test_backoff_grows_without_retry_after(delays):
+    transport = FakeGraphTransport(fail_statuses=[500, 502, 504])
+    asyncio.run(send(make_client(transport), "447700900001", "Hello"))
+
+    assert len(delays) == 3
+    for attempt, delay in enumerate(delays):
+        assert 0.5 * 2 ** attempt <= delay <= 0.5 * 2 ** attempt + 0.25
+
+
+def test_retries_stop_at_the_limit(delays):
+    transport = FakeGraphTransport(fail_statuses=[503] * 10)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(send(make_client(transport, max_retries=2), "447700900001", "Hello"))
+
+    # One attempt plus two retries, then the error is raised
+    assert len(transport.fail_statuses) == 7
+    assert len(delays) == 2
+    assert transport.sent == []
+
+
+def test_non_retryable_errors_are_not_retried(delays):
+    transport = FakeGraphTransport(fail_statuses=[400, 400])
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(send(make_client(transport), "447700900001", "Hello"))
+
+    assert transport.fail_statuses == [400]
+    assert delays == []
+
+
+def test_send_bulk_respects_the_rate_and_reports_failures_per_recipient():
+    recipients = [f"4477009{i:05d}" for i in range(12)]
+    # The first recipient's send exhausts its retries; everyone else goes through
+    transport = FakeGraphTransport(fail_statuses=[503])
+    client = make_client(transport, max_retries=0, rate=20, burst=2)
+
+    started = time.monotonic()
+    results = asyncio.run(send(client, recipients, "Clinic closed tomorrow", bulk=True, concurrency=12))
+    elapsed = time.monotonic() - started
+
+    # Two sends fit the burst; the other ten wait for tokens at 20 a second
+    assert elapsed >= (len(recipients) - 2) / 20 * 0.9
+    assert list(results) == recipients
+    assert [status["status"] for status in results.values()].count("failed") == 1
+    assert sorted(payload["to"] for payload in transport.sent) == sorted(
+        to for to, status in results.items() if status["status"] == "sent"
+    )